@@ -0,0 +1,106 @@
+"""In-memory answer cache placed in front of the LLM call.
+
+Two tiers share one size-bounded LRU:
+  - exact: same normalised query, model, top_k, prompt template and corpus
+  - semantic: same model/top_k/template/corpus and a query embedding whose
+    cosine similarity to a cached query is above a threshold
+
+Every key includes the corpus version written by ingest, so re-ingestion
+invalidates old answers without any explicit flush.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding_cache import normalise_query
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = 256  # Cached answers kept across both tiers
+SIMILARITY_THRESHOLD = 0.95  # Cosine similarity needed for a semantic hit
+
+
+def template_fingerprint(*templates: str) -> str:
+    """Short digest of the prompt template(s) so prompt edits invalidate answers."""
+    return hashlib.sha256("\x00".join(templates).encode("utf-8")).hexdigest()[:12]
+
+
+class AnswerCache:
+    """Exact + semantic answer cache with LRU eviction. Thread-safe."""
+
+    def __init__(self, max_items: int = MAX_ITEMS, similarity_threshold: float = SIMILARITY_THRESHOLD):
+        self.max_items = max_items
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (scope, normalised query) -> entry dict
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _scope(model: str, top_k: int, template: str, corpus_version) -> tuple:
+        return (corpus_version, model, top_k, template)
+
+    def lookup_exact(self, query: str, model: str, top_k: int, template: str, corpus_version):
+        """Return the cached entry for an identical request, or None (counted as a miss)."""
+        key = (self._scope(model, top_k, template, corpus_version), normalise_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self._counters["exact_hits"] += 1
+            return entry
+
+    def lookup_semantic(self, query_vec, model: str, top_k: int, template: str, corpus_version):
+        """Return (entry, similarity) for the closest cached query above the threshold, else (None, best).
+
+        Only called after `lookup_exact` missed, which already counted the miss;
+        a semantic hit turns that miss into a hit.
+        """
+        scope = self._scope(model, top_k, template, corpus_version)
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == scope and self._entries[key]["query_vec"] is not None]
+            if not keys:
+                return None, 0.0
+            matrix = np.stack([self._entries[key]["query_vec"] for key in keys])
+
+        q = np.asarray(query_vec, dtype=np.float32)
+        sims = matrix @ q / (np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0) + 1e-12)
+        best = int(np.argmax(sims))
+        similarity = float(sims[best])
+
+        with self._lock:
+            if similarity < self.similarity_threshold or keys[best] not in self._entries:
+                return None, similarity
+            self._entries.move_to_end(keys[best])
+            self._counters["misses"] = max(self._counters["misses"] - 1, 0)
+            self._counters["semantic_hits"] += 1
+            return self._entries[keys[best]], similarity
+
+    def store(self, query: str, query_vec, model: str, top_k: int, template: str, corpus_version, **payload):
+        """Cache an answer; extra keyword args (answer, sources, ...) are stored as-is."""
+        key = (self._scope(model, top_k, template, corpus_version), normalise_query(query))
+        vec = None if query_vec is None else np.asarray(query_vec, dtype=np.float32)  # None: exact tier only
+        entry = dict(payload, query=query, query_vec=vec)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)  # Evict least recently used
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["items"] = len(self._entries)
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,10 +1,24 @@
 """Streamlit front-end for the Clinical RAG Copilot with logging instrumentation."""
 
 import logging
+import os
 import time  # NEW
 
 import streamlit as st
-from rag_core import answer_question, DEFAULT_LLM_MODEL
+from rag_core import (
+    cold_start_stats,
+    list_sources,
+    model_stats,
+    query_cache_stats,
+    stream_answer,
+    warm_up,
+    DEFAULT_LLM_MODEL,
+    RETRIEVAL_MODE,
+    RETRIEVAL_MODES,
+)
+from conversation_cache import ConversationCache
+from rag_service import ServiceClient
+from tracing import format_breakdown, profile_next_request, start_metrics_server
 
 # -------------------------------------------------
 # Logging setup
@@ -16,6 +30,10 @@ logger = logging.getLogger(__name__)
 
 logger.info("Loading Streamlit UI layout configuration")
 
+# With RAG_SERVICE_URL set, questions go to a shared rag_service.py process instead of in-process
+SERVICE_URL = os.environ.get("RAG_SERVICE_URL")
+service = ServiceClient(SERVICE_URL) if SERVICE_URL else None
+
 # -------------------------------------------------
 # Page config
 # -------------------------------------------------
@@ -25,6 +43,32 @@ st.set_page_config(
     layout="wide",
 )
 
+# -------------------------------------------------
+# Warm-up (once per server process, shared by all sessions)
+# -------------------------------------------------
+@st.cache_resource(show_spinner="Connecting to the guideline index...")
+def warm_up_store() -> int:
+    """Connect to Chroma and load the index before the first question."""
+    try:
+        return service.health()["chunks"] if service else warm_up()
+    except Exception:
+        logger.exception("Warm-up failed; the first question will connect instead")
+        return 0
+
+
+indexed_chunks = warm_up_store()
+logger.info("RAG store ready with %s chunks", indexed_chunks)
+
+
+@st.cache_resource
+def metrics_server():
+    """Expose Prometheus metrics on RAG_METRICS_PORT (once per server process), if set."""
+    port = os.environ.get("RAG_METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+
+metrics_server()
+
 # -------------------------------------------------
 # Custom CSS – clean, simple, no weird boxes
 # -------------------------------------------------
@@ -136,8 +180,103 @@ top_k = st.sidebar.slider(
 )
 logger.info("Sidebar top_k set to %s", top_k)
 
+retrieval_mode = st.sidebar.selectbox(
+    "Retrieval mode",
+    options=RETRIEVAL_MODES,
+    index=RETRIEVAL_MODES.index(RETRIEVAL_MODE),
+    help="hybrid fuses vector search with BM25 keyword search (good for "
+         "exact terms like 'E9(R1)' or 'PFS'); lexical skips embeddings entirely.",
+)
+logger.info("Sidebar retrieval mode set to '%s'", retrieval_mode)
+
+
+@st.cache_data(ttl=60)
+def available_sources() -> list[str]:
+    """Guideline filenames to offer as filters (refreshed every minute, so re-ingests show up)."""
+    try:
+        return service.health()["sources"] if service else list_sources()
+    except Exception:
+        logger.exception("Could not list guideline sources")
+        return []
+
+
+source_filter = st.sidebar.multiselect(
+    "Guidelines",
+    options=available_sources(),
+    help="Only search these guidelines. Leave empty to search all of them; the question is then "
+         "routed to the guidelines closest to it.",
+)
+logger.info("Sidebar source filter set to %s", source_filter or "all")
+
+use_answer_cache = st.sidebar.checkbox(
+    "Reuse cached answers",
+    value=True,
+    help="Serve repeated or near-identical questions from the answer cache "
+         "(invalidated automatically after re-ingestion).",
+)
+
+reuse_context = st.sidebar.checkbox(
+    "Reuse context across turns",
+    value=not service,
+    disabled=bool(service),
+    help="Follow-up questions reuse chunks retrieved for the last few turns that still match, "
+         "and only search for the rest (not available when answers come from the RAG service).",
+)
+
+show_breakdown = st.sidebar.checkbox(
+    "Show latency breakdown",
+    value=True,
+    help="Per-stage timings (connect, embedding, search, context, LLM) under each answer.",
+)
+# Profiling only covers this process; in service mode the work happens in rag_service.py, so the button is hidden
+if not service and st.sidebar.button(
+    "Profile next question", help="Save a cProfile dump of the next request to data/profiles/"
+):
+    profile_next_request()
+    st.sidebar.caption("The next question will be profiled.")
+
 st.sidebar.markdown("---")
 st.sidebar.caption("Backend: Chroma + Ollama embeddings (nomic-embed-text)")
+if service:
+    st.sidebar.caption(f"Answers served by RAG service at {SERVICE_URL}")
+
+try:
+    health = service.health() if service else {
+        "query_cache": query_cache_stats(),
+        "models": model_stats(),
+        "cold_start": cold_start_stats(),
+    }
+except Exception:
+    logger.exception("Could not fetch cache and model stats from the RAG service")
+    health = {
+        "query_cache": {"memory_hits": 0, "disk_hits": 0, "misses": 0, "est_saved_ms": 0.0},
+        "models": {"keep_alive": None, "models": {}},
+        "cold_start": {},
+    }
+cache_stats = health["query_cache"]
+st.sidebar.caption(
+    f"Query-embedding cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits / "
+    f"{cache_stats['misses']} misses (~{cache_stats['est_saved_ms']:.0f} ms saved)"
+)
+for name, stats in health["models"]["models"].items():
+    if stats["last_load_s"] is not None:
+        st.sidebar.caption(
+            f"Model {name}: loaded in {stats['last_load_s']:.1f} s "
+            f"(keep-alive {health['models']['keep_alive']}, {stats['in_request_loads']} cold loads since)"
+        )
+cold_start = health.get("cold_start") or {}
+if cold_start:
+    st.sidebar.caption(
+        f"Cold start: first retrieval {cold_start['seconds']:.1f} s after process {cold_start['measured_from']}"
+        + (" (index snapshot)" if cold_start["snapshot"] else "")
+    )
+conversation = st.session_state.get("retrieval_context")
+if conversation is not None and len(conversation):
+    conversation_stats = conversation.stats()
+    st.sidebar.caption(
+        f"Conversation context: {conversation_stats['chunks']} chunks ({conversation_stats['bytes'] / 1024:.0f} KB); "
+        f"{conversation_stats['reused_chunks']} reused / {conversation_stats['searched_chunks']} searched"
+    )
 
 # -------------------------------------------------
 # Header (main area)
@@ -165,6 +304,7 @@ st.markdown(
 # -------------------------------------------------
 if "history" not in st.session_state:
     st.session_state.history = []
+    st.session_state.retrieval_context = ConversationCache()  # Chunks of recent turns, bounded per session
     logger.info("Initialized new chat history in session state")
 else:
     logger.info("Restored chat history with %s messages", len(st.session_state.history))
@@ -195,32 +335,70 @@ if user_input:
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    # 2) Generate assistant response via RAG (measure time)
+    # 2) Stream assistant response via RAG (measure time, time-to-first-token, tokens/sec)
     with st.chat_message("assistant"):
-        with st.spinner("Reasoning over guidelines..."):
-            start = time.perf_counter()
-            try:
-                answer = answer_question(
-                    user_input,
-                    llm_model=llm_model,
-                    top_k=top_k,
-                )
-                elapsed = time.perf_counter() - start
-                logger.info(
-                    "Answer generated (chars=%s) in %.2f seconds",
-                    len(answer),
-                    elapsed,
-                )
-            except Exception as e:
-                logger.exception("Error while generating answer for user input")
-                answer = f"Error while generating answer: `{e}`"
-                elapsed = None
-
-        st.markdown(answer)
+        sources_slot = st.empty()  # Sources arrive before the first token
+        answer_slot = st.empty()
+        answer_slot.markdown("_Reasoning over guidelines..._")
+
+        start = time.perf_counter()
+        cache_tier = None
+        ttft = tokens_per_sec = None
+        timings = None
+        parts = []
+        try:
+            answer_stream = service.stream_answer if service else stream_answer
+            kwargs = {"conversation": st.session_state.retrieval_context} if reuse_context and not service else {}
+            for event in answer_stream(
+                user_input,
+                llm_model=llm_model,
+                top_k=top_k,
+                use_cache=use_answer_cache,
+                mode=retrieval_mode,
+                source_filter=source_filter or None,
+                **kwargs,
+            ):
+                if event["type"] == "sources":
+                    cache_tier = event["cache"]
+                    if event["sources"]:
+                        sources_slot.caption(
+                            "📄 Sources: "
+                            + ", ".join(f"{s['source']} (chunk {s['chunk_index']})" for s in event["sources"])
+                            + (f" · {event['reused']} reused from earlier turns" if event.get("reused") else "")
+                        )
+                elif event["type"] == "token":
+                    parts.append(event["text"])
+                    answer_slot.markdown("".join(parts) + "▌")
+                elif event["type"] == "done":
+                    ttft = event["ttft"]
+                    tokens_per_sec = event["tokens_per_sec"]
+                    timings = event["timings"]
+            answer = "".join(parts)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                "Answer generated (chars=%s) in %.2f seconds",
+                len(answer),
+                elapsed,
+            )
+        except Exception as e:
+            logger.exception("Error while generating answer for user input")
+            answer = f"Error while generating answer: `{e}`"
+            elapsed = None
+
+        answer_slot.markdown(answer)
 
         # Show timing info under the answer
         if elapsed is not None:
-            st.caption(f"⏱️ Response time: {elapsed:.1f} seconds")
+            timing = f"⏱️ Response time: {elapsed:.1f} seconds"
+            if ttft is not None:
+                timing += f" · First token: {ttft:.1f} s"
+            if tokens_per_sec:
+                timing += f" · {tokens_per_sec:.1f} tokens/s"
+            st.caption(timing)
+        if show_breakdown and timings:
+            st.caption("🔎 " + format_breakdown(timings))
+        if cache_tier is not None:
+            st.caption(f"⚡ Served from answer cache ({cache_tier} match)")
 
     # 3) Store assistant message
     st.session_state.history.append({"role": "assistant", "content": answer})
@@ -0,0 +1,242 @@
+"""Answer a JSONL file of questions offline, with a worker pool and resume.
+
+Each input line is a JSON object with a "question" (or "query") and
+optionally "id", "top_k", "mode" and "sources" (guideline filter) that
+override the command-line defaults for that question. Every question goes
+through `rag_core.answer_question_detailed` on a thread pool; one JSON
+record per question (answer, sources, answer-cache tier, per-stage timings in
+ms, trace id, elapsed seconds or an "error") is appended to the output file
+in input order and flushed as soon as it is ready.
+
+Because records are written in order, the output always holds a complete
+prefix of the input: rerunning the same command skips every input line up
+to the last recorded one (a half-written last record from a crash is
+dropped) and continues from there. Failed questions are recorded with an
+"error" instead of an answer and are not retried on resume. Throughput is
+reported in questions/minute.
+
+Run from: clinical_rag/src
+    python batch_qa.py questions.jsonl answers.jsonl --workers 4
+    python batch_qa.py questions.jsonl answers.jsonl --llm-concurrency 2 --mode vector
+    python batch_qa.py ../data/golden_questions.jsonl /tmp/answers.jsonl --fake-ollama
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+WORKERS = 4
+IN_FLIGHT_PER_WORKER = 2  # Questions queued per worker; bounds memory and work lost on interruption
+PROGRESS_EVERY = 10  # Log throughput after this many answered questions
+
+
+def read_questions(path: Path, after_line: int = 0):
+    """Yield (line number, item) for every question after `after_line` (1-based, blank lines skipped)."""
+    with open(path, encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, start=1):
+            if line_no <= after_line or not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping line %s of %s: not valid JSON", line_no, path)
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            if not str(item.get("question") or item.get("query") or "").strip():
+                logger.warning("Skipping line %s of %s: no 'question'", line_no, path)
+                continue
+            yield line_no, item
+
+
+def last_completed_line(out_path: Path) -> int:
+    """Input line number of the last complete record in `out_path` (0 if none).
+
+    A trailing partial record, left by an interrupted run, is cut off.
+    """
+    if not out_path.exists():
+        return 0
+    last_line, good_bytes = 0, 0
+    with open(out_path, "rb") as fh:
+        for raw in fh:
+            try:
+                record = json.loads(raw) if raw.endswith(b"\n") else None
+            except ValueError:
+                record = None
+            if record is None:
+                break
+            last_line = record["line"]
+            good_bytes += len(raw)
+    if good_bytes != out_path.stat().st_size:
+        logger.warning("Dropping a partial record at the end of %s", out_path)
+        with open(out_path, "r+b") as fh:
+            fh.truncate(good_bytes)
+    return last_line
+
+
+def _percentiles_s(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    # Nearest-rank percentiles
+    return {f"p{p}_s": ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] for p in (50, 95)}
+
+
+def run_batch(
+    in_path: Path,
+    out_path: Path,
+    workers: int = WORKERS,
+    llm_model: str | None = None,
+    top_k: int = 5,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+    use_cache: bool = True,
+    llm_concurrency: int | None = None,
+) -> dict:
+    """Answer every question in `in_path` not yet in `out_path`; returns the run summary."""
+    import rag_core  # Deferred so --fake-ollama can point OLLAMA_HOST elsewhere first
+
+    llm_model = llm_model or rag_core.DEFAULT_LLM_MODEL
+    rag_core.set_llm_concurrency(llm_concurrency)
+    resume_after = last_completed_line(out_path)
+    if resume_after:
+        logger.info("Resuming after input line %s (already answered in %s)", resume_after, out_path)
+    rag_core.warm_up(llm_model)
+
+    def answer(line_no: int, item: dict) -> dict:
+        question = str(item.get("question") or item.get("query")).strip()
+        record = {"line": line_no, "id": item.get("id", line_no), "question": question}
+        t0 = time.perf_counter()
+        try:
+            result = rag_core.answer_question_detailed(
+                question,
+                llm_model=llm_model,
+                top_k=int(item.get("top_k", top_k)),
+                use_cache=use_cache,
+                mode=item.get("mode", mode),
+                source_filter=item.get("sources", source_filter),
+            )
+            record.update(
+                answer=result["answer"],
+                sources=result["sources"],
+                cache=result["cache"],
+                timings=result["timings"],
+                trace_id=result["trace_id"],
+            )
+        except Exception as exc:
+            logger.exception("Question on line %s failed", line_no)
+            record["error"] = f"{type(exc).__name__}: {exc}"
+        record["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        return record
+
+    latencies, stage_totals = [], {}
+    counts = {"answered": 0, "errors": 0, "cache_hits": 0}
+    start = time.perf_counter()
+
+    def write(out, record: dict) -> None:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if "error" in record:
+            counts["errors"] += 1
+        else:
+            counts["answered"] += 1
+            counts["cache_hits"] += record["cache"] is not None
+            latencies.append(record["elapsed_s"])
+            for stage, ms in record["timings"].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+        done = counts["answered"] + counts["errors"]
+        if done % PROGRESS_EVERY == 0:
+            logger.info("%s questions done (%.1f questions/min)", done, done / (time.perf_counter() - start) * 60)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    pending = deque()  # Futures in input order, so records are written in order
+    window = max(1, workers) * IN_FLIGHT_PER_WORKER
+    interrupted = False
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for line_no, item in read_questions(in_path, resume_after):
+                pending.append(pool.submit(answer, line_no, item))
+                if len(pending) >= window:
+                    write(out, pending.popleft().result())
+            while pending:
+                write(out, pending.popleft().result())
+        except KeyboardInterrupt:
+            interrupted = True
+            logger.warning("Interrupted; rerun the same command to resume after the last written line")
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    done = counts["answered"] + counts["errors"]
+    summary = {
+        "input": str(in_path),
+        "output": str(out_path),
+        "resumed_after_line": resume_after,
+        "interrupted": interrupted,
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "questions_per_minute": round(done / elapsed * 60, 2) if elapsed else 0.0,
+        **_percentiles_s(latencies),
+        "mean_stage_ms": {stage: round(ms / counts["answered"], 1) for stage, ms in stage_totals.items()},
+        "workers": workers,
+        "model": llm_model,
+    }
+    logger.info(
+        "Batch finished: %s answered, %s errors in %.1fs (%.1f questions/min)",
+        counts["answered"],
+        counts["errors"],
+        elapsed,
+        summary["questions_per_minute"],
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG pipeline.")
+    parser.add_argument("input", type=Path, help="JSONL with one {'question': ...} per line")
+    parser.add_argument("output", type=Path, help="JSONL answers; rerun with the same path to resume")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="questions processed in parallel")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="cap on parallel generations (0 = workers)")
+    parser.add_argument("--model", default=None, help="Ollama chat model (default rag_core.DEFAULT_LLM_MODEL)")
+    parser.add_argument("-k", "--top-k", type=int, default=5)
+    parser.add_argument("--mode", choices=("vector", "lexical", "hybrid"), default=None)
+    parser.add_argument("--source", action="append", default=None, help="restrict to this guideline (repeatable)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the answer cache")
+    parser.add_argument("--fake-ollama", action="store_true", help="answer with the local stub Ollama (dry run)")
+    args = parser.parse_args()
+
+    fake = None
+    if args.fake_ollama:
+        from fake_ollama import start_fake_ollama
+
+        fake = start_fake_ollama(latency=0.01, token_latency=0.002)
+        os.environ["OLLAMA_HOST"] = fake.url  # Must be set before rag_core/ollama are imported
+
+    try:
+        summary = run_batch(
+            args.input,
+            args.output,
+            workers=args.workers,
+            llm_model=args.model,
+            top_k=args.top_k,
+            mode=args.mode,
+            source_filter=args.source,
+            use_cache=not args.no_cache,
+            llm_concurrency=args.llm_concurrency or None,
+        )
+        print(json.dumps(summary, indent=2))
+    finally:
+        if fake is not None:
+            fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
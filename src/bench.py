@@ -0,0 +1,248 @@
+"""Stage-level benchmark suite for the RAG pipeline.
+
+Runs every stage against a throwaway copy of `data/pdfs/` and the built-in
+fake Ollama server (deterministic embeddings and chat answers with
+configurable latency), so results only move when our code does:
+
+  - extraction pages/sec      (chunk_playground.extract_pages_from_pdfs)
+  - chunking MB/sec           (chunk_playground.chunk_text)
+  - ingest chunks/sec         (ingest.ingest_pdfs, embeddings + Chroma upserts)
+  - retrieval p50/p95/p99     (rag_core.retrieve_context)
+  - end-to-end p50/p95/p99    (rag_core.answer_question_detailed, caches off)
+
+Results are written as JSON (with git commit, Python version and settings)
+so runs can be compared across commits.
+
+Run from: clinical_rag/src
+    python bench.py
+    python bench.py --latency 0.02 --token-latency 0.005 --out ../bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PDF_DIR = BASE_DIR / "data" / "pdfs"
+RESULTS_DIR = BASE_DIR / "data" / "bench"
+
+BENCH_VERSION = 1  # Bump when the result layout or measured work changes
+
+CHUNK_REPEATS = 5  # Chunk the extracted corpus this many times for a stable MB/sec
+RETRIEVAL_QUERIES = 60
+ANSWER_QUERIES = 20
+TOP_K = 5
+
+# Distinct questions (combined with TOPICS) so the query-embedding cache never hits
+QUESTION_TEMPLATES = (
+    "What does the guidance say about {}?",
+    "How should sponsors handle {}?",
+    "Summarise the requirements for {}.",
+    "Which considerations apply to {}?",
+)
+TOPICS = (
+    "estimands", "intercurrent events", "sensitivity analysis", "progression-free survival",
+    "overall survival", "objective response rate", "informed consent", "monitoring",
+    "investigator responsibilities", "essential documents", "randomisation", "blinding",
+    "missing data", "surrogate endpoints", "accelerated approval", "quality management",
+    "source data verification", "adverse event reporting", "protocol amendments", "data integrity",
+)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentiles_ms(samples: list[float]) -> dict:
+    """p50/p95/p99/mean of a list of durations in seconds, in milliseconds."""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        # Nearest-rank percentile; fine for the sample sizes used here
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        "n": len(ordered),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+
+
+def bench_questions(n: int) -> list[str]:
+    questions = [template.format(topic) for template in QUESTION_TEMPLATES for topic in TOPICS]
+    return [questions[i % len(questions)] + ("" if i < len(questions) else f" ({i})") for i in range(n)]
+
+
+def bench_extraction(pdf_paths: list[Path], workers: int | None) -> tuple[dict, dict]:
+    from chunk_playground import extract_pages_from_pdfs
+
+    t0 = time.perf_counter()
+    pages_by_file = extract_pages_from_pdfs(pdf_paths, workers=workers, use_cache=False)  # Time pypdf itself
+    elapsed = time.perf_counter() - t0
+    pages = sum(len(p) for p in pages_by_file.values())
+    texts = {path: "\n".join(p) for path, p in pages_by_file.items()}
+    return {"pages": pages, "seconds": elapsed, "pages_per_sec": pages / elapsed if elapsed else 0.0}, texts
+
+
+def bench_chunking(texts: dict, chunk_size: int, overlap: int) -> dict:
+    from chunk_playground import chunk_text
+
+    total_bytes = sum(len(t.encode("utf-8")) for t in texts.values())
+    t0 = time.perf_counter()
+    for _ in range(CHUNK_REPEATS):
+        chunks = sum(len(chunk_text(t, chunk_size=chunk_size, overlap=overlap)) for t in texts.values())
+    elapsed = time.perf_counter() - t0
+    mb = total_bytes * CHUNK_REPEATS / 1e6
+    return {"chunks": chunks, "mb": mb, "seconds": elapsed, "mb_per_sec": mb / elapsed if elapsed else 0.0}
+
+
+def bench_ingest() -> dict:
+    import ingest
+
+    t0 = time.perf_counter()
+    summary = ingest.ingest_pdfs(force=True)
+    elapsed = time.perf_counter() - t0
+    chunks = summary["upserted_chunks"]
+    return {
+        "chunks": chunks,
+        "seconds": elapsed,
+        "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+        "embed_chunks_per_sec": chunks / summary["embed_seconds"] if summary["embed_seconds"] else 0.0,
+    }
+
+
+def bench_retrieval(questions: list[str], mode: str) -> dict:
+    import rag_core
+
+    collection = rag_core.get_collection()
+    rag_core.warm_up()
+    samples = []
+    for q in questions:
+        t0 = time.perf_counter()
+        rag_core.retrieve_context(collection, q, k=TOP_K, mode=mode)
+        samples.append(time.perf_counter() - t0)
+    return {"mode": mode, "k": TOP_K, **_percentiles_ms(samples)}
+
+
+def bench_answers(questions: list[str], mode: str) -> dict:
+    import rag_core
+
+    samples = []
+    stage_ms = {}  # span path -> summed milliseconds
+    for q in questions:
+        t0 = time.perf_counter()
+        result = rag_core.answer_question_detailed(q, top_k=TOP_K, use_cache=False, mode=mode)
+        samples.append(time.perf_counter() - t0)
+        for name, ms in result["timings"].items():
+            stage_ms[name] = stage_ms.get(name, 0.0) + ms
+    mean_stage_ms = {name: ms / len(questions) for name, ms in stage_ms.items()} if questions else {}
+    return {"mode": mode, "k": TOP_K, **_percentiles_ms(samples), "mean_stage_ms": mean_stage_ms}
+
+
+def run(args) -> dict:
+    """Run every stage in an isolated data tree and return the results dict."""
+    from fake_ollama import start_fake_ollama
+
+    pdf_paths = sorted(PDF_DIR.glob("*.pdf"))
+    if not pdf_paths:
+        raise SystemExit(f"No PDFs found in {PDF_DIR}")
+
+    server = start_fake_ollama(latency=args.latency, token_latency=args.token_latency, seed=0)
+    work_dir = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    try:
+        shutil.copytree(PDF_DIR, work_dir / "pdfs")
+        # Repo modules read these at import time, so set them before importing any
+        os.environ["OLLAMA_HOST"] = server.url
+        os.environ["RAG_DATA_DIR"] = str(work_dir)
+
+        import ingest
+
+        results = {
+            "bench_version": BENCH_VERSION,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "pdfs": [p.name for p in pdf_paths],
+                "chunk_size": ingest.CHUNK_SIZE,
+                "overlap": ingest.OVERLAP,
+                "extract_workers": args.workers,
+                "embed_batch_size": ingest.EMBED_BATCH_SIZE,
+                "embed_workers": ingest.EMBED_WORKERS,
+                "fake_latency_s": args.latency,
+                "fake_token_latency_s": args.token_latency,
+                "mode": args.mode,
+            },
+            "stages": {},
+        }
+        stages = results["stages"]
+
+        stages["extraction"], texts = bench_extraction(sorted((work_dir / "pdfs").glob("*.pdf")), args.workers)
+        stages["chunking"] = bench_chunking(texts, ingest.CHUNK_SIZE, ingest.OVERLAP)
+        stages["ingest"] = bench_ingest()
+        stages["retrieval"] = bench_retrieval(bench_questions(args.queries), args.mode)
+        stages["answer"] = bench_answers(bench_questions(args.answers), args.mode)
+        results["fake_ollama_requests"] = dict(server.request_counts)
+        return results
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-level RAG benchmarks against a fake Ollama server.")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server seconds per request")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake server seconds per chat token")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: all cores)")
+    parser.add_argument("--queries", type=int, default=RETRIEVAL_QUERIES, help="retrieval samples")
+    parser.add_argument("--answers", type=int, default=ANSWER_QUERIES, help="end-to-end answer samples")
+    parser.add_argument("--mode", default="hybrid", help="retrieval mode: vector, lexical or hybrid")
+    parser.add_argument("--out", type=Path, default=None, help="results file (default: data/bench/<time>-<commit>.json)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="keep INFO logs from the pipeline")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)  # Per-chunk logs would dominate the timings
+
+    results = run(args)
+
+    out = args.out or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{results['git_commit'] or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    stages = results["stages"]
+    print(f"extraction : {stages['extraction']['pages_per_sec']:.1f} pages/sec")
+    print(f"chunking   : {stages['chunking']['mb_per_sec']:.1f} MB/sec")
+    print(f"ingest     : {stages['ingest']['chunks_per_sec']:.1f} chunks/sec")
+    for name in ("retrieval", "answer"):
+        s = stages[name]
+        print(f"{name:<11}: p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms, p99 {s['p99_ms']:.1f} ms")
+    print(f"results    : {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
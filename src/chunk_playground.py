@@ -1,36 +1,175 @@
 """PDF text extraction and chunking helpers with logging for quick experiments."""
 
 import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from pypdf import PdfReader
 
+from text_cache import ExtractedTextCache
+
 # Keep logging consistent with other modules so experiments emit the same detail.
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Default size of the extraction process pool (one worker per core).
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Page ranges handed out per worker; >1 evens out pages that are slow to parse.
+RANGES_PER_WORKER = 2
 
-def extract_text_from_pdf(pdf_path: Path) -> str:
-    """Return all text from a PDF as one big string."""
-    logger.info("Opening PDF for extraction: %s", pdf_path)
 
-    reader = PdfReader(str(pdf_path))  # Create a PdfReader for the provided path
-    texts = []  # Container to collect text from each page
+def _extract_page_range(pdf_path: str, start: int, stop: int):
+    """Extract pages [start, stop) of one PDF; runs inside a pool worker."""
+    t0 = time.perf_counter()
+    reader = PdfReader(pdf_path)  # Each worker opens its own reader (readers are not picklable)
+    texts = []
 
-    for i, page in enumerate(reader.pages):
+    for i in range(start, stop):
         try:
-            text = page.extract_text() or ""  # Attempt to extract text; default to empty if None
-        except Exception as exc:
-            logger.exception("Error extracting text from page %s of %s", i, pdf_path.name)
+            text = reader.pages[i].extract_text() or ""  # Attempt to extract text; default to empty if None
+        except Exception:
+            logger.exception("Error extracting text from page %s of %s", i, Path(pdf_path).name)
             text = ""  # If extraction fails for a page, fall back to an empty string
-        texts.append(text)  # Store the extracted (or empty) text for this page
+        texts.append(text)
+
+    return pdf_path, start, texts, time.perf_counter() - t0, os.getpid()
+
+
+def _split_ranges(num_pages: int, parts: int) -> list[tuple[int, int]]:
+    """Split page indices 0..num_pages into at most `parts` contiguous ranges."""
+    parts = max(1, min(parts, num_pages))
+    step, extra = divmod(num_pages, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        stop = start + step + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _log_worker_rates(worker_stats: dict, total_pages: int, wall: float) -> None:
+    """Log pages/sec per worker process and overall, to help size the pool."""
+    for pid, (pages, busy) in sorted(worker_stats.items()):
+        rate = pages / busy if busy else 0.0
+        logger.info("Worker pid=%s extracted %s pages in %.2fs (%.1f pages/sec)", pid, pages, busy, rate)
+    overall = total_pages / wall if wall else 0.0
+    logger.info(
+        "Extracted %s pages with %s worker(s) in %.2fs (%.1f pages/sec overall)",
+        total_pages,
+        len(worker_stats),
+        wall,
+        overall,
+    )
+
+
+def extract_pages_from_pdfs(
+    pdf_paths: list[Path],
+    workers: int | None = None,
+    mode: str = "page",
+    use_cache: bool = True,
+) -> dict[Path, list[str]]:
+    """Extract per-page text from several PDFs across a process pool.
+
+    mode="page" splits every file into page ranges so even a single large PDF
+    uses all workers; mode="file" hands each worker whole files. Page order is
+    preserved either way. Files whose bytes were extracted before are served
+    from the extracted-text cache unless use_cache=False.
+    """
+    if mode not in {"page", "file"}:
+        raise ValueError(f"Unknown extraction mode: {mode!r} (expected 'page' or 'file')")
+
+    if not use_cache:
+        return _extract_pages(pdf_paths, workers, mode)
+
+    cache = ExtractedTextCache()
+    t0 = time.perf_counter()
+    pages_by_file, misses = cache.lookup(pdf_paths)
+    if pages_by_file:
+        logger.info(
+            "Extracted-text cache: %s/%s PDF(s) served from cache in %.1f ms",
+            len(pages_by_file),
+            len(pdf_paths),
+            (time.perf_counter() - t0) * 1000,
+        )
+    if misses:
+        extracted = _extract_pages(list(misses), workers, mode)
+        for pdf_path, pages in extracted.items():
+            cache.put(misses[pdf_path], pages, source=pdf_path.name)
+        pages_by_file.update(extracted)
+    return {pdf_path: pages_by_file[pdf_path] for pdf_path in pdf_paths}
+
+
+def _extract_pages(pdf_paths: list[Path], workers: int | None, mode: str) -> dict[Path, list[str]]:
+    """Run pypdf over every page of `pdf_paths` (no cache)."""
+
+    workers = workers or DEFAULT_WORKERS
+    tasks = []  # (path, start, stop) jobs to send to the pool
+    for pdf_path in pdf_paths:
+        num_pages = len(PdfReader(str(pdf_path)).pages)
+        logger.info("Queued %s (%s pages) for %s-mode extraction", pdf_path.name, num_pages, mode)
+        if mode == "file" or workers == 1:
+            tasks.append((str(pdf_path), 0, num_pages))
+        else:
+            for start, stop in _split_ranges(num_pages, workers * RANGES_PER_WORKER):
+                tasks.append((str(pdf_path), start, stop))
+
+    pieces = defaultdict(list)  # path -> [(start, texts), ...]
+    worker_stats = defaultdict(lambda: [0, 0.0])  # pid -> [pages, busy seconds]
+    t0 = time.perf_counter()
+
+    if workers == 1 or len(tasks) <= 1:
+        results = (_extract_page_range(*task) for task in tasks)  # No pool overhead for trivial jobs
+        for path, start, texts, busy, pid in results:
+            pieces[path].append((start, texts))
+            worker_stats[pid][0] += len(texts)
+            worker_stats[pid][1] += busy
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            for path, start, texts, busy, pid in pool.map(_extract_page_range, *zip(*tasks)):
+                pieces[path].append((start, texts))
+                worker_stats[pid][0] += len(texts)
+                worker_stats[pid][1] += busy
+
+    total_pages = sum(stats[0] for stats in worker_stats.values())
+    _log_worker_rates(worker_stats, total_pages, time.perf_counter() - t0)
+
+    pages_by_file = {}
+    for pdf_path in pdf_paths:
+        ordered = sorted(pieces[str(pdf_path)], key=lambda piece: piece[0])  # Restore page order
+        pages_by_file[pdf_path] = [text for _, texts in ordered for text in texts]
+    return pages_by_file
+
+
+def extract_pages_from_pdf(pdf_path: Path, workers: int | None = None, use_cache: bool = True) -> list[str]:
+    """Return the text of each page of a PDF, extracted in parallel (or from the cache)."""
+    logger.info("Opening PDF for extraction: %s", pdf_path)
+    return extract_pages_from_pdfs([pdf_path], workers=workers, mode="page", use_cache=use_cache)[pdf_path]
+
+
+def extract_text_from_pdf(pdf_path: Path, workers: int | None = None, use_cache: bool = True) -> str:
+    """Return all text from a PDF as one big string."""
+    texts = extract_pages_from_pdf(pdf_path, workers=workers, use_cache=use_cache)
 
     joined_text = "\n".join(texts)  # Join all page texts with newlines to form one large string
     logger.info("Extracted %s characters from %s", len(joined_text), pdf_path.name)
     return joined_text
 
 
+def extract_texts_from_pdfs(
+    pdf_paths: list[Path],
+    workers: int | None = None,
+    mode: str = "page",
+    use_cache: bool = True,
+) -> dict[Path, str]:
+    """Return {path: full text} for several PDFs, extracted in one shared pool."""
+    pages_by_file = extract_pages_from_pdfs(pdf_paths, workers=workers, mode=mode, use_cache=use_cache)
+    return {path: "\n".join(pages) for path, pages in pages_by_file.items()}
+
+
 def chunk_text(text: str, chunk_size: int = 1200, overlap: int = 200) -> list[str]:
     """Simple character-based chunking with overlap."""
     logger.info("Chunking text (length=%s) with chunk_size=%s, overlap=%s", len(text), chunk_size, overlap)
@@ -0,0 +1,140 @@
+"""Memory-mapped chunk texts, stored apart from the vector index.
+
+`export_chunk_store` (run by ingest) writes the text of every chunk into one
+contiguous UTF-8 blob, data/chunk_store/chunks.bin, plus an offset table
+keyed by chunk ID (chunks.json, which also carries each chunk's metadata and
+the corpus version). `ChunkStore` maps the blob read-only: ranking works on
+IDs, scores and vectors, and only the chunks that reach the prompt or the
+screen are decoded, straight from the page cache instead of Chroma's SQLite.
+
+Run from: clinical_rag/src
+    python chunk_store.py export             # refresh data/chunk_store/ from Chroma
+    python chunk_store.py show CHUNK_ID      # print one chunk from the store
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CHUNK_STORE_DIR = DATA_DIR / "chunk_store"
+BLOB_FILE = "chunks.bin"
+TABLE_FILE = "chunks.json"
+
+STORE_VERSION = 1
+EXPORT_PAGE_SIZE = 1000  # Chunks fetched from Chroma per get() call
+
+
+def export_chunk_store(collection, out_dir: Path = CHUNK_STORE_DIR, corpus_version: str | None = None) -> int:
+    """Write every chunk's text, offsets and metadata to `out_dir`. Returns the chunk count."""
+    total = collection.count()
+    logger.info("Exporting %s chunk texts from Chroma to %s", total, out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    offsets, metadatas = {}, {}
+    position = 0
+    tmp_blob = out_dir / (BLOB_FILE + ".tmp")
+    with open(tmp_blob, "wb") as fh:
+        for page_start in range(0, total, EXPORT_PAGE_SIZE):
+            page = collection.get(include=["documents", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=page_start)
+            for cid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                data = (doc or "").encode("utf-8")
+                fh.write(data)
+                offsets[cid] = [position, len(data)]
+                metadatas[cid] = meta
+                position += len(data)
+
+    table = {
+        "version": STORE_VERSION,
+        "count": len(offsets),
+        "bytes": position,
+        "corpus_version": corpus_version,
+        "offsets": offsets,
+        "metadatas": metadatas,
+    }
+    tmp_table = out_dir / (TABLE_FILE + ".tmp")
+    tmp_table.write_text(json.dumps(table), encoding="utf-8")
+
+    # Same order as the vector index export: readers reload when chunks.json changes.
+    os.replace(tmp_blob, out_dir / BLOB_FILE)
+    os.replace(tmp_table, out_dir / TABLE_FILE)
+    logger.info("Exported %s chunks (%.1f MB of text)", len(offsets), position / 1e6)
+    return len(offsets)
+
+
+class ChunkStore:
+    """Read-only chunk texts: an offset table in memory, the text itself memory-mapped."""
+
+    def __init__(self, blob, offsets: dict, metadatas: dict, corpus_version=None):
+        self.blob = blob  # mmap, a memoryview of one (index snapshots) or bytes for an empty store
+        self.offsets = offsets
+        self.metadatas = metadatas
+        self.corpus_version = corpus_version
+
+    @classmethod
+    def load(cls, store_dir: Path = CHUNK_STORE_DIR) -> "ChunkStore":
+        table = json.loads((store_dir / TABLE_FILE).read_text(encoding="utf-8"))
+        if table.get("version") != STORE_VERSION:
+            raise ValueError(f"Chunk store version {table.get('version')} != {STORE_VERSION}; re-export it")
+        blob = b""
+        if table["bytes"]:  # mmap refuses empty files
+            with open(store_dir / BLOB_FILE, "rb") as fh:
+                blob = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(blob) != table["bytes"]:
+                blob.close()
+                raise ValueError(f"{BLOB_FILE} does not match {TABLE_FILE}; re-export the chunk store")
+        logger.info("Memory-mapped %s chunk texts (%.1f MB) from %s", table["count"], table["bytes"] / 1e6, store_dir)
+        return cls(blob, table["offsets"], table["metadatas"], table.get("corpus_version"))
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, cid) -> bool:
+        return cid in self.offsets
+
+    def text(self, cid: str) -> str:
+        """Decode one chunk's text (KeyError for unknown IDs)."""
+        start, length = self.offsets[cid]
+        return str(self.blob[start:start + length], "utf-8")
+
+    def texts(self, ids) -> dict:
+        """{chunk id: text} for the IDs present in the store."""
+        return {cid: self.text(cid) for cid in ids if cid in self.offsets}
+
+    def metadata(self, cid: str) -> dict:
+        return self.metadatas[cid]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped chunk text store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="write data/chunk_store/ from the Chroma collection")
+    show = sub.add_parser("show", help="print chunks from the store")
+    show.add_argument("ids", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from rag_core import get_collection  # Chroma is only needed for the export
+        from ingest_manifest import read_corpus_version
+
+        export_chunk_store(get_collection(), corpus_version=read_corpus_version())
+    else:
+        store = ChunkStore.load()
+        for cid in args.ids:
+            if cid not in store:
+                logger.warning("Chunk %s is not in the store", cid)
+                continue
+            print(f"--- {cid} {json.dumps(store.metadata(cid))}")
+            print(store.text(cid))
+
+
+if __name__ == "__main__":
+    main()
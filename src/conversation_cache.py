@@ -0,0 +1,159 @@
+"""Per-session cache of the chunks retrieved for the last few chat turns.
+
+Follow-up questions ("and for PFS?") usually need much of the context the
+previous answer used, but embed poorly on their own. `ConversationCache`
+keeps the chunks (text, metadata, embedding) of the last turns. A new
+question follows up on a turn when it scores within FOLLOW_UP_MARGIN of the
+original on that turn's top chunk; the turn's chunks are then reused if they
+lost no more than that top chunk did (plus REUSE_MARGIN), since a vague
+follow-up matches the whole turn less well rather than only some chunks.
+rag_core reuses at most half of the top-k and searches for the rest.
+
+One instance lives in each Streamlit session (st.session_state), so it is
+not thread-safe; size is bounded by turns, chunk count and bytes.
+"""
+
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+MAX_TURNS = 3  # Turns whose chunks are kept
+MAX_CHUNKS = 24
+MAX_BYTES = 512 * 1024  # Chunk text + embeddings per session
+# Max cosine drop on a turn's top chunk for the new question to count as a follow-up. Scores of one
+# embedding model over one corpus sit in a narrow band (nomic-embed-text: ~0.4-0.8), so keep this small.
+FOLLOW_UP_MARGIN = 0.1
+REUSE_MARGIN = 0.05  # Extra drop allowed on the turn's other chunks, beyond the top chunk's
+MIN_REUSE_SIMILARITY = None  # Optional absolute cosine floor for reuse; None = off
+
+
+class ConversationCache:
+    """Chunks of the last turns of one conversation, keyed by chunk ID (oldest first)."""
+
+    def __init__(self, max_turns: int = MAX_TURNS, max_chunks: int = MAX_CHUNKS, max_bytes: int = MAX_BYTES):
+        self.max_turns = max_turns
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        # chunk id -> {"document", "metadata", "embedding", "similarity", "turn", "bytes"}; "similarity" is
+        # against the question of "turn", the turn that retrieved the chunk
+        self._chunks = OrderedDict()
+        self._turn = 0
+        self._corpus_version = None
+        self.counters = {"turns": 0, "reused_chunks": 0, "searched_chunks": 0}
+        self.last_reused = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._chunks.values())
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def clear(self) -> None:
+        self._chunks.clear()
+
+    def _check_corpus(self, corpus_version) -> None:
+        if corpus_version != self._corpus_version:
+            if self._chunks:
+                logger.info("Corpus changed; dropping %s cached conversation chunks", len(self._chunks))
+            self._chunks.clear()
+            self._corpus_version = corpus_version
+
+    def reusable(self, query_vec, k: int, corpus_version, source_filter=None) -> list[dict]:
+        """Up to k cached chunks still relevant to the query, best first, in retrieve_with_scores' hit format."""
+        self._check_corpus(corpus_version)
+        entries = list(self._chunks.items())
+        if not entries or query_vec is None or k <= 0:
+            return []
+
+        matrix = np.stack([entry["embedding"] for _, entry in entries])
+        q = np.asarray(query_vec, dtype=np.float32)
+        sims = matrix @ q / (np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0) + 1e-12)
+        original = np.asarray([entry["similarity"] for _, entry in entries], dtype=np.float32)
+        turns = np.asarray([entry["turn"] for _, entry in entries])
+        # Per turn: how much the new question lost on the chunk that best matched that turn's question
+        # (inf = not a follow-up of that turn)
+        drop = np.full(len(entries), np.inf, dtype=np.float32)
+        for turn in np.unique(turns):
+            in_turn = np.flatnonzero(turns == turn)
+            top = in_turn[np.argmax(original[in_turn])]
+            if original[top] - sims[top] <= FOLLOW_UP_MARGIN:
+                drop[in_turn] = max(0.0, float(original[top] - sims[top]))
+
+        hits = []
+        for i in np.argsort(-sims, kind="stable"):
+            if len(hits) == k:
+                break
+            cid, entry = entries[i]
+            similarity = float(sims[i])
+            if np.isinf(drop[i]) or similarity < original[i] - drop[i] - REUSE_MARGIN:
+                continue  # Not a follow-up of this chunk's turn, or the chunk lost more than the turn did
+            if source_filter is not None and entry["metadata"].get("source") not in source_filter:
+                continue
+            if MIN_REUSE_SIMILARITY is not None and similarity < MIN_REUSE_SIMILARITY:
+                continue
+            self._chunks.move_to_end(cid)
+            hits.append({
+                "id": cid,
+                "document": entry["document"],
+                "metadata": entry["metadata"],
+                "score": similarity,
+                "similarity": similarity,
+                "embedding": entry["embedding"],
+                "reused": True,
+            })
+        return hits
+
+    def add_turn(self, hits: list[dict], reused: int = 0) -> None:
+        """Remember the chunks one turn's answer used (hits need "embedding"), then enforce the bounds.
+
+        Reused chunks stay filed under the turn that first retrieved them, with
+        that turn's similarity: each turn's follow-up check is then anchored on
+        scores against a single question, and a chain of follow-ups cannot keep
+        a chunk alive past MAX_TURNS.
+        """
+        self._turn += 1
+        for hit in hits:
+            if hit.get("embedding") is None:
+                continue
+            if hit.get("reused") and hit["id"] in self._chunks:
+                continue  # Filed under its original turn; reusable() already refreshed its LRU position
+            self._chunks.pop(hit["id"], None)
+            embedding = np.asarray(hit["embedding"], dtype=np.float32)
+            # Lexical hits have no cosine score; 1.0 means they are only reused for near-identical questions
+            similarity = hit["similarity"] if hit["similarity"] is not None else 1.0
+            self._chunks[hit["id"]] = {
+                "document": hit["document"],
+                "metadata": hit["metadata"],
+                "embedding": embedding,
+                "similarity": similarity,
+                "turn": self._turn,
+                "bytes": len(hit["document"].encode("utf-8")) + embedding.nbytes,
+            }
+        self._evict()
+        self.last_reused = reused
+        self.counters["turns"] += 1
+        self.counters["reused_chunks"] += reused
+        self.counters["searched_chunks"] += len(hits) - reused
+
+    def _evict(self) -> None:
+        oldest_turn = self._turn - self.max_turns + 1
+        for cid in [cid for cid, entry in self._chunks.items() if entry["turn"] < oldest_turn]:
+            del self._chunks[cid]
+        total = self.nbytes
+        while self._chunks and (len(self._chunks) > self.max_chunks or total > self.max_bytes):
+            _, entry = self._chunks.popitem(last=False)
+            total -= entry["bytes"]
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "chunks": len(self._chunks),
+            "bytes": self.nbytes,
+            "last_reused": self.last_reused,
+        }
@@ -0,0 +1,135 @@
+"""Two-tier cache for query embeddings: in-memory LRU backed by SQLite on disk.
+
+Entries are keyed by (embedding model, normalised query text), so repeated
+questions skip the Ollama embedding call entirely, even across restarts.
+Vectors are stored on disk as packed float32 blobs.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CACHE_DIR = DATA_DIR / "cache"
+QUERY_CACHE_PATH = CACHE_DIR / "query_embeddings.sqlite3"
+
+MEMORY_ITEMS = 1024  # Max vectors held in the in-memory LRU tier
+
+
+def normalise_query(text: str) -> str:
+    """Canonical form used as the cache key (Unicode-normalised, case/space-folded)."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Memory LRU -> SQLite -> embedding server, with hit/miss counters.
+
+    `embed_fn(texts) -> list[vector]` is called once per batch of misses.
+    Safe to share across threads.
+    """
+
+    def __init__(self, model: str, embed_fn, path: Path = QUERY_CACHE_PATH, max_items: int = MEMORY_ITEMS):
+        self.model = model
+        self.embed_fn = embed_fn
+        self.max_items = max_items
+        self._memory = OrderedDict()  # normalised query -> vector
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "embed_seconds": 0.0}
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, query))"
+        )
+        self._db.commit()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)  # Evict least recently used
+
+    def get_many(self, texts: list[str]) -> list[list[float]]:
+        """Return one embedding per text, embedding only the cache misses."""
+        keys = [normalise_query(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self._counters["memory_hits"] += 1
+                    continue
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?",
+                    (self.model, key),
+                ).fetchone()
+                if row is not None:
+                    found[key] = array("f", row[0]).tolist()
+                    self._remember(key, found[key])
+                    self._counters["disk_hits"] += 1
+
+        # Embed misses outside the lock so slow server calls don't block hits
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            first_text = {}
+            for text, key in zip(texts, keys):
+                first_text.setdefault(key, text.strip())
+            t0 = time.perf_counter()
+            vectors = self.embed_fn([first_text[k] for k in missing])
+            elapsed = time.perf_counter() - t0
+
+            with self._lock:
+                self._counters["misses"] += len(missing)
+                self._counters["embed_seconds"] += elapsed
+                for key, vector in zip(missing, vectors):
+                    vector = list(vector)
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (model, query, vector) VALUES (?, ?, ?)",
+                        (self.model, key, array("f", vector).tobytes()),
+                    )
+                self._db.commit()
+
+        return [found[k] for k in keys]
+
+    def get(self, text: str) -> list[float]:
+        """Return the embedding for a single query text."""
+        return self.get_many([text])[0]
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus the embedding time the hits are estimated to have saved."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        avg_embed = stats["embed_seconds"] / stats["misses"] if stats["misses"] else 0.0
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["avg_embed_ms"] = avg_embed * 1000
+        stats["est_saved_ms"] = hits * avg_embed * 1000
+        return stats
+
+    def clear(self) -> None:
+        """Drop every cached vector for this model (both tiers)."""
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM query_embeddings WHERE model = ?", (self.model,))
+            self._db.commit()
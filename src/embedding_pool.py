@@ -0,0 +1,272 @@
+"""Batched, concurrent embedding stage for ingestion with retry and checkpointing.
+
+Chunks are split into fixed-size batches, embedded by a bounded pool of
+threads (each thread has at most one request in flight against the Ollama
+server), retried with exponential backoff on failure, and upserted into
+Chroma with precomputed embeddings. Every written chunk is appended to a
+checkpoint file so a crashed run resumes where it stopped.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from ingest_manifest import text_sha256
+from model_manager import get_model_manager
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CHECKPOINT_PATH = DATA_DIR / "chroma_db" / "embed_checkpoint.jsonl"
+
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+EMBED_MODEL_NAME = "nomic-embed-text"
+
+BATCH_SIZE = 32  # Chunks per embedding request
+MAX_WORKERS = 4  # Concurrent embedding requests in flight
+MAX_RETRIES = 4  # Extra attempts per batch after the first failure
+BACKOFF_BASE = 0.5  # Seconds; doubled on every retry, plus jitter
+
+BATCH_WINDOW = 0.005  # Seconds the micro-batcher waits for more concurrent query embeddings
+
+
+def embed_texts(texts: list[str], model: str = EMBED_MODEL_NAME, url: str = OLLAMA_URL) -> list[list[float]]:
+    """Embed a list of texts with one Ollama `/api/embed` request (pooled client, shared keep-alive)."""
+    embeddings = get_model_manager(url).embed(texts, model=model)["embeddings"]
+    if len(embeddings) != len(texts):
+        raise RuntimeError(f"Embedding server returned {len(embeddings)} vectors for {len(texts)} texts")
+    return embeddings
+
+
+def embed_with_retry(
+    texts: list[str],
+    model: str = EMBED_MODEL_NAME,
+    url: str = OLLAMA_URL,
+    max_retries: int = MAX_RETRIES,
+    backoff_base: float = BACKOFF_BASE,
+) -> list[list[float]]:
+    """Embed one batch, retrying with exponential backoff and jitter."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embed_texts(texts, model=model, url=url)
+        except Exception as exc:
+            if attempt == max_retries:
+                raise
+            delay = backoff_base * (2 ** attempt) * (1 + random.random())
+            logger.warning(
+                "Embedding batch of %s failed (%s); retry %s/%s in %.2fs",
+                len(texts),
+                exc,
+                attempt + 1,
+                max_retries,
+                delay,
+            )
+            time.sleep(delay)
+
+
+class EmbeddingCheckpoint:
+    """Append-only record of chunks (ID + text hash) already written to Chroma."""
+
+    def __init__(self, path: Path = CHECKPOINT_PATH):
+        self.path = path
+        self.done = {}  # chunk id -> text hash
+        if path.exists():
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn last line from a crash; everything before it is valid
+                    self.done[entry["id"]] = entry["hash"]
+            logger.info("Loaded embedding checkpoint with %s chunks from %s", len(self.done), path)
+
+    def is_done(self, cid: str, doc_hash: str) -> bool:
+        return self.done.get(cid) == doc_hash
+
+    def mark(self, ids: list[str], hashes: list[str]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            for cid, doc_hash in zip(ids, hashes):
+                fh.write(json.dumps({"id": cid, "hash": doc_hash}) + "\n")
+                self.done[cid] = doc_hash
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def clear(self) -> None:
+        self.done = {}
+        if self.path.exists():
+            self.path.unlink()
+
+
+class EmbeddingBatcher:
+    """Coalesce embedding calls from concurrent threads into one request per time window.
+
+    `embed(texts)` blocks until its vectors are ready. A background thread
+    collects everything submitted within `window` seconds of the first pending
+    request (up to `max_batch` texts) and sends it as one `embed_fn` call.
+    """
+
+    def __init__(self, embed_fn, window: float = BATCH_WINDOW, max_batch: int = BATCH_SIZE * 2):
+        self.embed_fn = embed_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []  # [(texts, Future)]
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"requests": 0, "texts": 0, "batches": 0}  # Guarded by _cond
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._pending.append((list(texts), future))
+            self._cond.notify()
+        return future.result()
+
+    def stats(self) -> dict:
+        """Requests, texts and embedding calls handled so far."""
+        with self._cond:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while not self._closed and sum(len(t) for t, _ in self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, size = [], 0
+            while self._pending and (not batch or size + len(self._pending[0][0]) <= self.max_batch):
+                texts, future = self._pending.pop(0)
+                batch.append((texts, future))
+                size += len(texts)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return  # Closed and drained
+            flat = [text for texts, _ in batch for text in texts]
+            try:
+                vectors = self.embed_fn(flat)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            offset = 0
+            for texts, future in batch:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+            with self._cond:
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += len(flat)
+                self._stats["batches"] += 1
+            if len(batch) > 1:
+                logger.debug("Micro-batched %s embedding requests (%s texts) into one call", len(batch), len(flat))
+
+
+def embed_and_upsert(
+    collection,
+    ids: list[str],
+    docs: list[str],
+    metas: list[dict],
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = MAX_WORKERS,
+    max_retries: int = MAX_RETRIES,
+    model: str = EMBED_MODEL_NAME,
+    url: str = OLLAMA_URL,
+    checkpoint: EmbeddingCheckpoint | None = None,
+    backoff_base: float = BACKOFF_BASE,
+) -> dict:
+    """Embed chunks in concurrent batches and upsert them into `collection`.
+
+    Chunks already recorded in `checkpoint` (same ID and text) are skipped.
+    Returns stats including chunks/sec throughput.
+    """
+    hashes = [text_sha256(doc) for doc in docs]
+    todo = [i for i, cid in enumerate(ids) if checkpoint is None or not checkpoint.is_done(cid, hashes[i])]
+    skipped = len(ids) - len(todo)
+    if skipped:
+        logger.info("Checkpoint: %s/%s chunks already embedded; resuming with %s", skipped, len(ids), len(todo))
+
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    logger.info(
+        "Embedding %s chunks in %s batches (batch_size=%s, workers=%s)",
+        len(todo),
+        len(batches),
+        batch_size,
+        max_workers,
+    )
+
+    t0 = time.perf_counter()
+    written = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as pool:
+        futures = {
+            pool.submit(embed_with_retry, [docs[i] for i in batch], model, url, max_retries, backoff_base): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            embeddings = future.result()  # Raises after retries are exhausted; checkpoint keeps progress
+            collection.upsert(
+                ids=[ids[i] for i in batch],
+                embeddings=embeddings,
+                documents=[docs[i] for i in batch],
+                metadatas=[metas[i] for i in batch],
+            )
+            if checkpoint is not None:
+                checkpoint.mark([ids[i] for i in batch], [hashes[i] for i in batch])
+            written += len(batch)
+
+    elapsed = time.perf_counter() - t0
+    rate = written / elapsed if elapsed else 0.0
+    logger.info("Embedded and upserted %s chunks in %.2fs (%.1f chunks/sec)", written, elapsed, rate)
+    return {"embedded": written, "skipped": skipped, "seconds": elapsed, "chunks_per_sec": rate}
+
+
+def _demo():
+    """Embed a few hundred synthetic chunks against a local fake Ollama server."""
+    from fake_ollama import start_fake_ollama
+
+    class _ListCollection:
+        """Minimal stand-in for a Chroma collection that just counts upserts."""
+
+        def __init__(self):
+            self.rows = {}
+
+        def upsert(self, ids, embeddings, documents, metadatas):
+            self.rows.update(zip(ids, embeddings))
+
+    server = start_fake_ollama(latency=0.02, fail_rate=0.1)
+    try:
+        docs = [f"Synthetic chunk {i} about estimands and intercurrent events." for i in range(500)]
+        ids = [f"demo_{i}" for i in range(len(docs))]
+        metas = [{"source": "demo", "chunk_index": i} for i in range(len(docs))]
+        collection = _ListCollection()
+        stats = embed_and_upsert(collection, ids, docs, metas, url=server.url, max_retries=6)
+        logger.info("Demo stats: %s; collection rows=%s", stats, len(collection.rows))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    _demo()
@@ -0,0 +1,241 @@
+"""Deterministic stand-in for the Ollama HTTP API, for local testing without models.
+
+Serves `POST /api/embed` with hash-based embeddings (the same text always maps
+to the same unit vector) and `POST /api/chat` with a canned answer derived
+from the question, streamed or not. Latency can be added per request and per
+generated token, and a share of requests can fail so retry paths get exercised.
+Models are "loaded" on first use (optionally slowly, see `load_latency`) and
+honour Ollama's keep_alive=0 unload and empty-request preload calls.
+
+Run from: clinical_rag/src
+    python fake_ollama.py --port 11435 --latency 0.05
+    OLLAMA_HOST=http://127.0.0.1:11435 python ingest.py
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+EMBED_DIM = 768  # Same width as nomic-embed-text
+TOKEN_RE = re.compile(r"\w+")
+ANSWER_TOKENS = 64  # Tokens in every fake chat answer
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
+    """Bag-of-hashed-tokens unit vector: texts sharing words get similar vectors."""
+    vec = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def fake_answer_tokens(messages: list[dict], n_tokens: int = ANSWER_TOKENS) -> list[str]:
+    """Deterministic answer for a chat request, as a list of streamed tokens."""
+    question = messages[-1].get("content", "") if messages else ""
+    words = TOKEN_RE.findall(question.split("Question:")[-1]) or ["guidelines"]
+    tokens = ["Based", " on", " the", " provided", " guidelines", ":"]
+    i = 0
+    while len(tokens) < n_tokens:
+        tokens.append(" " + words[i % len(words)])
+        i += 1
+    return tokens[:n_tokens]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Request handler; behaviour is read from attributes set on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # Route http.server chatter through logging
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: dict):
+        """Write one NDJSON line as an HTTP/1.1 chunk."""
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _load_model(self, payload: dict) -> int:
+        """Simulate model residency; returns the load_duration (ns) this request paid."""
+        server = self.server
+        model = payload.get("model", "")
+        if payload.get("keep_alive") in (0, "0"):
+            with server.lock:
+                server.loaded_models.discard(model)
+            return 0
+        with server.lock:
+            cold = model not in server.loaded_models
+            server.loaded_models.add(model)
+        if not cold:
+            return 0
+        time.sleep(server.load_latency)
+        return int(server.load_latency * 1e9)
+
+    def _chat(self, payload: dict):
+        server = self.server
+        model = payload.get("model", "")
+        load_duration = self._load_model(payload)
+        if not payload.get("messages"):  # Preload/unload request
+            self._send_json(200, {
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "done_reason": "unload" if payload.get("keep_alive") in (0, "0") else "load",
+                "load_duration": load_duration,
+            })
+            return
+        tokens = fake_answer_tokens(payload["messages"], server.answer_tokens)
+        t0 = time.perf_counter()
+
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(server.token_latency)
+                self._send_chunk({"model": model, "message": {"role": "assistant", "content": token}, "done": False})
+            self._send_chunk({
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "done_reason": "stop",
+                "eval_count": len(tokens),
+                "eval_duration": int((time.perf_counter() - t0) * 1e9),
+                "load_duration": load_duration,
+            })
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        time.sleep(server.token_latency * len(tokens))
+        self._send_json(200, {
+            "model": model,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "done": True,
+            "done_reason": "stop",
+            "eval_count": len(tokens),
+            "eval_duration": int((time.perf_counter() - t0) * 1e9),
+            "load_duration": load_duration,
+        })
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        server = self.server
+        payload = self._read_json()
+        time.sleep(server.latency)
+        with server.lock:
+            server.request_counts[self.path] = server.request_counts.get(self.path, 0) + 1
+
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            self._send_json(503, {"error": "fake_ollama: injected failure"})
+            return
+
+        if self.path == "/api/embed":
+            load_duration = self._load_model(payload)
+            texts = payload.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+            self._send_json(200, {
+                "model": payload.get("model", ""),
+                "embeddings": [fake_embedding(t, server.dim) for t in texts],
+                "load_duration": load_duration,
+            })
+        elif self.path == "/api/chat":
+            self._chat(payload)
+        else:
+            self._send_json(404, {"error": f"fake_ollama: unsupported endpoint {self.path}"})
+
+
+def start_fake_ollama(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    fail_rate: float = 0.0,
+    dim: int = EMBED_DIM,
+    seed: int = 0,
+    token_latency: float = 0.0,
+    answer_tokens: int = ANSWER_TOKENS,
+    load_latency: float = 0.0,
+) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread; port=0 picks a free port.
+
+    `latency` is added to every request (time to first token for chat);
+    `token_latency` is added per generated chat token; `load_latency` to the
+    first request for a model that is not loaded.
+
+    The returned server exposes `.url` and `.request_counts`; call
+    `.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.dim = dim
+    server.token_latency = token_latency
+    server.answer_tokens = answer_tokens
+    server.load_latency = load_latency
+    server.loaded_models = set()
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.request_counts = {}
+    server.url = f"http://{host}:{server.server_address[1]}"
+
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    logger.info("Fake Ollama listening on %s (latency=%.3fs, fail_rate=%.2f)", server.url, latency, fail_rate)
+    return server
+
+
+def main():
+    """Run the fake server in the foreground."""
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per generated chat token")
+    parser.add_argument("--answer-tokens", type=int, default=ANSWER_TOKENS, help="tokens in every chat answer")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="seconds to 'load' a model on first use")
+    args = parser.parse_args()
+
+    server = start_fake_ollama(
+        args.host,
+        args.port,
+        args.latency,
+        args.fail_rate,
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens,
+        load_latency=args.load_latency,
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("Stopping fake Ollama.")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Single-file, versioned snapshot of the whole retrieval index, for fast cold starts.
+
+`export_snapshot` packs what ingest leaves on disk into one file: the float32
+embedding matrix, chunk texts, ids/metadata with the per-guideline
+centroids, the BM25 postings, the ingest manifest and the chunking/embedding
+config. Each section starts on a 64-byte boundary after a JSON header, so
+`load_snapshot` maps the file once and reads every section in place (the
+matrix is a NumPy view of the mapping, chunk texts are sliced out of it).
+
+With RAG_SNAPSHOT=/path/to/file rag_core serves retrieval from the snapshot
+through `SnapshotCollection`, a read-only stand-in for the Chroma collection,
+so a fresh node never opens data/chroma_db/. `import` unpacks a snapshot
+into data/ (including the Chroma collection, from the stored embeddings) for
+nodes that should ingest incrementally from there.
+
+The snapshot has no HNSW graph: Chroma's segment files are only readable by
+Chroma, so search is exact over the mapped matrix, narrowed by guideline
+partitions and centroid routing as with RAG_RETRIEVAL_BACKEND=numpy.
+
+Run from: clinical_rag/src
+    python index_snapshot.py export                        # data/snapshots/index-<corpus version>.ragsnap
+    python index_snapshot.py info data/snapshots/index-*.ragsnap
+    python index_snapshot.py import data/snapshots/index-*.ragsnap
+    RAG_SNAPSHOT=../data/snapshots/index-<version>.ragsnap streamlit run app.py
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chunk_store import BLOB_FILE, CHUNK_STORE_DIR, STORE_VERSION, TABLE_FILE, ChunkStore
+from ingest_manifest import MANIFEST_PATH
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+from vector_index import INDEX_VERSION, MATRIX_FILE, META_FILE, VECTOR_INDEX_DIR, NumpyVectorIndex
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
+
+MAGIC = b"RAGSNAP\0"
+SNAPSHOT_VERSION = 1
+ALIGN = 64  # Section alignment; keeps the float32 matrix aligned for NumPy
+PREFIX = struct.Struct("<8sQ")  # magic, header length
+COPY_BUFFER = 16 * 1024 * 1024
+IMPORT_BATCH_SIZE = 1000  # Chunks per Chroma upsert when importing
+
+
+def _padding(position: int) -> int:
+    return -position % ALIGN
+
+
+def _section_sources() -> dict:
+    """Files that make up a snapshot, by section name."""
+    return {
+        "embeddings": VECTOR_INDEX_DIR / MATRIX_FILE,
+        "chunk_text": CHUNK_STORE_DIR / BLOB_FILE,
+        "lexical": LEXICAL_INDEX_PATH,
+        "manifest": MANIFEST_PATH,
+    }
+
+
+def export_snapshot(out_path: Path | None = None) -> Path:
+    """Pack the current vector index, chunk store, BM25 index and manifest into one file.
+
+    All of them must come from the same ingest run; run ingest.py first if not.
+    Returns the snapshot path (data/snapshots/index-<corpus version>.ragsnap by default).
+    """
+    manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    index_meta = json.loads((VECTOR_INDEX_DIR / META_FILE).read_text(encoding="utf-8"))
+    table = json.loads((CHUNK_STORE_DIR / TABLE_FILE).read_text(encoding="utf-8"))
+    version = manifest.get("corpus_version")
+    for name, other in (("vector index", index_meta), ("chunk store", table)):
+        if other.get("corpus_version") != version:
+            raise ValueError(f"The {name} does not match the ingest manifest ({version}); run ingest.py first")
+
+    index_section = json.dumps({
+        "ids": index_meta["ids"],
+        "metadatas": index_meta["metadatas"],
+        "centroids": index_meta.get("centroids"),
+        "offsets": table["offsets"],
+    }).encode("utf-8")
+    files = _section_sources()
+    lengths = {name: path.stat().st_size for name, path in files.items()}
+    lengths["index"] = len(index_section)
+
+    sections, position = {}, 0
+    for name in ("embeddings", "chunk_text", "index", "lexical", "manifest"):
+        sections[name] = [position, lengths[name]]
+        position += lengths[name] + _padding(lengths[name])
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "created": time.time(),
+        "corpus_version": version,
+        "config": manifest.get("config", {}),
+        "count": index_meta["count"],
+        "dim": index_meta["dim"],
+        "sections": sections,  # name -> [offset from the data start, length]
+    }).encode("utf-8")
+
+    out_path = Path(out_path or SNAPSHOT_DIR / f"index-{version}.ragsnap")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    t0 = time.perf_counter()
+    with open(tmp_path, "wb") as out:
+        out.write(PREFIX.pack(MAGIC, len(header)) + header)
+        out.write(b"\0" * _padding(PREFIX.size + len(header)))
+        for name in sections:
+            if name == "index":
+                out.write(index_section)
+            else:
+                with open(files[name], "rb") as src:
+                    shutil.copyfileobj(src, out, COPY_BUFFER)
+            out.write(b"\0" * _padding(lengths[name]))
+    os.replace(tmp_path, out_path)
+    logger.info(
+        "Wrote snapshot %s: %s chunks, %.1f MB in %.2fs",
+        out_path,
+        index_meta["count"],
+        out_path.stat().st_size / 1e6,
+        time.perf_counter() - t0,
+    )
+    return out_path
+
+
+class Snapshot:
+    """A memory-mapped snapshot file and the indexes viewed out of it."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            self._map.madvise(mmap.MADV_WILLNEED)  # Start one sequential read-ahead of the whole file
+        magic, header_len = PREFIX.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an index snapshot")
+        self.header = json.loads(self._map[PREFIX.size:PREFIX.size + header_len])
+        if self.header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {self.header.get('version')} != {SNAPSHOT_VERSION}; re-export it")
+        self._data_start = PREFIX.size + header_len + _padding(PREFIX.size + header_len)
+        self.corpus_version = self.header["corpus_version"]
+        self.config = self.header.get("config", {})
+
+        count, dim = self.header["count"], self.header["dim"]
+        offset, _ = self.header["sections"]["embeddings"]
+        matrix = np.frombuffer(self._map, dtype=np.float32, count=count * dim, offset=self._data_start + offset)
+        index = json.loads(bytes(self.section("index")))
+        self.vector_index = NumpyVectorIndex(
+            matrix.reshape(count, dim), index["ids"], index["metadatas"], self.corpus_version, index["centroids"]
+        )
+        self.chunk_store = ChunkStore(
+            self.section("chunk_text"),
+            index["offsets"],
+            dict(zip(index["ids"], index["metadatas"])),
+            self.corpus_version,
+        )
+        self.lexical = LexicalIndex.from_dict(json.loads(bytes(self.section("lexical"))))
+
+    def section(self, name: str) -> memoryview:
+        """Zero-copy view of one section of the file."""
+        offset, length = self.header["sections"][name]
+        start = self._data_start + offset
+        return memoryview(self._map)[start:start + length]
+
+
+def load_snapshot(path: Path) -> Snapshot:
+    t0 = time.perf_counter()
+    snapshot = Snapshot(path)
+    logger.info(
+        "Loaded snapshot %s (%s chunks, corpus %s) in %.3fs",
+        path,
+        len(snapshot.vector_index),
+        snapshot.corpus_version,
+        time.perf_counter() - t0,
+    )
+    return snapshot
+
+
+class SnapshotCollection:
+    """Read-only stand-in for the Chroma collection, answering get/query/count from a snapshot.
+
+    Only the parts of the Chroma API that rag_core uses are implemented; the
+    only supported `where` filter is {"source": {"$in": [...]}}.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.index = snapshot.vector_index
+        self.store = snapshot.chunk_store
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def _fields(self, ids: list[str], include) -> dict:
+        rows = [self.index.row_of[cid] for cid in ids]
+        result = {"ids": ids}
+        if "documents" in include:
+            result["documents"] = [self.store.text(cid) for cid in ids]
+        if "metadatas" in include:
+            result["metadatas"] = [self.index.metadatas[r] for r in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [self.index.matrix[r] for r in rows]
+        return result
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, offset=0) -> dict:
+        if ids is None:
+            ids = self.index.ids[offset:offset + limit if limit is not None else None]
+        else:
+            ids = [cid for cid in ids if cid in self.index.row_of]  # Chroma skips unknown IDs too
+        return self._fields(list(ids), include)
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=("documents", "metadatas", "distances")):
+        rows = self.index.rows_for_sources(where["source"]["$in"]) if where else None
+        result = {key: [] for key in ("ids", *include)}
+        for query_vec in query_embeddings:
+            top, dists = self.index.search(query_vec, n_results, rows=rows)
+            fields = self._fields([self.index.ids[r] for r in top], include)
+            fields["distances"] = dists.tolist()
+            for key in result:
+                result[key].append(fields[key])
+        return result
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def import_snapshot(path: Path, chroma: bool = True) -> dict:
+    """Unpack a snapshot into data/: exports, BM25 index, manifest and (optionally) the Chroma collection.
+
+    Chroma gets the stored embeddings, so no embedding model is called, and
+    chunks missing from the snapshot are deleted from it.
+    Returns the snapshot header.
+    """
+    snapshot = load_snapshot(path)
+    files = _section_sources()
+    for name in ("embeddings", "chunk_text", "lexical"):
+        files[name].parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = files[name].with_name(files[name].name + ".tmp")
+        tmp_path.write_bytes(snapshot.section(name))
+        os.replace(tmp_path, files[name])
+
+    index, store = snapshot.vector_index, snapshot.chunk_store
+    meta = {
+        "version": INDEX_VERSION,
+        "count": len(index),
+        "dim": int(index.matrix.shape[1]),
+        "corpus_version": snapshot.corpus_version,
+        "ids": index.ids,
+        "metadatas": index.metadatas,
+        "centroids": {src: np.asarray(vec).tolist() for src, vec in index.centroids.items()},
+    }
+    _write_json_atomic(VECTOR_INDEX_DIR / META_FILE, meta)
+    table = {
+        "version": STORE_VERSION,
+        "count": len(store),
+        "bytes": len(snapshot.section("chunk_text")),
+        "corpus_version": snapshot.corpus_version,
+        "offsets": store.offsets,
+        "metadatas": store.metadatas,
+    }
+    _write_json_atomic(CHUNK_STORE_DIR / TABLE_FILE, table)
+
+    if chroma:
+        from ingest import build_client_and_collection  # Chroma is only needed here
+
+        _, collection = build_client_and_collection()
+        # Chunks the snapshot does not have (e.g. from an older ingest) would otherwise keep being retrieved
+        wanted = set(index.ids)
+        existing = collection.get(include=[])["ids"]
+        extra = [cid for cid in existing if cid not in wanted]
+        for start in range(0, len(extra), IMPORT_BATCH_SIZE):
+            collection.delete(ids=extra[start:start + IMPORT_BATCH_SIZE])
+        if extra:
+            logger.info("Deleted %s Chroma chunks that are not in the snapshot", len(extra))
+        for start in range(0, len(index), IMPORT_BATCH_SIZE):
+            ids = index.ids[start:start + IMPORT_BATCH_SIZE]
+            collection.upsert(
+                ids=ids,
+                embeddings=index.matrix[start:start + len(ids)].tolist(),
+                documents=[store.text(cid) for cid in ids],
+                metadatas=index.metadatas[start:start + len(ids)],
+            )
+        logger.info("Imported %s chunks into Chroma", len(index))
+
+    # The manifest lands last: it is what readers and ingest treat as "this corpus is ready"
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_manifest = MANIFEST_PATH.with_suffix(".tmp")
+    tmp_manifest.write_bytes(snapshot.section("manifest"))
+    os.replace(tmp_manifest, MANIFEST_PATH)
+    logger.info("Imported snapshot %s (corpus %s) into %s", path, snapshot.corpus_version, DATA_DIR)
+    return snapshot.header
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, inspect or import single-file index snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="pack the current index into one file")
+    export.add_argument("--out", type=Path, default=None, help="snapshot path (default data/snapshots/...)")
+    info = sub.add_parser("info", help="print a snapshot's header and load time")
+    info.add_argument("path", type=Path)
+    restore = sub.add_parser("import", help="unpack a snapshot into data/")
+    restore.add_argument("path", type=Path)
+    restore.add_argument("--no-chroma", action="store_true", help="skip rebuilding the Chroma collection")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(export_snapshot(args.out))
+    elif args.command == "info":
+        print(json.dumps(load_snapshot(args.path).header, indent=2))
+    else:
+        import_snapshot(args.path, chroma=not args.no_chroma)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 """Ingestion script that chunks PDFs and loads them into Chroma with logging."""
 
+import argparse
+import json
 import logging
+import os
+import time
 from pathlib import Path
 
 import chromadb  # Vector database client used for persistence and search
 from chromadb.utils import embedding_functions  # Helpers for embedding backends
 
 # Reuse the PDF extraction and chunking helpers from the shared utils
-from text_utils import extract_text_from_pdf, chunk_text
+from text_utils import extract_texts_from_pdfs, chunk_text
+from ingest_manifest import MANIFEST_PATH, file_sha256, load_manifest, save_manifest, text_sha256
+from embedding_pool import EmbeddingCheckpoint, embed_and_upsert
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+from vector_index import VECTOR_INDEX_DIR, META_FILE, export_collection
+from chunk_store import CHUNK_STORE_DIR, TABLE_FILE, export_chunk_store
 
 # Consistent logging so CLI runs emit the same detail.
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
@@ -16,10 +25,11 @@ logger = logging.getLogger(__name__)
 
 # Resolve the project root (.../clinical_rag) relative to this file
 BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
 # Folder containing the source PDF documents to ingest
-PDF_DIR = BASE_DIR / "data" / "pdfs"
+PDF_DIR = DATA_DIR / "pdfs"
 # Folder where the Chroma persistent database will live
-CHROMA_DIR = BASE_DIR / "data" / "chroma_db"
+CHROMA_DIR = DATA_DIR / "chroma_db"
 
 # Name for the Chroma collection that will store the ingested chunks
 COLLECTION_NAME = "clinical_guidelines"
@@ -28,6 +38,21 @@ COLLECTION_NAME = "clinical_guidelines"
 CHUNK_SIZE = 1200  # Number of characters per chunk
 OVERLAP = 200  # Characters of overlap between adjacent chunks
 
+# Embedding model used for the collection (part of the manifest config)
+EMBED_MODEL_NAME = "nomic-embed-text"
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Embedding stage: chunks per request, concurrent requests, retries per batch
+EMBED_BATCH_SIZE = 32
+EMBED_WORKERS = 4
+EMBED_RETRIES = 4
+
+# Extraction pool size (None = one process per core)
+EXTRACT_WORKERS = None
+
+# Seconds between folder scans in --watch mode
+WATCH_INTERVAL = 5.0
+
 
 def build_client_and_collection():
     """Create a Chroma client and collection configured with Ollama embeddings."""
@@ -36,8 +61,8 @@ def build_client_and_collection():
 
     # Configure an embedding function that calls the local Ollama server
     ollama_ef = embedding_functions.OllamaEmbeddingFunction(
-        model_name="nomic-embed-text",
-        url="http://localhost:11434",
+        model_name=EMBED_MODEL_NAME,
+        url=OLLAMA_URL,
     )
 
     # Get or create the target collection, binding it to the embedding function
@@ -49,64 +74,234 @@ def build_client_and_collection():
     return client, collection
 
 
-def ingest_pdfs():
-    """Read all PDFs in PDF_DIR, chunk them, and add chunks to Chroma."""
+def chunking_config() -> dict:
+    """Return the settings that, if changed, invalidate every stored chunk."""
+    return {"chunk_size": CHUNK_SIZE, "overlap": OVERLAP, "embed_model": EMBED_MODEL_NAME}
+
+
+def build_chunk_records(pdf_path: Path, text: str):
+    """Chunk one document and return (ids, docs, metas) for Chroma."""
+    chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
+    logger.info("Created %s chunks from %s", len(chunks), pdf_path.name)
+
+    ids, docs, metas = [], [], []
+    for idx, chunk in enumerate(chunks):
+        ids.append(f"{pdf_path.stem}_{idx}")  # Unique ID combines the PDF stem and chunk index
+        docs.append(chunk)
+        metas.append({"source": pdf_path.name, "chunk_index": idx})
+    return ids, docs, metas
+
+
+def vector_index_is_current(manifest: dict) -> bool:
+    """True if data/vector_index/ was exported from the corpus the manifest describes."""
+    try:
+        meta = json.loads((VECTOR_INDEX_DIR / META_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return meta.get("corpus_version") == manifest.get("corpus_version")
+
+
+def chunk_store_is_current(manifest: dict) -> bool:
+    """True if data/chunk_store/ was exported from the corpus the manifest describes."""
+    try:
+        table = json.loads((CHUNK_STORE_DIR / TABLE_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return table.get("corpus_version") == manifest.get("corpus_version")
+
+
+def ingest_pdfs(collection=None, force: bool = False) -> dict:
+    """Bring the Chroma collection in line with the PDFs in PDF_DIR.
+
+    Unchanged PDFs (same bytes, same chunking config) are skipped, changed
+    chunks are upserted, and chunk IDs that disappeared are deleted. Returns a
+    small summary dict of what was done.
+    """
+    summary = {
+        "skipped": 0,
+        "updated": 0,
+        "removed": 0,
+        "upserted_chunks": 0,
+        "deleted_chunks": 0,
+        "embed_seconds": 0.0,
+    }
+
     if not PDF_DIR.exists():
         logger.error("PDF directory not found: %s", PDF_DIR)
-        return
+        return summary
 
     pdf_files = sorted(PDF_DIR.glob("*.pdf"))  # Collect all PDF files, sorted for consistent ordering
-    if not pdf_files:
-        logger.warning("No PDFs found in %s", PDF_DIR)
-        return
-
     logger.info("Found %s PDF(s): %s", len(pdf_files), ", ".join(f.name for f in pdf_files))
 
+    manifest = load_manifest(MANIFEST_PATH)
+    config = chunking_config()
+    if manifest["config"] != config:
+        if manifest["files"]:
+            logger.info("Chunking config changed (%s -> %s); re-chunking every PDF", manifest["config"], config)
+        force = True
+        manifest["config"] = config
+
+    lexical = LexicalIndex.load(LEXICAL_INDEX_PATH)
+    lexical_sources = lexical.sources()
+
+    # Decide which PDFs need work by comparing content hashes with the manifest.
+    # PDFs with chunks but missing from the lexical index are re-chunked too (embeddings are
+    # still skipped); PDFs that yielded no chunks (e.g. scanned pages) never appear there.
+    hashes = {pdf_path.name: file_sha256(pdf_path) for pdf_path in pdf_files}
+    changed = [
+        pdf_path
+        for pdf_path in pdf_files
+        if force
+        or manifest["files"].get(pdf_path.name, {}).get("sha256") != hashes[pdf_path.name]
+        or (manifest["files"][pdf_path.name]["chunks"] and pdf_path.name not in lexical_sources)
+    ]
+    removed = sorted(set(manifest["files"]) - set(hashes))
+    summary["skipped"] = len(pdf_files) - len(changed)
+
+    if not changed and not removed:
+        logger.info("All %s PDF(s) unchanged; nothing to ingest", len(pdf_files))
+        stale_exports = [
+            (name, export)
+            for name, is_current, export in (
+                ("NumPy vector index", vector_index_is_current, export_collection),
+                ("Chunk text store", chunk_store_is_current, export_chunk_store),
+            )
+            if manifest["files"] and not is_current(manifest)
+        ]
+        for name, export in stale_exports:
+            logger.info("%s is missing or stale; exporting it", name)
+            if collection is None:
+                _, collection = build_client_and_collection()
+            export(collection, corpus_version=manifest["corpus_version"])
+        return summary
+
     # Prepare Chroma client and collection for ingestion
-    client, collection = build_client_and_collection()
+    if collection is None:
+        _, collection = build_client_and_collection()
 
-    # Accumulators for IDs, documents, and metadata to send to Chroma
-    all_ids, all_docs, all_metas = [], [], []
+    # Drop every chunk belonging to PDFs that were removed from the folder
+    for name in removed:
+        stale_ids = list(manifest["files"][name]["chunks"])
+        logger.info("PDF %s was removed; deleting %s chunks", name, len(stale_ids))
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        del manifest["files"][name]
+        lexical.remove_source(name)
+        summary["removed"] += 1
+        summary["deleted_chunks"] += len(stale_ids)
+        lexical.save()
+        save_manifest(manifest, MANIFEST_PATH)
 
-    # Process each PDF file one by one
-    for pdf_path in pdf_files:
-        logger.info("Processing: %s", pdf_path.name)
+    checkpoint = EmbeddingCheckpoint()  # Lets a crashed run skip chunks it already wrote
+
+    if changed:
+        logger.info("Re-ingesting %s changed PDF(s): %s", len(changed), ", ".join(p.name for p in changed))
+        # Extract raw text from the changed PDFs only, spreading pages over all cores
+        texts = extract_texts_from_pdfs(changed, workers=EXTRACT_WORKERS)
 
-        # Extract raw text from the PDF
-        text = extract_text_from_pdf(pdf_path)
+    for pdf_path in changed:
+        logger.info("Processing: %s", pdf_path.name)
+        text = texts[pdf_path]
         logger.info("Extracted %s characters from %s", len(text), pdf_path.name)
 
-        # Convert the text into overlapping chunks
-        chunks = chunk_text(text, chunk_size=CHUNK_SIZE, overlap=OVERLAP)
-        logger.info("Created %s chunks from %s", len(chunks), pdf_path.name)
-
-        # Build IDs, documents, and metadata entries for each chunk
-        for idx, chunk in enumerate(chunks):
-            cid = f"{pdf_path.stem}_{idx}"  # Unique ID combines the PDF stem and chunk index
-            meta = {
-                "source": pdf_path.name,
-                "chunk_index": idx,
-            }
-            all_ids.append(cid)
-            all_docs.append(chunk)
-            all_metas.append(meta)
-
-    # If nothing was produced (e.g., PDFs were empty), exit gracefully
-    if not all_docs:
-        logger.warning("No chunks to add; exiting without modifying Chroma")
-        return
-
-    # Send all accumulated chunks to the Chroma collection (triggers embedding)
-    logger.info("Adding %s chunks to Chroma (this calls Ollama for embeddings)...", len(all_docs))
-    collection.add(ids=all_ids, documents=all_docs, metadatas=all_metas)
-
-    logger.info("Ingestion complete.")
+        ids, docs, metas = build_chunk_records(pdf_path, text)
+        if not ids:
+            logger.warning("No chunks extracted from %s (no text layer?); recording it as empty", pdf_path.name)
+        new_chunks = {cid: text_sha256(doc) for cid, doc in zip(ids, docs)}
+        old_chunks = {} if force else manifest["files"].get(pdf_path.name, {}).get("chunks", {})
+
+        # Only chunks whose text changed need a new embedding
+        keep = [i for i, cid in enumerate(ids) if old_chunks.get(cid) != new_chunks[cid]]
+        stale_ids = sorted(set(manifest["files"].get(pdf_path.name, {}).get("chunks", {})) - set(new_chunks))
+
+        if keep:
+            logger.info(
+                "Upserting %s/%s chunks for %s (this calls Ollama for embeddings)...",
+                len(keep),
+                len(ids),
+                pdf_path.name,
+            )
+            stats = embed_and_upsert(
+                collection,
+                [ids[i] for i in keep],
+                [docs[i] for i in keep],
+                [metas[i] for i in keep],
+                batch_size=EMBED_BATCH_SIZE,
+                max_workers=EMBED_WORKERS,
+                max_retries=EMBED_RETRIES,
+                model=EMBED_MODEL_NAME,
+                url=OLLAMA_URL,
+                checkpoint=checkpoint,
+            )
+            summary["embed_seconds"] += stats["seconds"]
+        if stale_ids:
+            logger.info("Deleting %s stale chunks for %s", len(stale_ids), pdf_path.name)
+            collection.delete(ids=stale_ids)
+
+        # Lexical (BM25) postings are cheap, so always rebuild the whole document
+        lexical.remove_source(pdf_path.name)
+        lexical.add(ids, docs, metas)
+        lexical.save()
+
+        # Record progress per file so an interrupted run resumes at the next PDF
+        manifest["files"][pdf_path.name] = {"sha256": hashes[pdf_path.name], "chunks": new_chunks}
+        save_manifest(manifest, MANIFEST_PATH)
+        checkpoint.clear()  # The manifest now covers this file
+
+        summary["updated"] += 1
+        summary["upserted_chunks"] += len(keep)
+        summary["deleted_chunks"] += len(stale_ids)
+
+    # Refresh the memory-mapped matrix used by the NumPy retrieval backend, and the chunk texts
+    export_collection(collection, corpus_version=manifest["corpus_version"])
+    export_chunk_store(collection, corpus_version=manifest["corpus_version"])
+
+    if summary["embed_seconds"]:
+        logger.info(
+            "Embedding throughput: %.1f chunks/sec",
+            summary["upserted_chunks"] / summary["embed_seconds"],
+        )
+    logger.info("Ingestion complete: %s", summary)
     logger.info("Collection '%s' now has %s documents.", COLLECTION_NAME, collection.count())
+    return summary
+
+
+def _folder_signature() -> tuple:
+    """Cheap fingerprint of PDF_DIR (names, sizes, mtimes) used by watch mode."""
+    return tuple(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in sorted(PDF_DIR.glob("*.pdf"))
+    )
+
+
+def watch(interval: float = WATCH_INTERVAL):
+    """Poll PDF_DIR and re-ingest whenever a PDF is added, changed or removed."""
+    logger.info("Watching %s for PDF changes every %.1fs (Ctrl+C to stop)", PDF_DIR, interval)
+    _, collection = build_client_and_collection()
+    last_signature = None
+
+    try:
+        while True:
+            signature = _folder_signature() if PDF_DIR.exists() else ()
+            if signature != last_signature:
+                ingest_pdfs(collection=collection)
+                last_signature = signature
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopping watch mode.")
 
 
 def main():
     """Entry point for running ingestion directly."""
-    ingest_pdfs()
+    parser = argparse.ArgumentParser(description="Ingest guideline PDFs into Chroma.")
+    parser.add_argument("--force", action="store_true", help="re-chunk and re-embed every PDF")
+    parser.add_argument("--watch", action="store_true", help="keep running and ingest PDFs as they change")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="watch poll interval in seconds")
+    args = parser.parse_args()
+
+    if args.watch:
+        watch(interval=args.interval)
+    else:
+        ingest_pdfs(force=args.force)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""Persistent ingest manifest: per-PDF content hashes, chunk IDs and chunking config.
+
+The manifest lives next to the Chroma database and lets `ingest.py` skip PDFs
+whose bytes have not changed, upsert only the chunks whose text changed, and
+delete chunk IDs that no longer exist. Its `corpus_version` changes whenever
+the indexed content changes, so caches can key on it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# RAG_DATA_DIR points every tool at another data tree (used by bench.py)
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CHROMA_DIR = DATA_DIR / "chroma_db"
+MANIFEST_PATH = CHROMA_DIR / "ingest_manifest.json"
+
+MANIFEST_VERSION = 1  # Bump when the manifest layout changes
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):  # 1 MiB blocks keep memory flat
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    """Return the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def empty_manifest(config: dict | None = None) -> dict:
+    """Return a manifest with no files recorded."""
+    return {"version": MANIFEST_VERSION, "config": config or {}, "files": {}, "corpus_version": None}
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    """Load the manifest from disk, or return an empty one if missing/unreadable."""
+    if not path.exists():
+        logger.info("No ingest manifest at %s; starting fresh", path)
+        return empty_manifest()
+
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logger.exception("Could not read ingest manifest at %s; starting fresh", path)
+        return empty_manifest()
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning("Ingest manifest version %s != %s; starting fresh", manifest.get("version"), MANIFEST_VERSION)
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_PATH) -> None:
+    """Atomically write the manifest (write a temp file, then rename over)."""
+    manifest["corpus_version"] = corpus_version(manifest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+    logger.info("Saved ingest manifest (%s files, corpus_version=%s)", len(manifest["files"]), manifest["corpus_version"])
+
+
+def corpus_version(manifest: dict) -> str:
+    """Return a short digest identifying the indexed content and chunking config."""
+    payload = {
+        "config": manifest.get("config", {}),
+        "files": {name: entry.get("sha256") for name, entry in manifest.get("files", {}).items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def read_corpus_version(path: Path = MANIFEST_PATH) -> str | None:
+    """Return the corpus version recorded by the last ingest, if any."""
+    return load_manifest(path).get("corpus_version")
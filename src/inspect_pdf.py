@@ -1,9 +1,10 @@
 """Quick PDF inspection helper for sanity-checking extraction quality."""
 
 import logging
+import os
 from pathlib import Path  # Standard library path utility for clean path handling
 
-from pypdf import PdfReader  # Third-party reader used to open and parse PDFs
+from chunk_playground import extract_pages_from_pdf  # Page-parallel pypdf extraction
 
 # Configure logging to capture inspection details.
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
@@ -12,29 +13,21 @@ logger = logging.getLogger(__name__)
 
 # Adjust these two if your structure changes later
 BASE_DIR = Path(__file__).resolve().parents[1]       # .../clinical_rag
-PDF_DIR = BASE_DIR / "data" / "pdfs"
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+PDF_DIR = DATA_DIR / "pdfs"
 
 SAMPLE_LEN = 800  # how many characters to show as a sample
 
 
-def inspect_pdf(pdf_path: Path):
+def inspect_pdf(pdf_path: Path, workers: int | None = None):
     """Print summary info and a text snippet for a single PDF file."""
     logger.info("=" * 80)
     logger.info("File: %s", pdf_path.name)
 
-    reader = PdfReader(str(pdf_path))  # Load the PDF into a reader object
-    num_pages = len(reader.pages)  # Count pages inside the PDF
+    all_text_parts = extract_pages_from_pdf(pdf_path, workers=workers)  # One text entry per page, in order
+    num_pages = len(all_text_parts)  # Count pages inside the PDF
     logger.info("Pages: %s", num_pages)
 
-    all_text_parts = []  # Accumulates extracted text from each page
-    for i, page in enumerate(reader.pages):  # Iterate through all pages by index
-        try:
-            text = page.extract_text() or ""  # Extract text; fallback to empty string
-        except Exception as e:
-            logger.exception("Error reading page %s of %s", i, pdf_path.name)
-            text = ""  # Keep the loop moving even if a page fails
-        all_text_parts.append(text)  # Store the text segment for later joining
-
     full_text = "\n".join(all_text_parts)  # Combine page texts into one string
     num_chars = len(full_text)  # Count how many characters were extracted
     logger.info("Characters extracted: %s", num_chars)
@@ -0,0 +1,166 @@
+"""Persistent BM25 inverted index over the ingested chunks.
+
+Built by `ingest.py` next to the Chroma collection and used by
+`rag_core.retrieve_context` for lexical and hybrid retrieval. The tokenizer
+keeps clinical identifiers such as "E9(R1)", "4.8.10" or "PFS" intact (and
+also indexes their parts), which embedding search tends to blur.
+
+On disk the index stores per-chunk term frequencies keyed by chunk ID, so
+ingest can add/remove single documents; postings are rebuilt in memory on
+load, and queries only touch the postings of their own terms.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+LEXICAL_INDEX_PATH = DATA_DIR / "chroma_db" / "lexical_index.json"
+
+INDEX_VERSION = 1
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, numbers, dotted section numbers and parenthesised suffixes: e9(r1), 4.8.10, 21-cfr
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*(?:\([a-z0-9]+\))?")
+PART_RE = re.compile(r"[a-z0-9]+")
+# Identifier-looking tokens: acronyms (PFS, ORR, GCP) or anything with a digit (E6, 4.8.10)
+IDENTIFIER_RE = re.compile(r"^(?:[A-Z]{2,}[A-Za-z]*|\S*\d\S*)$")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or the to was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-case tokens; compound identifiers also emit their alphanumeric parts."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p not in STOPWORDS)
+    return tokens
+
+
+def is_keyword_query(query: str) -> bool:
+    """True for short queries made only of identifiers, e.g. "PFS ORR" or "ICH E9(R1)"."""
+    words = query.replace("?", " ").split()
+    return 0 < len(words) <= 4 and all(IDENTIFIER_RE.match(w) for w in words)
+
+
+class LexicalIndex:
+    """BM25 index keyed by chunk ID."""
+
+    def __init__(self, path: Path = LEXICAL_INDEX_PATH):
+        self.path = path
+        self.docs = {}  # chunk id -> {"source", "chunk_index", "len", "tf": {term: count}}
+        # (postings: term -> list[(chunk id, tf)], avgdl, idf), rebuilt lazily and published in one assignment
+        # so concurrent searches never see postings from one build with statistics from another
+        self._bm25 = None
+
+    @classmethod
+    def load(cls, path: Path = LEXICAL_INDEX_PATH) -> "LexicalIndex":
+        """Load the index from disk (empty index if missing or outdated)."""
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"version": INDEX_VERSION, "docs": {}}
+        index = cls.from_dict(data, path)
+        logger.info("Lexical index loaded with %s chunks from %s", len(index.docs), path)
+        return index
+
+    @classmethod
+    def from_dict(cls, data: dict, path: Path = LEXICAL_INDEX_PATH) -> "LexicalIndex":
+        """Build an index from its saved JSON form (empty index if outdated)."""
+        index = cls(path)
+        if data.get("version") == INDEX_VERSION:
+            index.docs = data["docs"]
+        else:
+            logger.warning("Lexical index version %s != %s; ignoring it", data.get("version"), INDEX_VERSION)
+        return index
+
+    def save(self) -> None:
+        """Atomically write the index to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": INDEX_VERSION, "docs": self.docs}), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        logger.info("Lexical index saved with %s chunks to %s", len(self.docs), self.path)
+
+    def sources(self) -> set:
+        return {doc["source"] for doc in self.docs.values()}
+
+    def add(self, ids: list[str], docs: list[str], metas: list[dict]) -> None:
+        for cid, text, meta in zip(ids, docs, metas):
+            tokens = tokenize(text)
+            self.docs[cid] = {
+                "source": meta.get("source"),
+                "chunk_index": meta.get("chunk_index"),
+                "len": len(tokens),
+                "tf": dict(Counter(tokens)),
+            }
+        self._bm25 = None
+
+    def remove(self, ids) -> None:
+        for cid in ids:
+            self.docs.pop(cid, None)
+        self._bm25 = None
+
+    def remove_source(self, source: str) -> None:
+        self.remove([cid for cid, doc in self.docs.items() if doc["source"] == source])
+
+    def build(self) -> tuple:
+        """Build the postings and BM25 statistics now (search does it on first use otherwise)."""
+        postings = defaultdict(list)
+        for cid, doc in self.docs.items():
+            for term, tf in doc["tf"].items():
+                postings[term].append((cid, tf))
+        n = len(self.docs)
+        avgdl = (sum(doc["len"] for doc in self.docs.values()) / n) if n else 0.0
+        idf = {term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5)) for term, plist in postings.items()}
+        self._bm25 = (dict(postings), avgdl, idf)
+        return self._bm25
+
+    def search(self, query: str, k: int = 5, sources=None) -> list[tuple[str, float]]:
+        """Return up to k (chunk id, BM25 score) pairs, best first.
+
+        `sources` restricts the results to chunks from those guidelines.
+        """
+        postings, avgdl, idfs = self._bm25 or self.build()
+        if not postings:
+            return []
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            plist = postings.get(term)
+            if not plist:
+                continue
+            idf = idfs[term]
+            for cid, tf in plist:
+                dl = self.docs[cid]["len"]
+                scores[cid] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+
+        if sources is not None:
+            sources = set(sources)
+            scores = {cid: score for cid, score in scores.items() if self.docs[cid]["source"] in sources}
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int, rrf_k: int = 60) -> list[tuple[str, float]]:
+    """Fuse several ranked ID lists: score(id) = sum 1 / (rrf_k + rank)."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, start=1):
+            scores[cid] += 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
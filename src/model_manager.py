@@ -0,0 +1,209 @@
+"""Shared Ollama model lifecycle: pooled clients, keep-alive, preloading and load timings.
+
+Every call to a given Ollama server goes through one ModelManager, which
+holds a pooled sync client (plus one async client per event loop), sends our
+keep-alive policy with each request so models stay resident between
+questions, and can preload or unload models explicitly. Load and unload
+times are kept per model, and a cold load that happens inside a request
+(Ollama's `load_duration`) is recorded as a `model_load` span, so cold-start
+penalties show up in traces instead of hiding in LLM latency.
+
+Run from: clinical_rag/src
+    python model_manager.py --chat deepseek-r1            # preload and print timings
+    python model_manager.py --chat deepseek-r1 --unload   # also measure unloading
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+from ollama import AsyncClient, Client
+
+from tracing import record_span
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+EMBED_MODEL_NAME = "nomic-embed-text"
+
+# Sent with every request. Ollama's own default is 5m; "-1" keeps models loaded until unloaded.
+KEEP_ALIVE = os.environ.get("RAG_KEEP_ALIVE", "30m")
+COLD_LOAD_THRESHOLD = 0.05  # Seconds of server-side load_duration that count as a (re)load
+RESIDENCY_EMBED_INPUT = ["."]  # One-token input for embedding-model load/unload requests
+
+
+class ModelManager:
+    """Pooled clients and model residency for one Ollama server."""
+
+    def __init__(self, url: str = OLLAMA_URL, keep_alive: str | int | None = KEEP_ALIVE):
+        self.url = url
+        self.keep_alive = keep_alive
+        self.client = Client(host=url)  # httpx connection pool, thread-safe
+        # httpx async connections are bound to the loop that opened them, so keep one client per loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._models = {}  # model name -> timing/residency stats
+
+    def _model_stats(self, model: str) -> dict:
+        return self._models.setdefault(model, {
+            "loaded": False,
+            "loads": 0,
+            "last_load_s": None,
+            "last_server_load_ms": None,
+            "last_unload_s": None,
+            "in_request_loads": 0,
+        })
+
+    def async_client(self) -> AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = AsyncClient(host=self.url)
+        return client
+
+    def _note_response(self, model: str, resp) -> None:
+        """Record a cold load that Ollama reports inside a normal request."""
+        load_s = (resp.get("load_duration") or 0) / 1e9
+        if load_s < COLD_LOAD_THRESHOLD:
+            return
+        with self._lock:
+            stats = self._model_stats(model)
+            stats.update(loaded=True, last_server_load_ms=load_s * 1000)
+            stats["loads"] += 1
+            stats["in_request_loads"] += 1
+        record_span("model_load", load_s, model=model)
+        logger.warning("Model '%s' was not resident; the request paid %.2fs to load it", model, load_s)
+
+    def _watch_stream(self, model: str, chunks):
+        try:
+            for chunk in chunks:
+                if chunk.get("done"):
+                    self._note_response(model, chunk)
+                yield chunk
+        finally:
+            chunks.close()  # Dropping the connection makes Ollama stop generating
+
+    async def _awatch_stream(self, model: str, chunks):
+        try:
+            async for chunk in chunks:
+                if chunk.get("done"):
+                    self._note_response(model, chunk)
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def chat(self, model: str, messages: list[dict], stream: bool = False, **kwargs):
+        """ollama.chat on the pooled client, with our keep-alive."""
+        resp = self.client.chat(model=model, messages=messages, stream=stream, keep_alive=self.keep_alive, **kwargs)
+        if stream:
+            return self._watch_stream(model, resp)
+        self._note_response(model, resp)
+        return resp
+
+    async def achat(self, model: str, messages: list[dict], stream: bool = False, **kwargs):
+        """Async chat on this loop's pooled client, with our keep-alive."""
+        resp = await self.async_client().chat(
+            model=model, messages=messages, stream=stream, keep_alive=self.keep_alive, **kwargs
+        )
+        if stream:
+            return self._awatch_stream(model, resp)
+        self._note_response(model, resp)
+        return resp
+
+    def embed(self, texts: list[str], model: str = EMBED_MODEL_NAME):
+        """ollama.embed on the pooled client, with our keep-alive."""
+        resp = self.client.embed(model=model, input=texts, keep_alive=self.keep_alive)
+        self._note_response(model, resp)
+        return resp
+
+    def _residency_request(self, model: str, kind: str, keep_alive):
+        # A chat request without messages only (un)loads the model. /api/embed answers an empty input
+        # without touching the model, so embedding models get a one-token input instead.
+        if kind == "embed":
+            return self.client.embed(model=model, input=RESIDENCY_EMBED_INPUT, keep_alive=keep_alive)
+        return self.client.chat(model=model, messages=[], keep_alive=keep_alive)
+
+    def load(self, model: str, kind: str = "chat") -> float:
+        """Load a model ("chat" or "embed") into memory; returns the seconds it took."""
+        t0 = time.perf_counter()
+        resp = self._residency_request(model, kind, self.keep_alive)
+        elapsed = time.perf_counter() - t0
+        server_ms = (resp.get("load_duration") or 0) / 1e6
+        with self._lock:
+            stats = self._model_stats(model)
+            stats.update(loaded=True, last_load_s=elapsed, last_server_load_ms=server_ms)
+            stats["loads"] += 1
+        logger.info("Loaded %s model '%s' in %.2fs (server load %.0f ms)", kind, model, elapsed, server_ms)
+        return elapsed
+
+    def unload(self, model: str, kind: str = "chat") -> float:
+        """Evict a model from memory; returns the seconds it took."""
+        t0 = time.perf_counter()
+        self._residency_request(model, kind, 0)
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self._model_stats(model).update(loaded=False, last_unload_s=elapsed)
+        logger.info("Unloaded %s model '%s' in %.2fs", kind, model, elapsed)
+        return elapsed
+
+    def warm_up(self, chat_models=(), embed_models=(EMBED_MODEL_NAME,)) -> dict:
+        """Preload models one after another; failures are logged, not raised.
+
+        Returns {model: load seconds} for the models that loaded.
+        """
+        timings = {}
+        for kind, models in (("embed", embed_models), ("chat", chat_models)):
+            for model in models:
+                try:
+                    timings[model] = self.load(model, kind)
+                except Exception:
+                    logger.exception("Could not preload %s model '%s'; it will load on first use", kind, model)
+        return timings
+
+    def stats(self) -> dict:
+        """Per-model load/unload timings plus the keep-alive policy."""
+        with self._lock:
+            models = {name: dict(stats) for name, stats in self._models.items()}
+        return {"url": self.url, "keep_alive": self.keep_alive, "models": models}
+
+
+_managers = {}  # url -> ModelManager
+_managers_lock = threading.Lock()
+
+
+def get_model_manager(url: str = OLLAMA_URL) -> ModelManager:
+    """Return the shared ModelManager for an Ollama server URL."""
+    with _managers_lock:
+        manager = _managers.get(url)
+        if manager is None:
+            manager = _managers[url] = ModelManager(url)
+        return manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preload Ollama models and report load/unload timings.")
+    parser.add_argument("--chat", action="append", default=[], help="chat model to load (repeatable)")
+    parser.add_argument("--embed", action="append", default=None, help=f"embedding model (default {EMBED_MODEL_NAME})")
+    parser.add_argument("--unload", action="store_true", help="unload the models again and time that too")
+    args = parser.parse_args()
+
+    manager = get_model_manager()
+    embed_models = args.embed if args.embed is not None else [EMBED_MODEL_NAME]
+    manager.warm_up(chat_models=args.chat, embed_models=embed_models)
+    if args.unload:
+        for model in embed_models:
+            manager.unload(model, "embed")
+        for model in args.chat:
+            manager.unload(model, "chat")
+    print(json.dumps(manager.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 """Core Retrieval-Augmented Generation helpers for the clinical RAG app.
 
-This module owns the end-to-end RAG workflow:
-  - reconnecting to the persisted Chroma collection
+This module owns the end-to-end RAG workflow (blocking, streaming and asyncio
+variants):
+  - holding one shared connection to the persisted Chroma collection
   - retrieving the top-k semantic matches for a question
   - formatting those chunks into a context block
   - invoking the local Ollama chat endpoint with the constructed prompt
@@ -11,11 +12,29 @@ LLM call status for easier debugging inside Streamlit and CLI entrypoints.
 """
 
 from pathlib import Path
+import asyncio
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 
 import chromadb
+import numpy as np
+from chromadb import errors as chroma_errors
+from chromadb.api.client import SharedSystemClient
 from chromadb.utils import embedding_functions
-from ollama import chat  # pip install ollama
+
+from answer_cache import AnswerCache, template_fingerprint
+from chunk_store import CHUNK_STORE_DIR, TABLE_FILE, ChunkStore
+from embedding_cache import QueryEmbeddingCache
+from embedding_pool import embed_texts
+from index_snapshot import SnapshotCollection, load_snapshot
+from ingest_manifest import MANIFEST_PATH, read_corpus_version
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndex, is_keyword_query, reciprocal_rank_fusion
+from model_manager import get_model_manager
+from tracing import current_trace, process_age, record_span, span, trace_request
+from vector_index import META_FILE, VECTOR_INDEX_DIR, CompressedVectorIndex, NumpyVectorIndex, parse_compression
 
 # Consistent logging format for timestamps + module names.
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
@@ -24,66 +43,1211 @@ logger = logging.getLogger(__name__)
 
 # Paths and model/collection settings that other modules rely on.
 BASE_DIR = Path(__file__).resolve().parents[1]
-CHROMA_DIR = BASE_DIR / "data" / "chroma_db"
+# RAG_DATA_DIR points every tool at another data tree (used by bench.py)
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CHROMA_DIR = DATA_DIR / "chroma_db"
 COLLECTION_NAME = "clinical_guidelines"
 
 EMBED_MODEL_NAME = "nomic-embed-text"
 DEFAULT_LLM_MODEL = "deepseek-r1"  # change if you prefer another ollama model
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+# Vector search backend: "chroma" (HNSW via Chroma) or "numpy" (exact search over the
+# memory-mapped matrix that ingest exports to data/vector_index/). Falls back to chroma
+# if the exported matrix is missing or stale.
+RETRIEVAL_BACKENDS = ("chroma", "numpy")
+RETRIEVAL_BACKEND = os.environ.get("RAG_RETRIEVAL_BACKEND", "chroma")
+# numpy backend only: find candidates on in-memory float16/int8 codes ("int8", "float16", "int8:256" =
+# first 256 dims) and rescore them against the memory-mapped float32 rows. Unset = float32 search.
+VECTOR_COMPRESSION = os.environ.get("RAG_VECTOR_COMPRESSION")
+
+# Serve everything from a single-file index snapshot (see index_snapshot.py) instead of
+# data/chroma_db/ and the exports next to it; unset = normal Chroma-backed operation.
+SNAPSHOT_PATH = os.environ.get("RAG_SNAPSHOT")
+
+# Queries per embedding request in retrieve_context_batch
+QUERY_EMBED_BATCH_SIZE = 64
+
+# Retrieval: "vector" (embeddings only), "lexical" (BM25 only) or "hybrid" (both, fused with RRF).
+# Hybrid answers identifier-only queries ("PFS", "ICH E9(R1)") lexically, without an embedding call.
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+RETRIEVAL_MODE = "vector"
+HYBRID_CANDIDATES = 3  # BM25 contributes top_k * this many candidates to the fusion (vector: MMR_CANDIDATES)
+RRF_K = 60  # Reciprocal-rank-fusion damping constant
+
+# Score-aware selection for vector/hybrid retrieval: over-fetch k * MMR_CANDIDATES chunks,
+# drop weak matches, then pick a diverse top-k with maximal marginal relevance.
+MMR_CANDIDATES = 4
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, lower = more diversity; None disables MMR
+MIN_SIMILARITY = None  # Cosine floor; model-dependent (e.g. ~0.45 for nomic-embed-text), None = off
+MAX_SIMILARITY_GAP = None  # Drop chunks this far below the best cosine similarity (e.g. 0.2); None = off
+
+# Guideline routing for vector/hybrid retrieval without an explicit source filter: compare the
+# query with each guideline's centroid (exported by ingest) and only search the closest ones.
+SOURCE_ROUTING = True
+ROUTE_MAX_SOURCES = 2  # Guidelines searched per query; corpora with no more than this are never routed
+ROUTE_MARGIN = 0.05  # Only keep guidelines whose centroid similarity is within this of the best
+
+# Context assembly: neighbouring chunks of one guideline are merged into a single span
+# (ingest chunks overlap, so pasting them separately repeats text), then spans are
+# added in relevance order until the character budget (~4 chars per token) is spent.
+CONTEXT_CHAR_BUDGET = 12000  # None = no limit
+MIN_OVERLAP_MATCH = 20  # Shorter suffix/prefix matches between neighbours are treated as coincidence
+
+# Answer cache: cosine similarity a repeated question needs to reuse an answer
+ANSWER_CACHE_SIMILARITY = 0.95
+ANSWER_CACHE_SIZE = 256
+
+SYSTEM_PROMPT = (
+    "You are a clinical-trials assistant. "
+    "Answer the user's question using ONLY the context given. "
+    "If the answer is not in the context, say explicitly: "
+    "'The answer is not available in the provided guidelines.' "
+    "Cite guideline names or sections when possible, but do not invent facts."
+)
+
+USER_PROMPT_TEMPLATE = (
+    "Context from clinical guidelines:\n\n{context}\n\n"
+    "Question: {query}\n\n"
+    "Answer concisely in a few paragraphs."
+)
+
+NO_CONTEXT_ANSWER = "I couldn't retrieve any relevant context for this question."
+
+# Default per-request deadline (seconds) for the asyncio pipeline
+ASYNC_REQUEST_TIMEOUT = 180.0
+
+
+# Chroma errors meaning the cached collection was deleted or rebuilt (names vary across Chroma releases).
+# Only these trigger a reconnect; embedding, LLM and programming errors propagate.
+STALE_COLLECTION_ERRORS = tuple(
+    exc
+    for exc in (getattr(chroma_errors, name, None) for name in ("InvalidCollectionException", "NotFoundError"))
+    if isinstance(exc, type)
+) or (chroma_errors.ChromaError,)
+
+
+def _manifest_mtime():
+    """Modification time of the ingest manifest (or of the snapshot being served); changes on every rewrite."""
+    try:
+        return Path(SNAPSHOT_PATH).stat().st_mtime_ns if SNAPSHOT_PATH else MANIFEST_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _forget_chroma_system(path: str) -> None:
+    """Make the next client for `path` start a fresh Chroma system, which re-reads the rebuilt index from disk.
+
+    Chroma caches one system per persist directory. `SharedSystemClient.clear_system_cache()`
+    would stop every cached system, failing queries other threads are running on them;
+    dropping just this path's entry leaves the old system to the clients still holding it,
+    and it is garbage-collected once they are done.
+    """
+    getattr(SharedSystemClient, "_identifier_to_system", {}).pop(path, None)
+
+
+class StoreHandle:
+    """Process-wide, lazily connected Chroma client + collection.
+
+    The first caller pays for the connection; later callers (any thread or
+    Streamlit session) get the cached collection after a single stat() of the
+    ingest manifest. When ingest rewrites the manifest, or `reset()` is called
+    after a query found the collection gone, the next call reconnects.
+
+    With RAG_SNAPSHOT set, the "collection" is a read-only view of the mapped
+    snapshot, which also supplies the lexical index, vector index and chunk texts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collection = None
+        self._manifest_mtime = None
+        self._corpus_version = None
+        self._lexical = None
+        self._snapshot = None
+        self._vector_index = None
+        self._vector_index_mtime = None
+        self._chunk_store = None
+        self._chunk_store_mtime = None
+
+    @property
+    def corpus_version(self):
+        """Corpus version from the ingest manifest, refreshed on reconnect."""
+        self.collection()
+        return self._corpus_version
+
+    def collection(self):
+        mtime = _manifest_mtime()
+        collection = self._collection
+        if collection is not None and mtime == self._manifest_mtime:
+            return collection  # Fast path: no lock, no Chroma calls
+
+        with self._lock:
+            if self._collection is None or mtime != self._manifest_mtime:
+                if self._manifest_mtime is not None and mtime != self._manifest_mtime and not SNAPSHOT_PATH:
+                    logger.info("Ingest manifest changed; reconnecting to Chroma")
+                    _forget_chroma_system(str(CHROMA_DIR))
+                with span("connect", snapshot=bool(SNAPSHOT_PATH)):
+                    if SNAPSHOT_PATH:
+                        self._snapshot = self._open_snapshot()
+                        self._collection = SnapshotCollection(self._snapshot)
+                        self._corpus_version = self._snapshot.corpus_version
+                    else:
+                        self._collection = self._connect()
+                        self._corpus_version = read_corpus_version(MANIFEST_PATH)
+                    self._manifest_mtime = mtime
+                self._lexical = None  # Reloaded on next lexical query
+            return self._collection
+
+    def lexical_index(self) -> LexicalIndex:
+        """BM25 index written by the same ingest run as the collection (loaded lazily)."""
+        self.collection()
+        lexical = self._lexical
+        if lexical is None:
+            with self._lock:
+                if self._lexical is None:
+                    snapshot = self._snapshot
+                    self._lexical = snapshot.lexical if snapshot is not None else LexicalIndex.load(LEXICAL_INDEX_PATH)
+                lexical = self._lexical
+        return lexical
+
+    def reset(self):
+        """Drop this handle's collection so the next call looks it up again.
+
+        Chroma's process-wide system cache is left alone, since other threads
+        may be querying through it; when the ingest manifest has changed,
+        `collection()` only drops this path's cached system, without stopping it.
+        """
+        with self._lock:
+            self._collection = None
+            self._lexical = None
+
+    def vector_index(self):
+        """Memory-mapped NumPy index for the current corpus, or None if missing/stale."""
+        self.collection()
+        if self._snapshot is not None:
+            return self._snapshot.vector_index
+        try:
+            mtime = (VECTOR_INDEX_DIR / META_FILE).stat().st_mtime_ns
+        except OSError:
+            return None
+        if self._vector_index is None or mtime != self._vector_index_mtime:
+            with self._lock:
+                if self._vector_index is None or mtime != self._vector_index_mtime:
+                    try:
+                        self._vector_index = NumpyVectorIndex.load(VECTOR_INDEX_DIR)
+                        if VECTOR_COMPRESSION and RETRIEVAL_BACKEND == "numpy":
+                            self._vector_index = CompressedVectorIndex.load_or_build(
+                                self._vector_index, *parse_compression(VECTOR_COMPRESSION), index_dir=VECTOR_INDEX_DIR
+                            )
+                    except (OSError, ValueError):
+                        logger.exception("Could not load NumPy vector index from %s", VECTOR_INDEX_DIR)
+                        self._vector_index = None
+                    self._vector_index_mtime = mtime
+                    if self._vector_index is not None and self._vector_index.corpus_version != self._corpus_version:
+                        logger.warning("NumPy vector index is stale (run ingest.py); using Chroma until refreshed")
+        index = self._vector_index
+        if index is None or index.corpus_version != self._corpus_version:
+            return None
+        return index
+
+    def chunk_store(self):
+        """Memory-mapped chunk texts for the current corpus, or None if missing/stale."""
+        self.collection()
+        if self._snapshot is not None:
+            return self._snapshot.chunk_store
+        try:
+            mtime = (CHUNK_STORE_DIR / TABLE_FILE).stat().st_mtime_ns
+        except OSError:
+            return None
+        if self._chunk_store is None or mtime != self._chunk_store_mtime:
+            with self._lock:
+                if self._chunk_store is None or mtime != self._chunk_store_mtime:
+                    try:
+                        self._chunk_store = ChunkStore.load(CHUNK_STORE_DIR)
+                    except (OSError, ValueError):
+                        logger.exception("Could not load chunk store from %s", CHUNK_STORE_DIR)
+                        self._chunk_store = None
+                    self._chunk_store_mtime = mtime
+                    if self._chunk_store is not None and self._chunk_store.corpus_version != self._corpus_version:
+                        logger.warning("Chunk store is stale (run ingest.py); using Chroma until refreshed")
+        store = self._chunk_store
+        if store is None or store.corpus_version != self._corpus_version:
+            return None
+        return store
+
+    @staticmethod
+    def _open_snapshot():
+        snapshot = load_snapshot(Path(SNAPSHOT_PATH))
+        model = snapshot.config.get("embed_model")
+        if model and model != EMBED_MODEL_NAME:
+            # Query vectors from another model would silently match the wrong chunks
+            raise ValueError(f"Snapshot {SNAPSHOT_PATH} was embedded with {model!r}, not {EMBED_MODEL_NAME!r}")
+        return snapshot
+
+    @staticmethod
+    def _connect():
+        logger.info("Connecting to Chroma at %s for collection '%s'", CHROMA_DIR, COLLECTION_NAME)
+        client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+
+        ollama_ef = embedding_functions.OllamaEmbeddingFunction(
+            model_name=EMBED_MODEL_NAME,
+            url=OLLAMA_URL,
+        )
+
+        collection = client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=ollama_ef,
+        )
+        logger.info("Chroma collection ready; current count: %s", collection.count())
+        return collection
+
+
+_store = StoreHandle()
+
+# Pooled Ollama clients with a shared keep-alive policy, so models stay resident between questions.
+_models = get_model_manager(OLLAMA_URL)
+
+# Query vectors are cached per embedding model; hits skip the Ollama round trip.
+_query_cache = QueryEmbeddingCache(
+    EMBED_MODEL_NAME,
+    embed_fn=lambda texts: embed_texts(texts, model=EMBED_MODEL_NAME, url=OLLAMA_URL),
+)
+
+# Answers are reused for identical or near-identical questions on the same corpus.
+_answer_cache = AnswerCache(max_items=ANSWER_CACHE_SIZE, similarity_threshold=ANSWER_CACHE_SIMILARITY)
+PROMPT_FINGERPRINT = template_fingerprint(SYSTEM_PROMPT, USER_PROMPT_TEMPLATE)
+
+# Optional cap on concurrent (sync) LLM generations, set by rag_service; None = unlimited.
+_llm_slots = None
+
+
+# Time from process launch to the first answered retrieval, recorded once (see cold_start_stats).
+_cold_start = {}
+_cold_start_lock = threading.Lock()
+
+
+def set_llm_concurrency(limit: int | None) -> None:
+    """Allow at most `limit` chat generations at once; extra callers wait their turn."""
+    global _llm_slots
+    _llm_slots = threading.BoundedSemaphore(limit) if limit else None
+
+
+def set_query_embedder(embed_fn) -> None:
+    """Replace the function the query-embedding cache calls on misses, e.g. a micro-batcher."""
+    _query_cache.embed_fn = embed_fn
+
+
+@contextmanager
+def _llm_slot():
+    slots = _llm_slots
+    if slots is None:
+        yield
+        return
+    with span("llm_wait"):
+        slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
 
 
 def get_collection():
-    """Reconnect to the existing Chroma collection with Ollama embeddings."""
-    logger.info("Connecting to Chroma at %s for collection '%s'", CHROMA_DIR, COLLECTION_NAME)
+    """Return the shared Chroma collection, connecting on first use."""
+    return _store.collection()
+
+
+def embed_query(query: str) -> list[float]:
+    """Return the (cached) embedding vector for a query."""
+    with span("embed_query"):
+        return _query_cache.get(query)
+
+
+def query_cache_stats() -> dict:
+    """Hit/miss counters and estimated time saved by the query-embedding cache."""
+    return _query_cache.stats()
+
 
-    client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+def answer_cache_stats() -> dict:
+    """Exact/semantic hit counters of the answer cache."""
+    return _answer_cache.stats()
 
-    ollama_ef = embedding_functions.OllamaEmbeddingFunction(
-        model_name=EMBED_MODEL_NAME,
-        url="http://localhost:11434",
+
+def cold_start_stats() -> dict:
+    """Seconds from process launch to the first answered retrieval, usually warm-up's (empty until then)."""
+    return dict(_cold_start)
+
+
+def _note_cold_start() -> None:
+    seconds, measured_from = process_age()
+    with _cold_start_lock:
+        if _cold_start:
+            return
+        _cold_start.update(seconds=round(seconds, 3), measured_from=measured_from, snapshot=SNAPSHOT_PATH)
+    record_span("cold_start", seconds, snapshot=bool(SNAPSHOT_PATH))
+    logger.info(
+        "Cold start: first retrieval answered %.2fs after process %s (%s)",
+        seconds,
+        measured_from,
+        f"snapshot {SNAPSHOT_PATH}" if SNAPSHOT_PATH else "Chroma",
     )
 
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=ollama_ef,
+
+def model_stats() -> dict:
+    """Keep-alive policy and per-model load/unload timings (see model_manager.py)."""
+    return _models.stats()
+
+
+def warm_up(llm_model: str | None = DEFAULT_LLM_MODEL) -> int:
+    """Load the models, connect to Chroma and run one throwaway query so the first user question is fast.
+
+    Preloads the embedding model and `llm_model` (None skips the chat model)
+    and loads the collection's ANN index ahead of time. The throwaway query goes
+    through `retrieve_with_scores`, so it also opens the vector index and chunk
+    store, and the cold start is recorded when warm-up ends rather than on the
+    first user question.
+    Returns the number of chunks in the collection.
+    """
+    logger.info("Warming up RAG store")
+    _models.warm_up(chat_models=[llm_model] if llm_model else [], embed_models=[EMBED_MODEL_NAME])
+    collection = get_collection()
+    count = collection.count()
+    _store.lexical_index().build()  # Build BM25 postings now rather than on the first hybrid query
+    if count:
+        try:
+            retrieve_with_scores(collection, "warm-up", k=1, mode="vector")
+        except Exception:
+            logger.exception("Warm-up query failed; continuing without it")
+    logger.info("RAG store warm; %s chunks available", count)
+    return count
+
+
+def resolve_mode(query: str, mode: str | None = None) -> str:
+    """Pick the effective retrieval mode; hybrid degrades to lexical for keyword-only queries."""
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode!r} (expected one of {RETRIEVAL_MODES})")
+    if mode == "hybrid" and is_keyword_query(query):
+        return "lexical"
+    return mode
+
+
+def _fetch_chunks(collection, ids: list[str], documents: bool = True, metadatas: bool = True) -> dict:
+    """Fetch {chunk id: (document, metadata)} without an embedding call.
+
+    Reads the memory-mapped chunk store when it is current, Chroma otherwise.
+    Fields not asked for come back as None; IDs that no longer exist are left out.
+    """
+    if not ids:
+        return {}
+    store = _store.chunk_store()
+    if store is not None and all(cid in store for cid in ids):
+        with span("fetch_chunks", store="mmap"):
+            return {
+                cid: (store.text(cid) if documents else None, store.metadata(cid) if metadatas else None)
+                for cid in ids
+            }
+    include = [name for name, wanted in (("documents", documents), ("metadatas", metadatas)) if wanted]
+    with span("fetch_chunks", store="chroma"):
+        result = collection.get(ids=ids, include=include)
+    docs = result["documents"] if documents else [None] * len(result["ids"])
+    metas = result["metadatas"] if metadatas else [None] * len(result["ids"])
+    return {cid: (doc, meta) for cid, doc, meta in zip(result["ids"], docs, metas)}
+
+
+def _fetch_embeddings(collection, ids: list[str]) -> dict:
+    """Fetch {chunk id: stored embedding}, from the NumPy index when it is loaded."""
+    if not ids:
+        return {}
+    index = _store.vector_index() if RETRIEVAL_BACKEND == "numpy" else None
+    if index is not None and all(cid in index.row_of for cid in ids):
+        return {cid: index.matrix[index.row_of[cid]] for cid in ids}
+    with span("fetch_embeddings"):
+        result = collection.get(ids=ids, include=["embeddings"])
+    return dict(zip(result["ids"], result["embeddings"]))
+
+
+def _vector_search(collection, query_embedding, n: int, source_filter: list[str] | None = None):
+    """Top-n nearest chunks as (ids, metas, embeddings) from the configured backend.
+
+    Texts are not loaded here; `_retrieve` fetches them for the chunks it selects.
+    `source_filter` limits the search to those guidelines' partitions.
+    """
+    if RETRIEVAL_BACKEND not in RETRIEVAL_BACKENDS:
+        raise ValueError(f"Unknown retrieval backend: {RETRIEVAL_BACKEND!r} (expected one of {RETRIEVAL_BACKENDS})")
+
+    index = _store.vector_index() if RETRIEVAL_BACKEND == "numpy" else None
+    if index is not None:
+        t0 = time.perf_counter()
+        with span("vector_search", backend="numpy"):
+            partition = index.rows_for_sources(source_filter) if source_filter is not None else None
+            rows, _ = index.search(query_embedding, n, rows=partition)
+        search_ms = (time.perf_counter() - t0) * 1000
+        hits = [(index.ids[r], index.metadatas[r], index.matrix[r]) for r in rows]
+        logger.info("Retrieved %s documents from NumPy index (search %.3f ms)", len(hits), search_ms)
+    else:
+        with span("vector_search", backend="chroma"):
+            result = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n,
+                where={"source": {"$in": source_filter}} if source_filter is not None else None,
+                include=["metadatas", "embeddings"],
+            )
+        hits = list(zip(result["ids"][0], result["metadatas"][0], result["embeddings"][0]))
+        logger.info("Retrieved %s documents from Chroma", len(hits))
+    return [h[0] for h in hits], [h[1] for h in hits], [h[2] for h in hits]
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def relevance_cutoff(similarities, min_similarity=MIN_SIMILARITY, max_gap=MAX_SIMILARITY_GAP) -> np.ndarray:
+    """Boolean mask of candidates worth sending to the LLM (always keeps the best one).
+
+    Drops candidates below `min_similarity` or more than `max_gap` below the
+    best candidate; either check is skipped when set to None.
+    """
+    sims = np.asarray(similarities, dtype=np.float32)
+    keep = np.ones(len(sims), dtype=bool)
+    if not len(sims):
+        return keep
+    if min_similarity is not None:
+        keep &= sims >= min_similarity
+    if max_gap is not None:
+        keep &= sims >= sims.max() - max_gap
+    keep[int(np.argmax(sims))] = True
+    return keep
+
+
+def _min_max(values) -> np.ndarray:
+    """Rescale to [0, 1] over the given values (all zeros when they are all equal)."""
+    lo, hi = float(values.min()), float(values.max())
+    return (values - lo) / (hi - lo) if hi > lo else np.zeros_like(values)
+
+
+def mmr_select(relevance, candidate_vecs, k: int, lambda_mult=MMR_LAMBDA) -> list[int]:
+    """Maximal marginal relevance: pick up to k candidate indexes, trading relevance for novelty.
+
+    Each step scores every remaining candidate at once as
+    lambda * relevance - (1 - lambda) * max cosine similarity to the picks so far.
+    Relevance (cosine or fused RRF score) and the pairwise similarities are each
+    min-max scaled over the candidates first, so lambda weighs the two terms the
+    same way whatever the retrieval mode. lambda_mult=None (or 1) keeps plain relevance order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(relevance))
+    if lambda_mult is None or lambda_mult >= 1 or k == 0:
+        return [int(i) for i in np.argsort(-relevance, kind="stable")[:k]]
+
+    relevance = _min_max(relevance)
+    unit = _unit_rows(candidate_vecs)
+    pairwise = unit @ unit.T
+    if len(relevance) > 1:  # Scale by the spread between distinct candidates; self-similarity is never used
+        between = pairwise[~np.eye(len(relevance), dtype=bool)]
+        lo, hi = float(between.min()), float(between.max())
+        pairwise = np.clip((pairwise - lo) / (hi - lo), 0.0, 1.0) if hi > lo else np.zeros_like(pairwise)
+    redundancy = np.zeros(len(relevance), dtype=np.float32)  # Max similarity to any pick so far
+    available = np.ones(len(relevance), dtype=bool)
+    picks = []
+    for _ in range(k):
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picks.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picks
+
+
+def retrieve_context(
+    collection,
+    query: str,
+    k: int = 5,
+    query_embedding=None,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+):
+    """Run vector, lexical (BM25) or hybrid search and return up to k docs + metadata.
+
+    Pass `query_embedding` when the caller already embedded the query.
+    See `retrieve_with_scores` for the selection rules, source filtering and per-chunk scores.
+    """
+    hits = retrieve_with_scores(
+        collection, query, k=k, query_embedding=query_embedding, mode=mode, source_filter=source_filter
     )
-    logger.info("Chroma collection ready; current count: %s", collection.count())
-    return collection
+    return [hit["document"] for hit in hits], [hit["metadata"] for hit in hits]
 
 
-def retrieve_context(collection, query: str, k: int = 5):
-    """Run semantic search and return top-k docs + metadata."""
-    logger.info("Running retrieval for query='%s' with top_k=%s", query, k)
+def retrieve_with_scores(
+    collection,
+    query: str,
+    k: int = 5,
+    query_embedding=None,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+    exclude_ids=None,
+    with_embeddings: bool = False,
+):
+    """Retrieve up to k chunks as [{"id", "document", "metadata", "score", "similarity"}].
 
-    result = collection.query(
-        query_texts=[query],
-        n_results=k,
+    Vector and hybrid modes over-fetch k * MMR_CANDIDATES candidates with their
+    embeddings, drop those failing `relevance_cutoff`, then pick a diverse
+    top-k with MMR, so fewer than k chunks may come back. "similarity" is the
+    cosine similarity to the query; "score" is the ranking signal (cosine for
+    vector, normalised fusion score for hybrid, BM25 for lexical, where
+    similarity is None).
+
+    `source_filter` (guideline filenames, see `list_sources`) restricts every
+    mode to those guidelines; without it, vector and hybrid searches are routed
+    to the guidelines closest to the query (see `route_sources`).
+
+    `exclude_ids` are never returned (chunks the caller already has);
+    `with_embeddings` adds each chunk's stored vector as "embedding".
+    """
+    mode = resolve_mode(query, mode)
+    with span("retrieve", mode=mode, k=k):
+        hits = _retrieve(
+            collection,
+            query,
+            k,
+            query_embedding,
+            mode,
+            _normalise_sources(source_filter),
+            frozenset(exclude_ids or ()),
+            with_embeddings,
+        )
+    if not _cold_start:
+        _note_cold_start()
+    return hits
+
+
+def _normalise_sources(source_filter) -> list[str] | None:
+    return sorted(set(source_filter)) if source_filter else None
+
+
+def list_sources() -> list[str]:
+    """Guideline filenames in the corpus, for source filters."""
+    return sorted(src for src in _store.lexical_index().sources() if src)
+
+
+def route_sources(query_embedding, max_sources: int = ROUTE_MAX_SOURCES, margin: float = ROUTE_MARGIN):
+    """Guidelines whose centroid is closest to the query, or None to search all of them.
+
+    Centroids come from the exported vector index, so routing is skipped while
+    it is missing or stale, and for corpora with no more than `max_sources` guidelines.
+    """
+    index = _store.vector_index()
+    if index is None or len(index.centroids) <= max_sources:
+        return None
+    names = list(index.centroids)
+    similarities = _unit_rows([index.centroids[name] for name in names]) @ _unit_rows([query_embedding])[0]
+    order = np.argsort(-similarities)[:max_sources]
+    best = similarities[order[0]]
+    return sorted(names[i] for i in order if similarities[i] >= best - margin)
+
+
+def _retrieve(
+    collection,
+    query: str,
+    k: int,
+    query_embedding,
+    mode: str,
+    source_filter=None,
+    exclude=frozenset(),
+    with_embeddings: bool = False,
+) -> list[dict]:
+    logger.info("Running %s retrieval for query='%s' with top_k=%s", mode, query, k)
+
+    lexical = _store.lexical_index() if mode != "vector" else None
+    if lexical is not None and not lexical.docs:
+        logger.warning("Lexical index is empty (run ingest.py); falling back to vector retrieval")
+        mode, lexical = "vector", None
+
+    if mode == "lexical":
+        t0 = time.perf_counter()
+        with span("lexical_search"):
+            ranked = lexical.search(query, k + len(exclude), sources=source_filter)
+        ranked = [(cid, score) for cid, score in ranked if cid not in exclude][:k]
+        logger.info("BM25 lookup took %.3f ms for %s hits", (time.perf_counter() - t0) * 1000, len(ranked))
+        found = _fetch_chunks(collection, [cid for cid, _ in ranked])
+        hits = [  # IDs deleted since indexing are skipped
+            {"id": cid, "document": found[cid][0], "metadata": found[cid][1], "score": score, "similarity": None}
+            for cid, score in ranked
+            if cid in found
+        ]
+        if with_embeddings:
+            vectors = _fetch_embeddings(collection, [hit["id"] for hit in hits])
+            for hit in hits:
+                hit["embedding"] = vectors.get(hit["id"])
+        logger.info("Retrieved %s documents lexically", len(hits))
+        return hits
+
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    if source_filter is None and SOURCE_ROUTING:
+        with span("route"):
+            source_filter = route_sources(query_embedding)
+        if source_filter is not None:
+            logger.info("Routed query to %s", ", ".join(source_filter))
+            trace = current_trace()
+            if trace is not None:
+                trace.attrs["routed_sources"] = source_filter
+    n_candidates = k * MMR_CANDIDATES
+    ids, metas, vectors = _vector_search(collection, query_embedding, n_candidates, source_filter)
+    if exclude:
+        kept = [i for i, cid in enumerate(ids) if cid not in exclude]
+        ids, metas, vectors = [ids[i] for i in kept], [metas[i] for i in kept], [vectors[i] for i in kept]
+    exempt = set()  # Exact keyword hits survive the similarity cutoff
+
+    if mode == "hybrid":
+        # Fuse the vector and BM25 rankings, then fill in metadata/embeddings for lexical-only hits
+        t0 = time.perf_counter()
+        with span("lexical_search"):
+            lexical_ids = [
+                cid
+                for cid, _ in lexical.search(query, k * HYBRID_CANDIDATES + len(exclude), sources=source_filter)
+                if cid not in exclude
+            ]
+        fused = reciprocal_rank_fusion([ids, lexical_ids], n_candidates, RRF_K)
+        logger.info("BM25 lookup + fusion took %.3f ms", (time.perf_counter() - t0) * 1000)
+
+        have = {cid: (meta, vec) for cid, meta, vec in zip(ids, metas, vectors)}
+        missing = [cid for cid, _ in fused if cid not in have]
+        found = _fetch_chunks(collection, missing, documents=False)
+        found_vecs = _fetch_embeddings(collection, [cid for cid in missing if cid in found])
+        have.update({cid: (found[cid][1], found_vecs[cid]) for cid in found if cid in found_vecs})
+        fused = [(cid, score) for cid, score in fused if cid in have]
+        logger.info(
+            "Hybrid candidates: %s vector, %s lexical, %s lexical-only",
+            len(ids),
+            len(lexical_ids),
+            len(missing),
+        )
+        ids = [cid for cid, _ in fused]
+        metas, vectors = [have[c][0] for c in ids], [have[c][1] for c in ids]
+        top_fused = fused[0][1] if fused else 1.0
+        scores = np.asarray([score / top_fused for _, score in fused], dtype=np.float32)
+        exempt = set(lexical_ids[:k])
+
+    if not ids:
+        return []
+
+    t0 = time.perf_counter()
+    unit = _unit_rows(vectors)
+    similarities = unit @ _unit_rows([query_embedding])[0]
+    if mode == "vector":
+        scores = similarities
+    keep = relevance_cutoff(similarities) | np.asarray([cid in exempt for cid in ids])
+    kept = np.flatnonzero(keep)
+    picks = [int(kept[i]) for i in mmr_select(scores[kept], unit[kept], k)]
+    logger.info(
+        "Selected %s/%s candidates (%s past the relevance cutoff, MMR lambda=%s) in %.3f ms",
+        len(picks),
+        len(ids),
+        len(ids) - len(kept),
+        MMR_LAMBDA,
+        (time.perf_counter() - t0) * 1000,
     )
+    # Only the selected chunks are read; IDs deleted since indexing are skipped
+    texts = _fetch_chunks(collection, [ids[i] for i in picks], metadatas=False)
+    hits = []
+    for i in picks:
+        if ids[i] not in texts:
+            continue
+        hit = {
+            "id": ids[i],
+            "document": texts[ids[i]][0],
+            "metadata": metas[i],
+            "score": float(scores[i]),
+            "similarity": float(similarities[i]),
+        }
+        if with_embeddings:
+            hit["embedding"] = vectors[i]
+        hits.append(hit)
+    return hits
+
+
+def retrieve_context_batch(collection, queries: list[str], k: int = 5, query_embeddings=None):
+    """Vector retrieval for many queries with batched embedding and one multi-query search.
+
+    Returns (docs, metadatas, distances), each a list with one inner list per
+    query, in the same order as `queries` (the shape Chroma's query() uses).
+    Pass `query_embeddings` when the caller already embedded the queries.
+    """
+    logger.info("Running batch retrieval for %s queries with top_k=%s", len(queries), k)
+    if not queries:
+        return [], [], []
+
+    t0 = time.perf_counter()
+    embeddings = query_embeddings
+    if embeddings is None:
+        embeddings = []
+        for start in range(0, len(queries), QUERY_EMBED_BATCH_SIZE):
+            embeddings.extend(_query_cache.get_many(queries[start:start + QUERY_EMBED_BATCH_SIZE]))
+    embed_s = time.perf_counter() - t0
 
-    docs = result["documents"][0]
-    metas = result["metadatas"][0]
-    logger.info("Retrieved %s documents from Chroma", len(docs))
-    return docs, metas
+    t0 = time.perf_counter()
+    index = _store.vector_index() if RETRIEVAL_BACKEND == "numpy" else None
+    if index is not None:
+        rows, dists = index.search_batch(embeddings, k)
+        ids = [[index.ids[r] for r in row] for row in rows]
+        found = _fetch_chunks(collection, sorted({cid for row in ids for cid in row}))
+        docs = [[found[cid][0] for cid in row if cid in found] for row in ids]
+        metas = [[found[cid][1] for cid in row if cid in found] for row in ids]
+        distances = [[d for cid, d in zip(row, drow) if cid in found] for row, drow in zip(ids, dists.tolist())]
+    else:
+        result = collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+        docs, metas, distances = result["documents"], result["metadatas"], result["distances"]
+    search_s = time.perf_counter() - t0
+
+    logger.info(
+        "Batch retrieval done: embedding %.2fs, search %.2fs (%.1f queries/sec overall)",
+        embed_s,
+        search_s,
+        len(queries) / (embed_s + search_s) if embed_s + search_s else 0.0,
+    )
+    return docs, metas, distances
 
 
 def build_context_block(docs, metas) -> str:
-    """Format retrieved chunks into a single context string for the LLM."""
+    """Format retrieved chunks into a single context string for the LLM.
+
+    Neighbouring chunks of the same guideline are merged (their overlap kept
+    once), spans are ordered by relevance and cut at CONTEXT_CHAR_BUDGET.
+    """
+    with span("build_context"):
+        return _build_context_block(docs, metas)
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    for n in range(min(len(left), len(right)), MIN_OVERLAP_MATCH - 1, -1):
+        if left.endswith(right[:n]):
+            return n
+    return 0
+
+
+def merge_chunk_spans(docs, metas) -> list[dict]:
+    """Group hits by source and merge consecutive chunk indexes into de-duplicated spans.
+
+    `docs`/`metas` are in relevance order; each span keeps the best rank of its
+    chunks and spans are returned best first:
+    [{"source", "first", "last", "text", "rank"}].
+    """
+    by_source = {}  # source -> [(chunk_index, rank, doc)]
+    for rank, (doc, meta) in enumerate(zip(docs, metas)):
+        by_source.setdefault(meta.get("source"), []).append((meta.get("chunk_index"), rank, doc))
+
+    spans = []
+    for source, hits in by_source.items():
+        if any(idx is None for idx, _, _ in hits):  # Can't tell neighbours apart; keep chunks as they are
+            spans.extend(
+                {"source": source, "first": idx, "last": idx, "text": doc, "rank": rank} for idx, rank, doc in hits
+            )
+            continue
+        current = None
+        for idx, rank, doc in sorted(hits):
+            if current is not None and idx == current["last"]:
+                current["rank"] = min(current["rank"], rank)  # Same chunk retrieved twice
+            elif current is not None and idx == current["last"] + 1:
+                current["text"] += doc[_overlap_length(current["text"], doc):]
+                current["last"] = idx
+                current["rank"] = min(current["rank"], rank)
+            else:
+                current = {"source": source, "first": idx, "last": idx, "text": doc, "rank": rank}
+                spans.append(current)
+    return sorted(spans, key=lambda s: s["rank"])
+
+
+def _build_context_block(docs, metas, char_budget: int | None = CONTEXT_CHAR_BUDGET) -> str:
     logger.info("Building context block for %s chunks", len(docs))
 
+    spans = merge_chunk_spans(docs, metas)
     blocks = []
-    for doc, meta in zip(docs, metas):
-        src = meta.get("source")
-        idx = meta.get("chunk_index")
-        header = f"[Source: {src} | chunk {idx}]"
-        blocks.append(f"{header}\n{doc}")
+    for part in spans:
+        if part["first"] == part["last"]:
+            label = f"chunk {part['first']}"
+        else:
+            label = f"chunks {part['first']}-{part['last']}"
+        blocks.append(f"[Source: {part['source']} | {label}]\n{part['text']}")
+    merged = "\n\n".join(blocks)
+
+    context = merged
+    if char_budget is not None and len(merged) > char_budget:
+        kept, used = [], 0
+        for block in blocks:  # Most relevant first
+            remaining = char_budget - used
+            if len(block) > remaining:
+                if remaining > len(block.split("\n", 1)[0]) + MIN_OVERLAP_MATCH:
+                    kept.append(block[:remaining])  # Trim the span that only partly fits
+                break
+            kept.append(block)
+            used += len(block) + 2  # Blocks are joined with a blank line
+        context = "\n\n".join(kept)
+
+    # What pasting every chunk separately (the old layout) would have cost
+    naive = sum(len(f"[Source: {m.get('source')} | chunk {m.get('chunk_index')}]\n{d}") for d, m in zip(docs, metas))
+    naive += 2 * max(len(docs) - 1, 0)
+    saved = max(naive - len(merged), 0)
+    logger.info(
+        "Context block assembled with %s characters (%s chunks -> %s spans); "
+        "merging saved %s prompt characters (%.0f%%), budget trimmed %s",
+        len(context),
+        len(docs),
+        len(spans),
+        saved,
+        100 * saved / naive if naive else 0.0,
+        len(merged) - len(context),
+    )
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs["context_chars"] = len(context)
+        trace.attrs["context_chars_saved"] = saved
+    return context
+
+
+def build_messages(query: str, context: str) -> list[dict]:
+    """Return the chat messages for a question and its context block."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT_TEMPLATE.format(context=context, query=query)},
+    ]
+
+
+def _response_text(resp) -> str:
+    """Pull the message text out of an ollama chat response."""
+    # Depending on ollama-python version, response may be dict or object
+    # Try dict-style first, then attribute-style.
+    try:
+        return resp["message"]["content"]
+    except (TypeError, KeyError):
+        return resp.message.content
+
+
+def _sources(metas) -> list[dict]:
+    """Compact source list (guideline + chunk) for display alongside an answer."""
+    return [{"source": m.get("source"), "chunk_index": m.get("chunk_index")} for m in metas]
+
+
+def _cache_template(mode: str, source_filter=None) -> str:
+    """Answer-cache template key: prompt fingerprint plus the retrieval mode (and source filter) behind the context."""
+    template = f"{PROMPT_FINGERPRINT}:{mode}"
+    return f"{template}:{','.join(source_filter)}" if source_filter else template
+
+
+def _cached_answer(
+    query: str, llm_model: str, top_k: int, mode: str, corpus_version, use_cache: bool, source_filter=None
+):
+    """Check both answer-cache tiers. Returns (result or None, query embedding or None).
+
+    Lexical-mode requests only use the exact tier, so they never need an embedding.
+    """
+    if not use_cache:
+        return None, None
+    with span("answer_cache"):
+        return _lookup_answer_cache(query, llm_model, top_k, mode, corpus_version, source_filter)
+
+
+def _lookup_answer_cache(query: str, llm_model: str, top_k: int, mode: str, corpus_version, source_filter=None):
+    template = _cache_template(mode, source_filter)
+    entry = _answer_cache.lookup_exact(query, llm_model, top_k, template, corpus_version)
+    if entry is not None:
+        logger.info("Answer cache hit (exact) for query='%s'", query)
+        return {"answer": entry["answer"], "sources": entry["sources"], "cache": "exact"}, None
+    if mode == "lexical":
+        return None, None
+
+    query_vec = embed_query(query)
+    entry, similarity = _answer_cache.lookup_semantic(query_vec, llm_model, top_k, template, corpus_version)
+    if entry is not None:
+        logger.info(
+            "Answer cache hit (semantic, similarity=%.3f) for query='%s' via '%s'",
+            similarity,
+            query,
+            entry["query"],
+        )
+        return {"answer": entry["answer"], "sources": entry["sources"], "cache": "semantic"}, query_vec
+    return None, query_vec
+
+
+def _on_shared_collection(retrieve_fn, query: str, **kwargs):
+    """Run a retrieval on the shared collection, reconnecting once if it was rebuilt underneath us."""
+    try:
+        return retrieve_fn(get_collection(), query, **kwargs)
+    except STALE_COLLECTION_ERRORS:
+        logger.warning("Retrieval failed on cached collection; reconnecting and retrying", exc_info=True)
+        _store.reset()
+        return retrieve_fn(get_collection(), query, **kwargs)
+
+
+def _retrieve_for_answer(query: str, top_k: int, query_vec, mode: str, source_filter=None, conversation=None):
+    """Retrieve (docs, metas) for an answer; see `_retrieve_in_conversation` for `conversation`."""
+    if conversation is not None:
+        return _retrieve_in_conversation(conversation, query, top_k, query_vec, mode, source_filter)
+    return _on_shared_collection(
+        retrieve_context, query, k=top_k, query_embedding=query_vec, mode=mode, source_filter=source_filter
+    )
+
+
+def _retrieve_in_conversation(conversation, query: str, top_k: int, query_vec, mode: str, source_filter=None):
+    """Reuse chunks of recent turns that still match the query and search for the rest of the top-k.
+
+    At most top_k // 2 chunks are reused, so every turn still searches for at
+    least half of its context: a follow-up that reads like the last question
+    but asks about something new ("and for PFS?") still gets fresh chunks.
+    `conversation` is the session's ConversationCache; this turn's chunks are added to it.
+    """
+    if query_vec is None and mode != "lexical":
+        query_vec = embed_query(query)
+    with span("conversation_reuse"):
+        reused = conversation.reusable(query_vec, top_k // 2, _store.corpus_version, source_filter)
+    hits = list(reused) + _on_shared_collection(
+        retrieve_with_scores,
+        query,
+        k=top_k - len(reused),
+        query_embedding=query_vec,
+        mode=mode,
+        source_filter=source_filter,
+        exclude_ids={hit["id"] for hit in reused},
+        with_embeddings=True,
+    )
+    if reused:
+        logger.info(
+            "Reused %s/%s chunks from earlier turns; searched for %s", len(reused), len(hits), top_k - len(reused)
+        )
+        hits.sort(key=lambda hit: hit["similarity"] if hit["similarity"] is not None else -1.0, reverse=True)
+    conversation.add_turn(hits, reused=len(reused))
+    trace = current_trace()
+    if trace is not None:
+        trace.attrs["reused_chunks"] = len(reused)
+    return [hit["document"] for hit in hits], [hit["metadata"] for hit in hits]
+
+
+def _cache_answer(query, query_vec, llm_model, top_k, mode, corpus_version, answer, sources, source_filter=None):
+    _answer_cache.store(
+        query,
+        query_vec,
+        llm_model,
+        top_k,
+        _cache_template(mode, source_filter),
+        corpus_version,
+        answer=answer,
+        sources=sources,
+    )
+
+
+def answer_question_detailed(
+    query: str,
+    llm_model: str = DEFAULT_LLM_MODEL,
+    top_k: int = 5,
+    use_cache: bool = True,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+    conversation=None,
+) -> dict:
+    """
+    Full RAG flow with details for the UI:
+      1) serve from the answer cache if an identical/near-identical question was answered
+      2) retrieve top-k chunks from Chroma
+      3) build a context prompt and call the Ollama chat model
+    Returns {"answer", "sources", "cache", "timings"} where cache is None,
+    "exact" or "semantic" and timings maps stage name -> milliseconds.
+    `source_filter` restricts retrieval to those guidelines (see retrieve_with_scores).
+    `conversation` (a per-session ConversationCache) lets follow-up questions
+    reuse chunks retrieved for earlier turns.
+    """
+    mode = resolve_mode(query, mode)
+    source_filter = _normalise_sources(source_filter)
+    with trace_request("answer", model=llm_model, mode=mode, top_k=top_k, source_filter=source_filter) as trace:
+        result = _answer_detailed(query, llm_model, top_k, use_cache, mode, source_filter, conversation)
+        trace.attrs["cache"] = result["cache"]
+        result["timings"] = trace.breakdown()
+        result["trace_id"] = trace.trace_id
+        return result
+
+
+def _answer_detailed(
+    query: str, llm_model: str, top_k: int, use_cache: bool, mode: str, source_filter, conversation=None
+) -> dict:
+    corpus_version = _store.corpus_version
+    cached, query_vec = _cached_answer(query, llm_model, top_k, mode, corpus_version, use_cache, source_filter)
+    if cached is not None:
+        return cached
+
+    docs, metas = _retrieve_for_answer(query, top_k, query_vec, mode, source_filter, conversation)
+    if not docs:
+        logger.warning("No context retrieved for query='%s'", query)
+        return {"answer": NO_CONTEXT_ANSWER, "sources": [], "cache": None}
+
+    context = build_context_block(docs, metas)
+    logger.info(
+        "Calling LLM model '%s' with context length=%s and top_k=%s",
+        llm_model,
+        len(context),
+        top_k,
+    )
+
+    try:
+        with _llm_slot(), span("llm", model=llm_model):
+            resp = _models.chat(llm_model, build_messages(query, context))
+        logger.info("LLM response received successfully for query='%s'", query)
+    except Exception:
+        logger.exception("LLM call failed for query='%s'", query)
+        raise
+
+    answer = _response_text(resp)
+    sources = _sources(metas)
+    # Answers built on earlier turns' chunks depend on the conversation, so the answer cache must not share them
+    reused = conversation.last_reused if conversation is not None else 0
+    if use_cache and not reused:
+        _cache_answer(query, query_vec, llm_model, top_k, mode, corpus_version, answer, sources, source_filter)
+    return {"answer": answer, "sources": sources, "cache": None}
+
+
+def stream_answer(
+    query: str,
+    llm_model: str = DEFAULT_LLM_MODEL,
+    top_k: int = 5,
+    use_cache: bool = True,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+    conversation=None,
+):
+    """
+    Streaming RAG flow. Yields event dicts:
+      {"type": "sources", "sources": [...], "cache": None | "exact" | "semantic",
+       "reused": chunks reused from earlier turns}                                (first)
+      {"type": "token", "text": "..."}                                           (repeated)
+      {"type": "done", "answer", "ttft", "tokens_per_sec", "elapsed", "cache",
+       "timings", "trace_id"}                                                   (last)
+    ttft is measured from the call, so it includes retrieval time; timings maps
+    stage name -> milliseconds. `conversation` is as in answer_question_detailed.
+    """
+    mode = resolve_mode(query, mode)
+    source_filter = _normalise_sources(source_filter)
+    with trace_request("stream", model=llm_model, mode=mode, top_k=top_k, source_filter=source_filter) as trace:
+        for event in _stream_answer(query, llm_model, top_k, use_cache, mode, source_filter, conversation):
+            if event["type"] == "done":
+                trace.attrs["cache"] = event["cache"]
+                event["timings"] = trace.breakdown()
+                event["trace_id"] = trace.trace_id
+            yield event
+
+
+def _stream_answer(
+    query: str, llm_model: str, top_k: int, use_cache: bool, mode: str, source_filter, conversation=None
+):
+    start = time.perf_counter()
+    corpus_version = _store.corpus_version
+    cached, query_vec = _cached_answer(query, llm_model, top_k, mode, corpus_version, use_cache, source_filter)
+    if cached is not None:
+        yield {"type": "sources", "sources": cached["sources"], "cache": cached["cache"], "reused": 0}
+        yield {"type": "token", "text": cached["answer"]}
+        elapsed = time.perf_counter() - start
+        yield {
+            "type": "done",
+            "answer": cached["answer"],
+            "ttft": elapsed,
+            "tokens_per_sec": None,
+            "elapsed": elapsed,
+            "cache": cached["cache"],
+        }
+        return
 
-    logger.info("Context block assembled with %s characters", sum(len(b) for b in blocks))
-    return "\n\n".join(blocks)
+    docs, metas = _retrieve_for_answer(query, top_k, query_vec, mode, source_filter, conversation)
+    sources = _sources(metas)
+    reused = conversation.last_reused if conversation is not None else 0
+    yield {"type": "sources", "sources": sources, "cache": None, "reused": reused}
+
+    if not docs:
+        logger.warning("No context retrieved for query='%s'", query)
+        yield {"type": "token", "text": NO_CONTEXT_ANSWER}
+        elapsed = time.perf_counter() - start
+        yield {
+            "type": "done",
+            "answer": NO_CONTEXT_ANSWER,
+            "ttft": elapsed,
+            "tokens_per_sec": None,
+            "elapsed": elapsed,
+            "cache": None,
+        }
+        return
+
+    context = build_context_block(docs, metas)
+    logger.info(
+        "Streaming LLM model '%s' with context length=%s and top_k=%s",
+        llm_model,
+        len(context),
+        top_k,
+    )
+
+    parts = []
+    ttft = None
+    first_token_at = None
+    token_chunks = 0
+    eval_count = eval_duration = None
+    with _llm_slot():
+        llm_start = time.perf_counter()
+        try:
+            for chunk in _models.chat(llm_model, build_messages(query, context), stream=True):
+                text = _response_text(chunk)
+                if text:
+                    if ttft is None:
+                        first_token_at = time.perf_counter()
+                        ttft = first_token_at - start
+                        logger.info("First token after %.2fs for query='%s'", ttft, query)
+                    token_chunks += 1
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+                if chunk.get("done"):
+                    eval_count = chunk.get("eval_count")
+                    eval_duration = chunk.get("eval_duration")  # nanoseconds
+        except Exception:
+            logger.exception("Streaming LLM call failed for query='%s'", query)
+            raise
+
+    end = time.perf_counter()
+    # Timed by hand: a span around the loop would also count the consumer's time between yields
+    record_span("llm", end - llm_start, start=llm_start, model=llm_model, ttft_ms=(ttft or 0) * 1000)
+    if eval_count and eval_duration:
+        tokens_per_sec = eval_count / (eval_duration / 1e9)  # Server-side decode rate
+    elif first_token_at is not None and end > first_token_at:
+        tokens_per_sec = token_chunks / (end - first_token_at)  # One streamed chunk ~ one token
+    else:
+        tokens_per_sec = None
+
+    answer = "".join(parts)
+    logger.info(
+        "Streamed answer (chars=%s) in %.2fs; ttft=%s, tokens/sec=%s",
+        len(answer),
+        end - start,
+        f"{ttft:.2f}s" if ttft is not None else "n/a",
+        f"{tokens_per_sec:.1f}" if tokens_per_sec else "n/a",
+    )
+    if use_cache and answer and not reused:
+        _cache_answer(query, query_vec, llm_model, top_k, mode, corpus_version, answer, sources, source_filter)
+    yield {
+        "type": "done",
+        "answer": answer,
+        "ttft": ttft,
+        "tokens_per_sec": tokens_per_sec,
+        "elapsed": end - start,
+        "cache": None,
+    }
 
 
 def answer_question(
     query: str,
     llm_model: str = DEFAULT_LLM_MODEL,
     top_k: int = 5,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
 ) -> str:
     """
     Full RAG flow:
@@ -92,53 +1256,100 @@ def answer_question(
       3) call Ollama chat model
       4) return answer text
     """
-    collection = get_collection()
-    docs, metas = retrieve_context(collection, query, k=top_k)
+    return answer_question_detailed(
+        query, llm_model=llm_model, top_k=top_k, mode=mode, source_filter=source_filter
+    )["answer"]
+
+
+async def aretrieve_context(
+    query: str,
+    k: int = 5,
+    query_embedding=None,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+):
+    """Async counterpart of retrieve_context on the shared collection.
+
+    The Chroma query (and a cache-miss embedding call) run in a worker thread
+    so the event loop keeps serving other requests meanwhile.
+    """
+    return await asyncio.to_thread(
+        _retrieve_for_answer, query, k, query_embedding, resolve_mode(query, mode), _normalise_sources(source_filter)
+    )
+
 
+async def _aanswer(query: str, llm_model: str, top_k: int, use_cache: bool, mode: str | None, source_filter) -> dict:
+    mode = resolve_mode(query, mode)
+    source_filter = _normalise_sources(source_filter)
+    corpus_version = await asyncio.to_thread(lambda: _store.corpus_version)
+    cached, query_vec = await asyncio.to_thread(
+        _cached_answer, query, llm_model, top_k, mode, corpus_version, use_cache, source_filter
+    )
+    if cached is not None:
+        return cached
+
+    docs, metas = await aretrieve_context(
+        query, k=top_k, query_embedding=query_vec, mode=mode, source_filter=source_filter
+    )
     if not docs:
         logger.warning("No context retrieved for query='%s'", query)
-        return "I couldn't retrieve any relevant context for this question."
+        return {"answer": NO_CONTEXT_ANSWER, "sources": [], "cache": None}
 
     context = build_context_block(docs, metas)
     logger.info(
-        "Calling LLM model '%s' with context length=%s and top_k=%s",
+        "Calling LLM model '%s' (async) with context length=%s and top_k=%s",
         llm_model,
         len(context),
         top_k,
     )
 
-    system_prompt = (
-        "You are a clinical-trials assistant. "
-        "Answer the user's question using ONLY the context given. "
-        "If the answer is not in the context, say explicitly: "
-        "'The answer is not available in the provided guidelines.' "
-        "Cite guideline names or sections when possible, but do not invent facts."
-    )
+    # Stream even though we return the full text: closing the stream on
+    # cancellation drops the HTTP connection, which makes Ollama stop generating.
+    llm_start = time.perf_counter()
+    stream = await _models.achat(llm_model, build_messages(query, context), stream=True)
+    parts = []
+    try:
+        async for chunk in stream:
+            parts.append(_response_text(chunk))
+    except asyncio.CancelledError:
+        logger.info("Async request cancelled after %s chunks; aborting generation for query='%s'", len(parts), query)
+        raise
+    finally:
+        await stream.aclose()
+        record_span("llm", time.perf_counter() - llm_start, start=llm_start, model=llm_model)
 
-    user_prompt = (
-        f"Context from clinical guidelines:\n\n{context}\n\n"
-        f"Question: {query}\n\n"
-        f"Answer concisely in a few paragraphs."
-    )
+    answer = "".join(parts)
+    logger.info("LLM response received successfully (async) for query='%s'", query)
+    sources = _sources(metas)
+    if use_cache:
+        _cache_answer(query, query_vec, llm_model, top_k, mode, corpus_version, answer, sources, source_filter)
+    return {"answer": answer, "sources": sources, "cache": None}
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
 
-    try:
-        resp = chat(model=llm_model, messages=messages)
-        logger.info("LLM response received successfully for query='%s'", query)
-    except Exception:
-        logger.exception("LLM call failed for query='%s'", query)
-        raise
+async def aanswer_question(
+    query: str,
+    llm_model: str = DEFAULT_LLM_MODEL,
+    top_k: int = 5,
+    use_cache: bool = True,
+    timeout: float | None = ASYNC_REQUEST_TIMEOUT,
+    mode: str | None = None,
+    source_filter: list[str] | None = None,
+) -> dict:
+    """Async counterpart of answer_question_detailed for concurrent callers.
 
-    # Depending on ollama-python version, response may be dict or object
-    # Try dict-style first, then attribute-style.
-    try:
-        return resp["message"]["content"]
-    except (TypeError, KeyError):
-        return resp.message.content
+    Raises asyncio.TimeoutError if the request takes longer than `timeout`
+    seconds; timing out or cancelling the awaiting task aborts the generation.
+    """
+    with trace_request("async_answer", model=llm_model, top_k=top_k) as trace:
+        try:
+            result = await asyncio.wait_for(
+                _aanswer(query, llm_model, top_k, use_cache, mode, source_filter), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Async request timed out after %ss for query='%s'", timeout, query)
+            raise
+        trace.attrs["cache"] = result["cache"]
+        return {**result, "timings": trace.breakdown(), "trace_id": trace.trace_id}
 
 
 def _demo():
@@ -0,0 +1,433 @@
+"""Standalone HTTP service around the RAG core, plus a small client.
+
+One process holds the Chroma connection, caches and Ollama clients; any number
+of UIs or scripts call it over HTTP:
+
+  POST /retrieve  {"query", "k", "mode", "sources"}             -> {"hits": [...]}
+  POST /answer    {"query", "model", "top_k", "mode", "use_cache", "stream", "sources"}
+                  -> answer_question_detailed() JSON, or stream_answer() events as NDJSON
+  GET  /health    -> status, chunk count, guideline names, queue, batching, model-load and cold-start stats
+  GET  /metrics   -> Prometheus text metrics (see tracing.py)
+
+Admission control: at most `max_active` requests run at once, up to
+`max_queue` more wait (for at most `queue_timeout` seconds), and the rest get
+HTTP 503 with Retry-After. LLM generations are capped separately
+(`llm_concurrency`), and query embeddings from concurrent requests are
+coalesced into one Ollama call per `batch_window`.
+
+Run from: clinical_rag/src
+    python rag_service.py --port 8765
+    python rag_service.py --fake-ollama --smoke 32      # localhost-only check with the stub Ollama
+    RAG_SERVICE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tracing import render_metrics
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+MAX_ACTIVE = 8  # Requests processed concurrently
+MAX_QUEUE = 32  # Requests allowed to wait for a free slot
+QUEUE_TIMEOUT = 30.0  # Seconds a request may wait before it is turned away
+LLM_CONCURRENCY = 2  # Chat generations in flight against Ollama
+BATCH_WINDOW_MS = 5.0  # Query-embedding micro-batching window
+CLIENT_TIMEOUT = 300.0
+MAX_BODY_BYTES = 1 << 20
+
+rag_core = None  # Imported by start_service(), after OLLAMA_HOST is final
+
+
+class ServiceBusy(RuntimeError):
+    """The service turned the request away (queue full or waited too long)."""
+
+
+class AdmissionControl:
+    """Bounded concurrency with a bounded wait queue."""
+
+    def __init__(self, max_active: int = MAX_ACTIVE, max_queue: int = MAX_QUEUE):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = QUEUE_TIMEOUT) -> bool:
+        """Take a slot, queueing if needed; False if the queue is full or the wait timed out."""
+        with self._cond:
+            if self.active < self.max_active:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.max_active, timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+            }
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to rag_core; configuration lives on the server object."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: dict):
+        line = json.dumps(payload, default=str).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict) or not str(payload.get("query", "")).strip():
+            raise ValueError("expected a JSON object with a non-empty 'query'")
+        return payload
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "chunks": server.chunk_count,
+                "sources": rag_core.list_sources(),
+                "admission": server.admission.stats(),
+                "embed_batcher": server.batcher.stats(),
+                "query_cache": rag_core.query_cache_stats(),
+                "models": rag_core.model_stats(),
+                "cold_start": rag_core.cold_start_stats(),
+            })
+        elif self.path == "/metrics":
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path not in {"/retrieve", "/answer"}:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        try:
+            payload = self._read_json()
+        except ValueError as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+
+        server = self.server
+        if not server.admission.acquire(server.queue_timeout):
+            logger.warning("Rejecting %s request: service overloaded (%s)", self.path, server.admission.stats())
+            self._send_json(503, {"error": "service overloaded, retry later"}, {"Retry-After": "1"})
+            return
+        try:
+            if self.path == "/retrieve":
+                self._retrieve(payload)
+            elif payload.get("stream"):
+                self._stream(payload)
+            else:
+                self._answer(payload)
+        except ValueError as exc:  # e.g. unknown retrieval mode
+            self._send_json(400, {"error": str(exc)})
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected during %s", self.path)
+        except Exception as exc:
+            logger.exception("Request to %s failed", self.path)
+            self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+        finally:
+            server.admission.release()
+
+    def _retrieve(self, payload: dict):
+        hits = rag_core.retrieve_with_scores(
+            rag_core.get_collection(),
+            payload["query"],
+            k=int(payload.get("k", 5)),
+            mode=payload.get("mode"),
+            source_filter=payload.get("sources"),
+        )
+        self._send_json(200, {"hits": hits})
+
+    def _answer_args(self, payload: dict) -> dict:
+        return {
+            "llm_model": payload.get("model") or rag_core.DEFAULT_LLM_MODEL,
+            "top_k": int(payload.get("top_k", 5)),
+            "use_cache": bool(payload.get("use_cache", True)),
+            "mode": payload.get("mode"),
+            "source_filter": payload.get("sources"),
+        }
+
+    def _answer(self, payload: dict):
+        self._send_json(200, rag_core.answer_question_detailed(payload["query"], **self._answer_args(payload)))
+
+    def _stream(self, payload: dict):
+        events = rag_core.stream_answer(payload["query"], **self._answer_args(payload))
+        first = next(events)  # Surface retrieval errors as a normal JSON error response
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._send_chunk(first)
+            for event in events:
+                self._send_chunk(event)
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as exc:  # Headers are out already; report in-band
+            logger.exception("Streaming request failed")
+            self._send_chunk({"type": "error", "error": f"{type(exc).__name__}: {exc}"})
+        finally:
+            events.close()  # Releases the LLM slot if the client went away
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_service(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    max_active: int = MAX_ACTIVE,
+    max_queue: int = MAX_QUEUE,
+    queue_timeout: float = QUEUE_TIMEOUT,
+    llm_concurrency: int | None = LLM_CONCURRENCY,
+    batch_window_ms: float = BATCH_WINDOW_MS,
+) -> ThreadingHTTPServer:
+    """Warm up the RAG core and serve it on a background thread; port=0 picks a free port.
+
+    The returned server exposes `.url`; call `.shutdown()` to stop it.
+    """
+    global rag_core
+    import rag_core as core
+    from embedding_pool import EmbeddingBatcher, embed_texts
+
+    rag_core = core
+    batcher = EmbeddingBatcher(
+        lambda texts: embed_texts(texts, model=core.EMBED_MODEL_NAME, url=core.OLLAMA_URL),
+        window=batch_window_ms / 1000,
+    )
+    core.set_query_embedder(batcher.embed)
+    core.set_llm_concurrency(llm_concurrency)
+
+    server = ThreadingHTTPServer((host, port), RAGRequestHandler)
+    server.daemon_threads = True
+    server.admission = AdmissionControl(max_active, max_queue)
+    server.queue_timeout = queue_timeout
+    server.batcher = batcher
+    server.chunk_count = core.warm_up()
+    server.url = f"http://{host}:{server.server_address[1]}"
+
+    threading.Thread(target=server.serve_forever, name="rag-service", daemon=True).start()
+    logger.info(
+        "RAG service listening on %s (%s chunks; max_active=%s, max_queue=%s, llm_concurrency=%s, batch=%.1f ms)",
+        server.url,
+        server.chunk_count,
+        max_active,
+        max_queue,
+        llm_concurrency,
+        batch_window_ms,
+    )
+    return server
+
+
+class ServiceClient:
+    """Minimal stdlib client for rag_service; mirrors the rag_core entry points."""
+
+    def __init__(self, url: str, timeout: float = CLIENT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: dict | None = None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(
+            self.url + path,
+            data=data,
+            headers={"Content-Type": "application/json"},
+            method="GET" if data is None else "POST",
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", "replace")
+            if exc.code == 503:
+                raise ServiceBusy(detail) from exc
+            raise RuntimeError(f"RAG service returned HTTP {exc.code}: {detail}") from exc
+
+    def health(self) -> dict:
+        with self._request("/health") as resp:
+            return json.load(resp)
+
+    def retrieve(self, query: str, k: int = 5, mode: str | None = None, source_filter=None) -> list[dict]:
+        with self._request("/retrieve", {"query": query, "k": k, "mode": mode, "sources": source_filter}) as resp:
+            return json.load(resp)["hits"]
+
+    def answer(self, query: str, llm_model: str | None = None, top_k: int = 5, use_cache: bool = True,
+               mode: str | None = None, source_filter=None) -> dict:
+        payload = {
+            "query": query,
+            "model": llm_model,
+            "top_k": top_k,
+            "use_cache": use_cache,
+            "mode": mode,
+            "sources": source_filter,
+        }
+        with self._request("/answer", payload) as resp:
+            return json.load(resp)
+
+    def stream_answer(self, query: str, llm_model: str | None = None, top_k: int = 5, use_cache: bool = True,
+                      mode: str | None = None, source_filter=None):
+        """Yield the same events as rag_core.stream_answer."""
+        payload = {
+            "query": query,
+            "model": llm_model,
+            "top_k": top_k,
+            "use_cache": use_cache,
+            "mode": mode,
+            "sources": source_filter,
+            "stream": True,
+        }
+        with self._request("/answer", payload) as resp:
+            for line in resp:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["type"] == "error":
+                    raise RuntimeError(f"RAG service error: {event['error']}")
+                yield event
+
+
+def smoke_test(url: str, n_requests: int = 32, concurrency: int = 16) -> dict:
+    """Fire concurrent /retrieve and /answer calls and summarise statuses and batching."""
+    client = ServiceClient(url)
+    outcomes = {"ok": 0, "busy": 0, "error": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i: int):
+        t0 = time.perf_counter()
+        try:
+            if i % 2:
+                client.retrieve(f"smoke test question {i} about estimands", k=5)
+            else:
+                client.answer(f"smoke test question {i} about informed consent", use_cache=False)
+            outcome = "ok"
+        except ServiceBusy:
+            outcome = "busy"
+        except Exception:
+            logger.exception("Smoke request %s failed", i)
+            outcome = "error"
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - t0
+
+    health = client.health()
+    latencies.sort()
+    summary = {
+        **outcomes,
+        "seconds": wall,
+        "requests_per_sec": n_requests / wall if wall else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "embed_batcher": health["embed_batcher"],
+        "admission": health["admission"],
+    }
+    logger.info("Smoke test summary: %s", summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service around the clinical RAG core.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-active", type=int, default=MAX_ACTIVE, help="requests processed at once")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="requests allowed to wait")
+    parser.add_argument("--queue-timeout", type=float, default=QUEUE_TIMEOUT, help="seconds a request may wait")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY, help="0 = unlimited")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--fake-ollama", action="store_true", help="serve against the local stub Ollama")
+    parser.add_argument("--smoke", type=int, metavar="N", help="send N concurrent test requests, then exit")
+    args = parser.parse_args()
+
+    fake = None
+    if args.fake_ollama:
+        from fake_ollama import start_fake_ollama
+
+        fake = start_fake_ollama(latency=0.01, token_latency=0.002)
+        os.environ["OLLAMA_HOST"] = fake.url  # Must be set before rag_core/ollama are imported
+
+    server = start_service(
+        args.host,
+        0 if args.smoke else args.port,
+        args.max_active,
+        args.max_queue,
+        args.queue_timeout,
+        args.llm_concurrency or None,
+        args.batch_window_ms,
+    )
+    try:
+        if args.smoke:
+            smoke_test(server.url, n_requests=args.smoke)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("Stopping RAG service.")
+    finally:
+        server.shutdown()
+        if fake is not None:
+            fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,24 @@
 """CLI playground for retrieval results with verbose logging."""
 
+import argparse
 import logging
+import os
+import time
 from pathlib import Path
 
 import chromadb
 from chromadb.utils import embedding_functions
 
+from embedding_pool import embed_texts
+from rag_core import QUERY_EMBED_BATCH_SIZE, query_cache_stats, retrieve_context_batch, retrieve_with_scores
+
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parents[1]
-CHROMA_DIR = BASE_DIR / "data" / "chroma_db"
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+CHROMA_DIR = DATA_DIR / "chroma_db"
 COLLECTION_NAME = "clinical_guidelines"
 
 
@@ -33,34 +40,94 @@ def get_collection():
     return collection
 
 
-def query_once(collection, question: str, k: int = 5):
-    """Run a single retrieval query and log the ranked results."""
+def query_once(collection, question: str, k: int = 5, mode: str | None = None, source_filter=None):
+    """Run a single retrieval query and log the ranked results with their scores."""
     logger.info("Question: %s", question)
 
-    result = collection.query(
-        query_texts=[question],
-        n_results=k,
-    )
-
-    docs = result["documents"][0]
-    metas = result["metadatas"][0]
+    # Same selection as the app (routing, cutoff + MMR); query embeddings are cached
+    hits = retrieve_with_scores(collection, question, k=k, mode=mode, source_filter=source_filter)
 
-    logger.info("Top %s retrieved chunks:", k)
-    for i, (doc, meta) in enumerate(zip(docs, metas)):
+    logger.info("Top %s retrieved chunks (up to %s requested):", len(hits), k)
+    for i, hit in enumerate(hits):
+        meta = hit["metadata"]
         logger.info("=" * 80)
         logger.info("Rank #%s", i + 1)
         logger.info("Source      : %s", meta.get("source"))
         logger.info("Chunk index : %s", meta.get("chunk_index"))
+        logger.info("Score       : %.4f", hit["score"])
+        if hit["similarity"] is not None:
+            logger.info("Similarity  : %.4f", hit["similarity"])
         logger.info("-" * 80)
-        logger.info("%s", doc[:600].replace("\n", "\\n\n"))
+        logger.info("%s", hit["document"][:600].replace("\n", "\\n\n"))
         logger.info("[...]")
 
+    stats = query_cache_stats()
+    logger.info(
+        "Query-embedding cache: %s memory hits, %s disk hits, %s misses (~%.0f ms saved)",
+        stats["memory_hits"],
+        stats["disk_hits"],
+        stats["misses"],
+        stats["est_saved_ms"],
+    )
+
+
+def benchmark_batch_retrieval(collection, questions: list[str], k: int = 5) -> dict:
+    """Compare one-query-per-round-trip retrieval with retrieve_context_batch.
+
+    Both paths bypass the query-embedding cache so they pay for every
+    embedding: the loop sends one request per question, the batch path one
+    request per QUERY_EMBED_BATCH_SIZE questions.
+    """
+    logger.info("Benchmarking retrieval over %s questions (k=%s)", len(questions), k)
+
+    t0 = time.perf_counter()
+    for question in questions:
+        vector = embed_texts([question])[0]
+        collection.query(query_embeddings=[vector], n_results=k)
+    loop_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    embeddings = []
+    for start in range(0, len(questions), QUERY_EMBED_BATCH_SIZE):
+        embeddings.extend(embed_texts(questions[start:start + QUERY_EMBED_BATCH_SIZE]))
+    retrieve_context_batch(collection, questions, k=k, query_embeddings=embeddings)
+    batch_s = time.perf_counter() - t0
+
+    stats = {
+        "questions": len(questions),
+        "loop_seconds": loop_s,
+        "batch_seconds": batch_s,
+        "loop_qps": len(questions) / loop_s if loop_s else 0.0,
+        "batch_qps": len(questions) / batch_s if batch_s else 0.0,
+    }
+    stats["speedup"] = stats["batch_qps"] / stats["loop_qps"] if stats["loop_qps"] else 0.0
+    logger.info(
+        "One-at-a-time: %.1f q/s | batch: %.1f q/s | speedup x%.1f",
+        stats["loop_qps"],
+        stats["batch_qps"],
+        stats["speedup"],
+    )
+    return stats
+
 
 def main():
-    """Interactive loop to issue retrieval queries."""
+    """Interactive loop to issue retrieval queries (or --bench FILE for a throughput comparison)."""
+    parser = argparse.ArgumentParser(description="Retrieval playground.")
+    parser.add_argument("--bench", type=Path, help="text file with one question per line to benchmark")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--mode", choices=("vector", "lexical", "hybrid"), help="retrieval mode (default: rag_core's)")
+    parser.add_argument("--source", action="append", help="only search this guideline PDF (repeatable)")
+    args = parser.parse_args()
+
     logger.info("retriever_playground.py starting")
 
     collection = get_collection()
+
+    if args.bench:
+        questions = [line.strip() for line in args.bench.read_text(encoding="utf-8").splitlines() if line.strip()]
+        benchmark_batch_retrieval(collection, questions, k=args.k)
+        return
+
     logger.info("Loaded collection '%s' with %s documents.", COLLECTION_NAME, collection.count())
 
     while True:
@@ -69,7 +136,7 @@ def main():
             logger.info("Exiting retrieval playground loop.")
             break
 
-        query_once(collection, question, k=5)
+        query_once(collection, question, k=args.k, mode=args.mode, source_filter=args.source)
 
 
 if __name__ == "__main__":
@@ -9,7 +9,7 @@ Flow:
 5. For each question:
    - Retrieve top-k similar chunks from Chroma.
    - Build a prompt with those chunks as context.
-   - Call Ollama LLM directly and show answer + sources.
+   - Call the Ollama chat model (shared, pre-loaded client from model_manager) and show answer + sources.
 
 Run from: clinical_rag/src
     (.venv) D:\...\clinical_rag\src> python rush_rag.py
@@ -24,7 +24,8 @@ from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
+
+from model_manager import get_model_manager
 
 # ==============================
 # 1. LOGGING CONFIG
@@ -175,16 +176,10 @@ Question: {question}
 Answer in 3–5 concise sentences:
 """.strip()
 
-    # --- 4. Call Ollama LLM directly ---
-    llm = Ollama(model=CHAT_MODEL)
-
-    raw_response = llm.invoke(prompt)
-
-    # Normalise to text
-    if hasattr(raw_response, "content"):
-        answer_text = raw_response.content
-    else:
-        answer_text = str(raw_response)
+    # --- 4. Call the Ollama chat model ---
+    # Shared pooled client with keep-alive, instead of a new LangChain Ollama object per question
+    raw_response = get_model_manager().chat(CHAT_MODEL, [{"role": "user", "content": prompt}])
+    answer_text = raw_response["message"]["content"] or ""
 
     return answer_text.strip(), source_docs
 
@@ -229,5 +224,8 @@ if __name__ == "__main__":
     # 2) Chunks -> Chroma vector store
     vectordb = build_vectorstore(chunks)
 
-    # 3) Start Q&A loop
+    # 3) Load both models now so the first question does not pay for it
+    get_model_manager().warm_up(chat_models=[CHAT_MODEL], embed_models=[EMBED_MODEL])
+
+    # 4) Start Q&A loop
     qa_cli(vectordb)
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Content-addressed on-disk cache of per-page text extracted from PDFs.
+
+Entries are keyed by the PDF's SHA-256 and the extractor version (our layout
+version plus the pypdf version), so a renamed file still hits, an edited
+file or a pypdf upgrade misses, and nothing needs explicit invalidation.
+Each entry is one gzip-compressed JSON list of page texts under
+data/cache/extracted_text/.
+"""
+
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+
+from ingest_manifest import file_sha256
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+TEXT_CACHE_DIR = DATA_DIR / "cache" / "extracted_text"
+
+CACHE_FORMAT_VERSION = 1  # Bump when page extraction or the entry layout changes
+
+
+def extractor_version() -> str:
+    """Identifies the code that produced cached text; part of every cache key."""
+    try:
+        from pypdf import __version__ as pypdf_version
+    except ImportError:
+        pypdf_version = "unknown"
+    return f"v{CACHE_FORMAT_VERSION}-pypdf{pypdf_version}"
+
+
+class ExtractedTextCache:
+    """Per-page PDF text keyed by (file hash, extractor version)."""
+
+    def __init__(self, cache_dir: Path = TEXT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.version = extractor_version()
+
+    def _entry_path(self, sha256: str) -> Path:
+        return self.cache_dir / f"{sha256}-{self.version}.json.gz"
+
+    def get(self, sha256: str) -> list[str] | None:
+        """Cached page texts for a file hash, or None on a miss."""
+        path = self._entry_path(sha256)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                return json.load(fh)["pages"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            logger.warning("Ignoring unreadable extracted-text cache entry %s", path.name)
+            return None
+
+    def put(self, sha256: str, pages: list[str], source: str | None = None) -> None:
+        """Store page texts atomically (temp file + rename)."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(sha256)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        payload = {"sha256": sha256, "extractor": self.version, "source": source, "pages": pages}
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as fh:
+            json.dump(payload, fh, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def lookup(self, pdf_paths: list[Path]) -> tuple[dict, dict]:
+        """Split files into ({path: pages} hits, {path: sha256} misses)."""
+        hits, misses = {}, {}
+        for pdf_path in pdf_paths:
+            sha256 = file_sha256(pdf_path)
+            pages = self.get(sha256)
+            if pages is None:
+                misses[pdf_path] = sha256
+            else:
+                hits[pdf_path] = pages
+        return hits, misses
+
+    def clear(self) -> int:
+        """Delete every cached entry; returns how many were removed."""
+        removed = 0
+        for path in self.cache_dir.glob("*.json.gz"):
+            path.unlink()
+            removed += 1
+        return removed
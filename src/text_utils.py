@@ -1,9 +1,36 @@
-"""Shared text utilities for PDF experiments with detailed logging."""
+"""Shared text utilities for PDF experiments with detailed logging.
 
+`python text_utils.py` sweeps chunking configs: for every (chunk_size, overlap)
+pair it builds a throwaway in-memory vector index of the corpus (configs run
+in parallel), asks the golden questions in data/golden_questions.jsonl and
+reports recall@k, index size, embedding cost and query latency, so CHUNK_SIZE
+and OVERLAP in ingest.py can be chosen from measurements.
+
+Golden questions are JSON lines: {"question", "source", "keywords"}. A chunk
+counts as relevant if it comes from `source` (when given) and contains every
+keyword (case-insensitive substring), which keeps labels valid across configs.
+
+Run from: clinical_rag/src
+    python text_utils.py                                  # default configs
+    python text_utils.py --config 1000:150 --config 1200:200 -k 1 -k 5
+    python text_utils.py --show                           # log sample chunks instead
+"""
+
+import argparse
+import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from chunk_playground import extract_text_from_pdf, chunk_text
+import numpy as np
+
+from chunk_playground import (
+    chunk_text,
+    extract_text_from_pdf,
+    extract_texts_from_pdfs,
+)
 
 # Align logging with the rest of the project so outputs are uniform.
 LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
@@ -12,17 +39,24 @@ logger = logging.getLogger(__name__)
 
 # Resolve the repository root (.../clinical_rag) from this file's location
 BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
 # Point to the folder containing PDF files used for experimentation
-PDF_DIR = BASE_DIR / "data" / "pdfs"
+PDF_DIR = DATA_DIR / "pdfs"
+GOLDEN_PATH = DATA_DIR / "golden_questions.jsonl"
+SWEEP_RESULTS_DIR = DATA_DIR / "bench"
+
+SWEEP_CONFIGS = [(600, 100), (800, 200), (1200, 200), (1600, 300), (2000, 400)]  # (chunk_size, overlap)
+SWEEP_KS = (1, 3, 5)
+SWEEP_WORKERS = 3  # Configs indexed concurrently; each keeps one embedding request in flight
 
 
-def show_chunks_for_config(pdf_path: Path, chunk_size: int, overlap: int):
+def show_chunks_for_config(pdf_path: Path, chunk_size: int, overlap: int, workers: int | None = None):
     """Display chunking stats and sample chunks for the given configuration."""
     logger.info("=" * 80)
     logger.info("File: %s", pdf_path.name)
     logger.info("Config: chunk_size=%s, overlap=%s", chunk_size, overlap)
 
-    text = extract_text_from_pdf(pdf_path)
+    text = extract_text_from_pdf(pdf_path, workers=workers)  # Page-parallel across all cores
     chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
 
     logger.info("Total characters: %s", len(text))
@@ -39,24 +73,189 @@ def show_chunks_for_config(pdf_path: Path, chunk_size: int, overlap: int):
     logger.info("")  # Blank line for readability
 
 
+def load_golden_questions(path: Path = GOLDEN_PATH) -> list[dict]:
+    """Read the labelled question set (one JSON object per line)."""
+    items = []
+    with path.open(encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question") or not (item.get("source") or item.get("keywords")):
+                raise ValueError(f"{path.name}:{line_no}: need a question plus a source and/or keywords")
+            items.append(item)
+    logger.info("Loaded %s golden questions from %s", len(items), path)
+    return items
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def is_relevant(item: dict, doc: str, meta: dict) -> bool:
+    """True if a retrieved chunk satisfies a golden question's source/keyword labels."""
+    if item.get("source") and meta.get("source") != item["source"]:
+        return False
+    text = _normalise(doc)
+    return all(_normalise(keyword) in text for keyword in item.get("keywords", []))
+
+
+def build_sweep_index(texts: dict[str, str], chunk_size: int, overlap: int):
+    """Chunk and embed the corpus for one config; returns (index, docs, embedding cost)."""
+    # The embedding client stays out of module import, which ingest and the chunking helpers share
+    from embedding_pool import BATCH_SIZE, embed_with_retry
+    from vector_index import NumpyVectorIndex
+
+    ids, docs, metas = [], [], []
+    for source, text in texts.items():
+        for idx, chunk in enumerate(chunk_text(text, chunk_size=chunk_size, overlap=overlap)):
+            ids.append(f"{Path(source).stem}_{idx}")
+            docs.append(chunk)
+            metas.append({"source": source, "chunk_index": idx})
+
+    t0 = time.perf_counter()
+    vectors = []
+    for start in range(0, len(docs), BATCH_SIZE):
+        vectors.extend(embed_with_retry(docs[start:start + BATCH_SIZE]))
+    embed_s = time.perf_counter() - t0
+
+    index = NumpyVectorIndex(np.asarray(vectors, dtype=np.float32), ids, metas)
+    cost = {
+        "chunks": len(docs),
+        "embedded_chars": sum(len(d) for d in docs),
+        "embed_requests": -(-len(docs) // BATCH_SIZE),
+        "embed_seconds": embed_s,
+    }
+    return index, docs, cost
+
+
+def score_config(index, docs: list[str], golden: list[dict], query_vecs, ks=SWEEP_KS) -> dict:
+    """recall@k (share of questions with a relevant chunk in the top k), MRR and search latency.
+
+    `index` is a NumpyVectorIndex from `build_sweep_index`.
+    """
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for item, query_vec in zip(golden, query_vecs):
+        t0 = time.perf_counter()
+        rows, _ = index.search(query_vec, max(ks))
+        latencies.append(time.perf_counter() - t0)
+
+        ranks = [rank for rank, row in enumerate(rows, start=1) if is_relevant(item, docs[row], index.metadatas[row])]
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+        for k in ks:
+            hits[k] += bool(ranks and ranks[0] <= k)
+
+    n = len(golden) or 1
+    latency_ms = np.asarray(latencies) * 1000
+    return {
+        **{f"recall@{k}": hits[k] / n for k in ks},
+        "mrr": sum(reciprocal_ranks) / n,
+        "query_p50_ms": float(np.percentile(latency_ms, 50)) if latencies else 0.0,
+        "query_p95_ms": float(np.percentile(latency_ms, 95)) if latencies else 0.0,
+    }
+
+
+def sweep_chunking(
+    configs=SWEEP_CONFIGS,
+    golden: list[dict] | None = None,
+    pdf_paths: list[Path] | None = None,
+    ks=SWEEP_KS,
+    workers: int = SWEEP_WORKERS,
+) -> list[dict]:
+    """Build one throwaway index per (chunk_size, overlap) config in parallel and score each."""
+    from embedding_pool import BATCH_SIZE, embed_with_retry
+
+    golden = golden if golden is not None else load_golden_questions()
+    pdf_paths = pdf_paths if pdf_paths is not None else sorted(PDF_DIR.glob("*.pdf"))
+    texts = {path.name: text for path, text in extract_texts_from_pdfs(pdf_paths).items()}
+
+    # Question embeddings do not depend on chunking, so every config shares them
+    questions = [item["question"] for item in golden]
+    query_vecs = []
+    for start in range(0, len(questions), BATCH_SIZE):
+        query_vecs.extend(embed_with_retry(questions[start:start + BATCH_SIZE]))
+    query_vecs = np.asarray(query_vecs, dtype=np.float32)
+
+    def run(config):
+        chunk_size, overlap = config
+        index, docs, cost = build_sweep_index(texts, chunk_size, overlap)
+        result = {
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            **cost,
+            "vector_bytes": int(index.matrix.nbytes),
+            "text_bytes": sum(len(d.encode("utf-8")) for d in docs),
+            **score_config(index, docs, golden, query_vecs, ks),
+        }
+        logger.info("Config %s/%s done: %s", chunk_size, overlap, result)
+        return result
+
+    logger.info("Sweeping %s chunking configs over %s PDFs with %s workers", len(configs), len(texts), workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, configs))
+
+
+def log_sweep_table(results: list[dict], ks=SWEEP_KS) -> None:
+    header = " ".join(f"R@{k:<4}" for k in ks)
+    logger.info("size/overlap  chunks  %s  MRR    vectors   embed chars  embed s  q p50 ms", header)
+    for r in results:
+        recalls = " ".join(f"{r[f'recall@{k}']:.2f}  " for k in ks)
+        logger.info(
+            "%5s/%-6s %7s  %s %.3f  %6.1f MB  %11s  %7.1f  %8.3f",
+            r["chunk_size"],
+            r["overlap"],
+            r["chunks"],
+            recalls,
+            r["mrr"],
+            r["vector_bytes"] / 1e6,
+            r["embedded_chars"],
+            r["embed_seconds"],
+            r["query_p50_ms"],
+        )
+
+
+def _parse_config(value: str) -> tuple[int, int]:
+    chunk_size, _, overlap = value.partition(":")
+    try:
+        return int(chunk_size), int(overlap)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CHUNK_SIZE:OVERLAP, got {value!r}") from None
+
+
 def main():
-    """Run chunk inspection across a small set of configurations."""
+    """Sweep chunking configs against the golden questions (or --show sample chunks)."""
+    parser = argparse.ArgumentParser(description="Chunking-config sweep scored on golden questions.")
+    parser.add_argument("--config", type=_parse_config, action="append", help="CHUNK_SIZE:OVERLAP (repeatable)")
+    parser.add_argument("-k", type=int, action="append", help=f"recall cut-offs (default {SWEEP_KS})")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH, help="golden question JSONL file")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS, help="configs indexed in parallel")
+    parser.add_argument("--out", type=Path, default=None, help="results JSON (default: data/bench/chunk_sweep-*.json)")
+    parser.add_argument("--show", action="store_true", help="log sample chunks of the first PDF per config instead")
+    args = parser.parse_args()
+
+    configs = args.config or SWEEP_CONFIGS
     pdf_files = sorted(PDF_DIR.glob("*.pdf"))
     if not pdf_files:
         logger.warning("No PDFs found in %s", PDF_DIR)
         return
 
-    target_pdf = pdf_files[0]  # Choose the first PDF as the default target
-    logger.info("Using target PDF: %s", target_pdf.name)
+    if args.show:
+        target_pdf = pdf_files[0]  # Choose the first PDF as the default target
+        logger.info("Using target PDF: %s", target_pdf.name)
+        for cs, ov in configs:
+            show_chunks_for_config(target_pdf, cs, ov)
+        return
 
-    configs = [
-        (800, 200),
-        (1200, 200),
-        (1600, 300),
-    ]
+    ks = tuple(sorted(set(args.k))) if args.k else SWEEP_KS
+    results = sweep_chunking(configs, load_golden_questions(args.golden), pdf_files, ks=ks, workers=args.workers)
+    log_sweep_table(results, ks)
 
-    for cs, ov in configs:
-        show_chunks_for_config(target_pdf, cs, ov)
+    out = args.out or SWEEP_RESULTS_DIR / f"chunk_sweep-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"golden": str(args.golden), "ks": list(ks), "results": results}
+    out.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    logger.info("Sweep results written to %s", out)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,343 @@
+"""Request-scoped timing spans, Prometheus-style metrics and sampled profiling.
+
+`trace_request(name)` opens a trace for one question; `span(stage)` blocks
+anywhere below it (connect, embedding, search, context building, LLM call)
+record their duration into that trace through a ContextVar, so helpers need
+no extra arguments and spans follow work into `asyncio.to_thread` workers.
+Nested spans are named by path, e.g. "retrieve.vector_search".
+
+Every finished trace is logged as one JSON record (and appended to
+RAG_TRACE_FILE if set). Stage and request durations also feed in-process
+counters/histograms, rendered in Prometheus text format by `render_metrics()`
+or served over HTTP by `start_metrics_server()`.
+
+Profiling is opt-in: RAG_PROFILE_RATE=0.01 dumps a cProfile of ~1% of
+requests to data/profiles/, and `profile_next_request()` captures the next one.
+"""
+
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+PROFILE_DIR = DATA_DIR / "profiles"
+
+TRACE_FILE = os.environ.get("RAG_TRACE_FILE")  # Optional JSONL sink for finished traces
+PROFILE_RATE = float(os.environ.get("RAG_PROFILE_RATE", "0"))  # Share of requests to cProfile
+RECENT_TRACES = 100  # Finished traces kept in memory for inspection
+
+# Seconds; spans range from sub-millisecond cache hits to multi-second generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_IMPORTED_AT = time.time()  # Fallback "process start" where /proc is unavailable
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+_span_path = contextvars.ContextVar("rag_span_path", default=())
+
+
+def _reset(var: contextvars.ContextVar, token, fallback) -> None:
+    """Reset a ContextVar, tolerating generators finalised in another context."""
+    try:
+        var.reset(token)
+    except ValueError:
+        var.set(fallback)
+
+
+class Trace:
+    """Timing spans recorded for one request."""
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = []  # {"name", "start_ms", "duration_ms", **attrs}
+        self.status = "ok"
+        self.duration_ms = None
+        self.profile_path = None
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, seconds: float, **attrs) -> None:
+        entry = {"name": name, "start_ms": (start - self._t0) * 1000, "duration_ms": seconds * 1000, **attrs}
+        with self._lock:
+            self.spans.append(entry)
+
+    def breakdown(self) -> dict:
+        """Milliseconds per span path, summed over repeats, in first-seen order."""
+        totals = {}
+        with self._lock:
+            for entry in self.spans:
+                totals[entry["name"]] = totals.get(entry["name"], 0.0) + entry["duration_ms"]
+        return totals
+
+    def record(self) -> dict:
+        """Structured, JSON-serialisable form of the trace."""
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": list(self.spans),
+            "profile": self.profile_path,
+        }
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block as a stage of the current trace (and of the stage histogram)."""
+    path = _span_path.get() + (name,)
+    token = _span_path.set(path)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as exc:
+        attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _reset(_span_path, token, path[:-1])
+        record_span(".".join(path), elapsed, start=start, **attrs)
+
+
+def record_span(name: str, seconds: float, start: float | None = None, **attrs) -> None:
+    """Record an already-measured stage, e.g. an LLM stream timed across yields."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start if start is not None else time.perf_counter() - seconds, seconds, **attrs)
+
+
+def process_age() -> tuple[float, str]:
+    """Seconds since this process was launched, and how that was measured.
+
+    Linux reads the start time from /proc ("launch"); elsewhere the clock
+    starts when this module was imported ("import"), which misses interpreter
+    start-up and the imports before it.
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as fh:
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])  # Field 22, counted after "(comm)"
+        with open("/proc/uptime", encoding="ascii") as fh:
+            uptime = float(fh.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK"), "launch"
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.time() - _IMPORTED_AT, "import"
+
+
+@contextmanager
+def trace_request(name: str, **attrs):
+    """Open a trace for one request; yields the Trace, exported when the block exits."""
+    trace = Trace(name, **attrs)
+    trace_token = _current_trace.set(trace)
+    path_token = _span_path.set(())
+    profiler = _start_profiler()
+    try:
+        yield trace
+    except GeneratorExit:
+        trace.status = "closed"  # Stream abandoned by the consumer
+        raise
+    except BaseException as exc:
+        trace.status = type(exc).__name__
+        raise
+    finally:
+        if profiler is not None:
+            trace.profile_path = _stop_profiler(profiler, trace)
+        trace.duration_ms = (time.perf_counter() - trace._t0) * 1000
+        _reset(_span_path, path_token, ())
+        _reset(_current_trace, trace_token, None)
+        REQUEST_SECONDS.observe(trace.duration_ms / 1000, kind=name)
+        REQUESTS_TOTAL.inc(kind=name, status=trace.status, cache=trace.attrs.get("cache") or "none")
+        _export(trace)
+
+
+_recent = deque(maxlen=RECENT_TRACES)
+_trace_file_lock = threading.Lock()
+
+
+def _export(trace: Trace) -> None:
+    record = trace.record()
+    _recent.append(record)
+    logger.info("trace %s", json.dumps(record, default=str))
+    if TRACE_FILE:
+        with _trace_file_lock, open(TRACE_FILE, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record, default=str) + "\n")
+
+
+def recent_traces() -> list[dict]:
+    """The most recent finished traces, oldest first."""
+    return list(_recent)
+
+
+def format_breakdown(breakdown: dict) -> str:
+    """One-line summary: top-level stages, with their nested stages in parentheses."""
+    parts = []
+    for name, ms in breakdown.items():
+        if "." in name:
+            continue
+        children = [
+            f"{child.split('.', 1)[1]} {_fmt_ms(child_ms)}"
+            for child, child_ms in breakdown.items()
+            if child.startswith(name + ".") and child.count(".") == 1
+        ]
+        parts.append(f"{name} {_fmt_ms(ms)}" + (f" ({', '.join(children)})" if children else ""))
+    return " · ".join(parts)
+
+
+def _fmt_ms(ms: float) -> str:
+    return f"{ms / 1000:.2f} s" if ms >= 1000 else f"{ms:.0f} ms"
+
+
+# -------------------------------------------------
+# Profiling
+# -------------------------------------------------
+_profile_lock = threading.Lock()  # cProfile allows one active profiler per process
+_profile_next = threading.Event()
+
+
+def profile_next_request() -> None:
+    """Capture a cProfile dump for the next traced request."""
+    _profile_next.set()
+
+
+def _start_profiler():
+    if not (_profile_next.is_set() or (PROFILE_RATE and random.random() < PROFILE_RATE)):
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None  # Another request is being profiled
+    _profile_next.clear()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, trace: Trace) -> str | None:
+    try:
+        profiler.disable()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.name}-{trace.trace_id}.prof"
+        profiler.dump_stats(str(path))
+        logger.info("Saved cProfile dump for trace %s to %s (inspect with python -m pstats)", trace.trace_id, path)
+        return str(path)
+    except OSError:
+        logger.exception("Could not save cProfile dump for trace %s", trace.trace_id)
+        return None
+    finally:
+        _profile_lock.release()
+
+
+# -------------------------------------------------
+# Metrics (Prometheus text exposition format)
+# -------------------------------------------------
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}  # sorted label items -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # sorted label items -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return lines
+
+
+def _labels(items) -> str:
+    if not items:
+        return ""
+    pairs = []
+    for key, value in items:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+REQUESTS_TOTAL = Counter("rag_requests_total", "Traced RAG requests by kind, status and answer-cache tier.")
+REQUEST_SECONDS = Histogram("rag_request_seconds", "End-to-end RAG request latency in seconds.")
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Latency of individual RAG stages in seconds.")
+METRICS = (REQUESTS_TOTAL, REQUEST_SECONDS, STAGE_SECONDS)
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics on a background thread for a Prometheus scraper."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="rag-metrics", daemon=True).start()
+    logger.info("Serving Prometheus metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,515 @@
+"""In-process exact vector search over a memory-mapped embedding matrix.
+
+`export_collection` copies every embedding from the Chroma collection into one
+contiguous float32 file (row i <-> ids[i] / metadatas[i]), and
+`NumpyVectorIndex` answers top-k with a single matrix-vector product plus
+`argpartition`. Distances are squared L2, matching Chroma's default space, so
+results are directly comparable with (and can measure the recall of) HNSW.
+
+Rows are partitioned by guideline (metadata "source"), so a search can be
+restricted to some guidelines, and the export stores each guideline's
+centroid vector, which rag_core uses to route queries to partitions.
+
+`CompressedVectorIndex` keeps only float16 or per-row-scaled int8 codes
+(optionally of a prefix of the dimensions) in memory, finds candidates on
+them and rescores the best k * RESCORE_FACTOR against the memory-mapped
+float32 rows. Codes are cached next to the export as compressed-*.npz.
+
+Run from: clinical_rag/src
+    python vector_index.py export            # refresh data/vector_index/ from Chroma
+    python vector_index.py bench -n 200      # latency + HNSW recall vs exact search
+    python vector_index.py compress-bench    # memory/latency/recall of float16/int8/prefix codes
+    python vector_index.py compress int8:256 # write the codes used by RAG_VECTOR_COMPRESSION=int8:256
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.environ.get("RAG_DATA_DIR", BASE_DIR / "data"))
+VECTOR_INDEX_DIR = DATA_DIR / "vector_index"
+MATRIX_FILE = "embeddings.f32"
+META_FILE = "index.json"
+
+INDEX_VERSION = 1
+EXPORT_PAGE_SIZE = 1000  # Rows fetched from Chroma per get() call
+
+COMPRESSED_ENCODINGS = ("float16", "int8")
+RESCORE_FACTOR = 4  # Compressed search rescores k * this many candidates in full precision
+PEAK_MEMORY_QUERIES = 5  # Queries traced for the per-query peak allocation in compress-bench
+SEARCH_BLOCK_ROWS = 4096  # Code rows scored per step; bounds the float32 temporaries of compressed search
+COMPRESSION_BENCH_SPECS = ("float16", "int8", "float16:256", "int8:256", "int8:128")
+
+
+def export_collection(collection, out_dir: Path = VECTOR_INDEX_DIR, corpus_version: str | None = None) -> int:
+    """Write the collection's embeddings, IDs and metadata to `out_dir`. Returns the row count."""
+    total = collection.count()
+    logger.info("Exporting %s embeddings from Chroma to %s", total, out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    ids, metas, rows = [], [], []
+    for offset in range(0, total, EXPORT_PAGE_SIZE):
+        page = collection.get(include=["embeddings", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=offset)
+        ids.extend(page["ids"])
+        metas.extend(page["metadatas"])
+        rows.append(np.asarray(page["embeddings"], dtype=np.float32))
+
+    matrix = np.ascontiguousarray(np.vstack(rows)) if rows else np.zeros((0, 0), dtype=np.float32)
+    tmp_matrix = out_dir / (MATRIX_FILE + ".tmp")
+    matrix.tofile(tmp_matrix)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "corpus_version": corpus_version,
+        "ids": ids,
+        "metadatas": metas,
+        "centroids": {src: vec.tolist() for src, vec in source_centroids(matrix, metas).items()},
+    }
+    tmp_meta = out_dir / (META_FILE + ".tmp")
+    tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+
+    # Replace the matrix first: readers reload when index.json changes, so it must land last.
+    os.replace(tmp_matrix, out_dir / MATRIX_FILE)
+    os.replace(tmp_meta, out_dir / META_FILE)
+    logger.info("Exported %s x %s matrix (%.1f MB)", meta["count"], meta["dim"], matrix.nbytes / 1e6)
+    return meta["count"]
+
+
+def _rows_by_source(metadatas: list[dict]) -> dict[str, np.ndarray]:
+    rows = {}
+    for row, meta in enumerate(metadatas):
+        rows.setdefault((meta or {}).get("source"), []).append(row)
+    return {src: np.asarray(r, dtype=np.int64) for src, r in rows.items()}
+
+
+def source_centroids(matrix: np.ndarray, metadatas: list[dict]) -> dict[str, np.ndarray]:
+    """Mean embedding of every guideline (metadata "source") in the matrix."""
+    return {src: np.asarray(matrix[rows]).mean(axis=0) for src, rows in _rows_by_source(metadatas).items()}
+
+
+class NumpyVectorIndex:
+    """Read-only, memory-mapped embedding matrix with exact top-k search."""
+
+    def __init__(self, matrix: np.ndarray, ids: list[str], metadatas: list[dict], corpus_version=None, centroids=None):
+        self.matrix = matrix
+        self.ids = ids
+        self.metadatas = metadatas
+        self.corpus_version = corpus_version
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix)  # |x|^2 per row, for L2 distances
+        self.row_of = {cid: row for row, cid in enumerate(ids)}
+        self.rows_by_source = _rows_by_source(metadatas)
+        if centroids is None:  # Exports written before centroids were stored
+            centroids = source_centroids(matrix, metadatas)
+        self.centroids = {src: np.asarray(vec, dtype=np.float32) for src, vec in centroids.items()}
+
+    @classmethod
+    def load(cls, index_dir: Path = VECTOR_INDEX_DIR) -> "NumpyVectorIndex":
+        meta = json.loads((index_dir / META_FILE).read_text(encoding="utf-8"))
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Vector index version {meta.get('version')} != {INDEX_VERSION}; re-export it")
+        count, dim = meta["count"], meta["dim"]
+        if count:
+            matrix = np.memmap(index_dir / MATRIX_FILE, dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            matrix = np.zeros((0, dim), dtype=np.float32)
+        logger.info("Memory-mapped %s x %s vector index from %s", count, dim, index_dir)
+        return cls(matrix, meta["ids"], meta["metadatas"], meta.get("corpus_version"), meta.get("centroids"))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for_sources(self, sources) -> np.ndarray:
+        """Row indices of every chunk from the given guidelines, in row order."""
+        parts = [self.rows_by_source[src] for src in sources if src in self.rows_by_source]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def search(self, query_vec, k: int = 5, rows=None):
+        """Exact top-k: returns (row indices, squared L2 distances), nearest first.
+
+        `rows` restricts the search to those row indices (see rows_for_sources).
+        """
+        q = np.asarray(query_vec, dtype=np.float32)
+        if rows is None:
+            dists = self.sq_norms - 2.0 * (self.matrix @ q) + float(q @ q)
+        else:
+            dists = self.sq_norms[rows] - 2.0 * (self.matrix[rows] @ q) + float(q @ q)
+        k = min(k, len(dists))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top])]
+        return (top if rows is None else rows[top]), dists[top]
+
+    def search_batch(self, query_vecs, k: int = 5):
+        """Exact top-k for many queries at once: (rows, distances) arrays of shape (n_queries, k)."""
+        Q = np.asarray(query_vecs, dtype=np.float32)
+        dists = self.sq_norms[None, :] - 2.0 * (Q @ self.matrix.T) + np.einsum("ij,ij->i", Q, Q)[:, None]
+        k = min(k, dists.shape[1])
+        if k == 0:
+            empty = np.empty((len(Q), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        top = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        top_d = np.take_along_axis(dists, top, axis=1)
+        order = np.argsort(top_d, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_d, order, axis=1)
+
+    def search_ids(self, query_vec, k: int = 5):
+        """Exact top-k as (ids, metadatas, distances) lists."""
+        rows, dists = self.search(query_vec, k)
+        return [self.ids[r] for r in rows], [self.metadatas[r] for r in rows], dists.tolist()
+
+
+def parse_compression(spec: str) -> tuple[str, int | None]:
+    """ "int8", "float16" or "<encoding>:<prefix dims>" -> (encoding, dims or None)."""
+    encoding, _, dims = spec.partition(":")
+    if encoding not in COMPRESSED_ENCODINGS:
+        raise ValueError(f"Unknown vector compression {encoding!r} (expected one of {COMPRESSED_ENCODINGS})")
+    return encoding, int(dims) if dims else None
+
+
+def compress_matrix(matrix, encoding: str, dims: int | None = None):
+    """Encode rows (optionally only their first `dims` components) as float16 or int8.
+
+    int8 stores one float32 scale per row (max |value| / 127). Returns (codes, scales or None).
+    """
+    rows = np.asarray(matrix[:, :dims] if dims else matrix, dtype=np.float32)
+    if encoding == "float16":
+        return rows.astype(np.float16), None
+    scales = np.abs(rows).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _prefix_dims(full: NumpyVectorIndex, dims: int | None) -> int | None:
+    return dims if dims and dims < full.matrix.shape[1] else None
+
+
+class CompressedVectorIndex:
+    """Candidate search on compressed codes, rescored against the full-precision rows.
+
+    Only the codes (plus per-row scales and norms) are held in memory; the float32
+    matrix of `full` stays memory-mapped and is read only for rescored candidates.
+    ids, metadatas, centroids and partitions are delegated to `full` explicitly.
+    """
+
+    def __init__(self, full: NumpyVectorIndex, encoding: str, dims: int | None, codes, scales=None):
+        self.full = full
+        self.encoding = encoding
+        self.prefix_dims = _prefix_dims(full, dims)  # None = all dimensions
+        self.dims = self.prefix_dims or full.matrix.shape[1]
+        self.codes = codes
+        self.scales = scales
+        if scales is None:
+            self.code_sq_norms = np.einsum("ij,ij->i", codes, codes, dtype=np.float32)
+        else:
+            sq_codes = np.einsum("ij,ij->i", codes, codes, dtype=np.int32).astype(np.float32)
+            self.code_sq_norms = sq_codes * scales * scales
+
+    @classmethod
+    def build(cls, full: NumpyVectorIndex, encoding: str, dims: int | None = None) -> "CompressedVectorIndex":
+        return cls(full, encoding, dims, *compress_matrix(full.matrix, encoding, dims))
+
+    @staticmethod
+    def path_for(index_dir: Path, encoding: str, dims: int | None) -> Path:
+        return index_dir / f"compressed-{encoding}-{dims or 'full'}.npz"
+
+    def save(self, index_dir: Path = VECTOR_INDEX_DIR) -> Path:
+        path = self.path_for(index_dir, self.encoding, self.prefix_dims)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as fh:
+            np.savez(
+                fh,
+                codes=self.codes,
+                scales=self.scales if self.scales is not None else np.empty(0, dtype=np.float32),
+                corpus_version=np.array(self.full.corpus_version or ""),
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load_or_build(cls, full: NumpyVectorIndex, encoding: str, dims: int | None = None,
+                      index_dir: Path = VECTOR_INDEX_DIR) -> "CompressedVectorIndex":
+        """Load cached codes for this export, or build (and cache) them from the float32 matrix."""
+        path = cls.path_for(index_dir, encoding, _prefix_dims(full, dims))
+        try:
+            with np.load(path) as data:
+                if str(data["corpus_version"]) == (full.corpus_version or "") and len(data["codes"]) == len(full):
+                    scales = data["scales"] if encoding == "int8" else None
+                    logger.info("Loaded %s codes from %s", encoding, path.name)
+                    return cls(full, encoding, dims, data["codes"], scales)
+        except (OSError, KeyError, ValueError):
+            pass
+        index = cls.build(full, encoding, dims)
+        try:
+            index.save(index_dir)
+            logger.info("Built and cached %s codes (%.1f MB) in %s", encoding, index.nbytes / 1e6, path.name)
+        except OSError:
+            logger.warning("Could not cache compressed codes at %s", path, exc_info=True)
+        return index
+
+    # Explicit delegates only: anything that scans rows must be implemented on the codes here,
+    # or it would quietly page the whole float32 matrix in.
+    @property
+    def ids(self) -> list[str]:
+        return self.full.ids
+
+    @property
+    def metadatas(self) -> list[dict]:
+        return self.full.metadatas
+
+    @property
+    def centroids(self) -> dict:
+        return self.full.centroids
+
+    @property
+    def corpus_version(self):
+        return self.full.corpus_version
+
+    @property
+    def row_of(self) -> dict:
+        return self.full.row_of
+
+    @property
+    def matrix(self):
+        """The memory-mapped float32 rows; callers index single rows (selected candidates), never scan it."""
+        return self.full.matrix
+
+    def rows_for_sources(self, sources):
+        return self.full.rows_for_sources(sources)
+
+    def __len__(self) -> int:
+        return len(self.full)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes of the compressed representation."""
+        scales = self.scales.nbytes if self.scales is not None else 0
+        return int(self.codes.nbytes + scales + self.code_sq_norms.nbytes)
+
+    def _code_dots(self, codes, qp):
+        """codes @ qp with float32 accumulation, SEARCH_BLOCK_ROWS code rows at a time.
+
+        A plain `codes @ qp` upcasts the whole code matrix to a float32 temporary,
+        i.e. the full-precision footprint compression is meant to avoid.
+        """
+        q = qp.astype(np.float16) if codes.dtype == np.float16 else qp
+        dots = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SEARCH_BLOCK_ROWS):
+            block = codes[start:start + SEARCH_BLOCK_ROWS]
+            np.einsum("ij,j->i", block, q, dtype=np.float32, out=dots[start:start + len(block)])
+        return dots
+
+    def search(self, query_vec, k: int = 5, rows=None, rescore: int | None = RESCORE_FACTOR):
+        """Top-k like NumpyVectorIndex.search; distances are exact unless rescore is 0/None."""
+        q = np.asarray(query_vec, dtype=np.float32)
+        qp = q[:self.dims]
+        codes = self.codes if rows is None else self.codes[rows]
+        dots = self._code_dots(codes, qp)
+        if self.scales is not None:
+            dots = dots * (self.scales if rows is None else self.scales[rows])
+        sq_norms = self.code_sq_norms if rows is None else self.code_sq_norms[rows]
+        approx = sq_norms - 2.0 * dots + float(qp @ qp)
+
+        n = min(k * rescore if rescore else k, len(approx))
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        cand = np.argpartition(approx, n - 1)[:n]
+        cand_rows = cand if rows is None else rows[cand]
+        if not rescore:
+            order = np.argsort(approx[cand])
+            return cand_rows[order], approx[cand][order]
+
+        cand_rows = np.sort(cand_rows)  # Sequential reads from the memory-mapped matrix
+        exact = self.full.sq_norms[cand_rows] - 2.0 * (np.asarray(self.full.matrix[cand_rows]) @ q) + float(q @ q)
+        top = np.argsort(exact)[:k]
+        return cand_rows[top], exact[top]
+
+
+    def search_batch(self, query_vecs, k: int = 5, rescore: int | None = RESCORE_FACTOR):
+        """Top-k for many queries, shaped like NumpyVectorIndex.search_batch, searching the codes per query."""
+        queries = np.asarray(query_vecs, dtype=np.float32).reshape(-1, self.full.matrix.shape[1])
+        k = min(k, len(self))
+        rows = np.empty((len(queries), k), dtype=np.int64)
+        dists = np.empty((len(queries), k), dtype=np.float32)
+        for i, q in enumerate(queries):
+            rows[i], dists[i] = self.search(q, k, rescore=rescore)
+        return rows, dists
+
+
+def recall_at_k(exact_ids: list[str], approx_ids: list[str]) -> float:
+    """Share of the exact top-k that the approximate search also returned."""
+    if not exact_ids:
+        return 1.0
+    return len(set(exact_ids) & set(approx_ids)) / len(exact_ids)
+
+
+def _percentile_ms(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000, pct)) if samples else 0.0
+
+
+def _perturbed_queries(index: NumpyVectorIndex, n_queries: int, seed: int) -> np.ndarray:
+    """Corpus vectors plus small noise, so benchmarks need no embedding server."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(n_queries, len(index)), replace=False)
+    noise = rng.normal(scale=0.01, size=(len(rows), index.matrix.shape[1])).astype(np.float32)
+    return np.asarray(index.matrix[rows]) + noise
+
+
+def benchmark(collection, index: NumpyVectorIndex, n_queries: int = 200, k: int = 5, seed: int = 0) -> dict:
+    """Compare Chroma (HNSW) and exact NumPy search on perturbed stored vectors."""
+    queries = _perturbed_queries(index, n_queries, seed)
+
+    chroma_times, numpy_times, recalls = [], [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        exact_ids, _, _ = index.search_ids(q, k)
+        numpy_times.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+        chroma_times.append(time.perf_counter() - t0)
+        recalls.append(recall_at_k(exact_ids, result["ids"][0]))
+
+    stats = {
+        "queries": len(queries),
+        "k": k,
+        "rows": len(index),
+        "numpy_p50_ms": _percentile_ms(numpy_times, 50),
+        "numpy_p95_ms": _percentile_ms(numpy_times, 95),
+        "chroma_p50_ms": _percentile_ms(chroma_times, 50),
+        "chroma_p95_ms": _percentile_ms(chroma_times, 95),
+        "hnsw_recall_at_k": float(np.mean(recalls)) if recalls else 1.0,
+    }
+    logger.info("Vector search benchmark: %s", stats)
+    return stats
+
+
+def benchmark_compression(
+    index: NumpyVectorIndex,
+    specs=COMPRESSION_BENCH_SPECS,
+    n_queries: int = 200,
+    k: int = 5,
+    seed: int = 0,
+) -> list[dict]:
+    """Memory, latency and recall@k (vs exact float32 search) of each compression spec.
+
+    Memory is reported twice: resident size of the index and peak allocation during one query.
+
+    Each spec is measured on candidates alone and with full-precision rescoring.
+    """
+    queries = _perturbed_queries(index, n_queries, seed)
+
+    def timed(search):
+        times, results = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            rows, _ = search(q)
+            times.append(time.perf_counter() - t0)
+            results.append([index.ids[r] for r in rows])
+        return times, results
+
+    def peak_mb(search):
+        # NumPy reports its buffers to tracemalloc; measured apart from the timed runs it would slow down
+        tracemalloc.start()
+        try:
+            for q in queries[:PEAK_MEMORY_QUERIES]:
+                tracemalloc.reset_peak()
+                search(q)
+            return tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+
+    exact_times, exact_ids = timed(lambda q: index.search(q, k))
+    report = [{
+        "spec": "float32",
+        "mb": index.matrix.nbytes / 1e6,
+        "query_peak_mb": peak_mb(lambda q: index.search(q, k)),
+        "p50_ms": _percentile_ms(exact_times, 50),
+        "p95_ms": _percentile_ms(exact_times, 95),
+        "recall_at_k": 1.0,
+    }]
+    for spec in specs:
+        encoding, dims = parse_compression(spec)
+        compressed = CompressedVectorIndex.build(index, encoding, dims)
+        cand_times, cand_ids = timed(lambda q: compressed.search(q, k, rescore=None))
+        times, ids = timed(lambda q: compressed.search(q, k))
+        report.append({
+            "spec": spec,
+            "mb": compressed.nbytes / 1e6,
+            "query_peak_mb": peak_mb(lambda q: compressed.search(q, k)),
+            "candidates_p50_ms": _percentile_ms(cand_times, 50),
+            "candidates_recall_at_k": float(np.mean([recall_at_k(e, a) for e, a in zip(exact_ids, cand_ids)])),
+            "p50_ms": _percentile_ms(times, 50),
+            "p95_ms": _percentile_ms(times, 95),
+            "recall_at_k": float(np.mean([recall_at_k(e, a) for e, a in zip(exact_ids, ids)])),
+        })
+
+    logger.info(
+        "%-12s %9s %13s %9s %9s %10s %14s",
+        "spec", "MB", "query peak MB", "p50 ms", "p95 ms", "recall@k", "no-rescore R@k",
+    )
+    for row in report:
+        logger.info(
+            "%-12s %9.2f %13.2f %9.3f %9.3f %10.3f %14s",
+            row["spec"],
+            row["mb"],
+            row["query_peak_mb"],
+            row["p50_ms"],
+            row["p95_ms"],
+            row["recall_at_k"],
+            f"{row['candidates_recall_at_k']:.3f}" if "candidates_recall_at_k" in row else "-",
+        )
+    return report
+
+
+def main():
+    """CLI: export the Chroma collection, benchmark NumPy vs Chroma search, or compress the index."""
+    parser = argparse.ArgumentParser(description="Memory-mapped NumPy vector index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="export Chroma embeddings to data/vector_index/")
+    bench = sub.add_parser("bench", help="latency and HNSW recall vs exact search")
+    bench.add_argument("-n", "--queries", type=int, default=200)
+    bench.add_argument("-k", type=int, default=5)
+    compress = sub.add_parser("compress", help="write compressed codes for RAG_VECTOR_COMPRESSION")
+    compress.add_argument("spec", help="float16, int8 or <encoding>:<prefix dims>, e.g. int8:256")
+    compress_bench = sub.add_parser("compress-bench", help="memory/latency/recall of compressed search")
+    compress_bench.add_argument("--spec", action="append", help=f"spec to test (default {COMPRESSION_BENCH_SPECS})")
+    compress_bench.add_argument("-n", "--queries", type=int, default=200)
+    compress_bench.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "compress":
+        path = CompressedVectorIndex.build(NumpyVectorIndex.load(), *parse_compression(args.spec)).save()
+        logger.info("Wrote %s", path)
+        return
+    if args.command == "compress-bench":
+        specs = args.spec or COMPRESSION_BENCH_SPECS
+        benchmark_compression(NumpyVectorIndex.load(), specs, n_queries=args.queries, k=args.k)
+        return
+
+    from rag_core import get_collection
+    from ingest_manifest import read_corpus_version
+
+    collection = get_collection()
+    if args.command == "export":
+        export_collection(collection, corpus_version=read_corpus_version())
+    else:
+        benchmark(collection, NumpyVectorIndex.load(), n_queries=args.queries, k=args.k)
+
+
+if __name__ == "__main__":
+    main()
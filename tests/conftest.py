@@ -0,0 +1,58 @@
+"""Make the flat modules in src/ importable, as when running from clinical_rag/src.
+
+Every src module resolves RAG_DATA_DIR once, at import, so it is pointed at a
+throwaway directory here, before any test can import one: nothing a test does
+reaches the real data/ tree (Chroma, caches, exports).
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+TEST_DATA_DIR = Path(tempfile.mkdtemp(prefix="rag-tests-"))
+os.environ["RAG_DATA_DIR"] = str(TEST_DATA_DIR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def fake_ollama():
+    """Stub Ollama server on a free localhost port."""
+    from fake_ollama import start_fake_ollama
+
+    server = start_fake_ollama(latency=0.02)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def rag_core(fake_ollama):
+    """rag_core talking to the stub Ollama, with a fresh store handle; module state is restored afterwards."""
+    pytest.importorskip("numpy")
+    pytest.importorskip("chromadb")
+    pytest.importorskip("ollama")
+    import rag_core as core
+    from model_manager import get_model_manager
+
+    # Fails if rag_core was imported before this conftest, i.e. with the real data directory
+    assert core.DATA_DIR == TEST_DATA_DIR, f"rag_core resolved its data directory to {core.DATA_DIR}"
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(core, "OLLAMA_URL", fake_ollama.url)
+        mp.setattr(core, "_models", get_model_manager(fake_ollama.url))
+        mp.setattr(core, "_store", core.StoreHandle())
+        mp.setattr(core, "_llm_slots", core._llm_slots)
+        mp.setattr(core._query_cache, "embed_fn", core._query_cache.embed_fn)
+        mp.setattr(core, "_cold_start", {})
+        yield core
+        if core._store._collection is not None:  # Leave an empty collection for the next module
+            ids = core._store.collection().get(include=[])["ids"]
+            if ids:
+                core._store.collection().delete(ids=ids)
@@ -0,0 +1,45 @@
+"""Answer cache counters: every request counts once, as an exact hit, a semantic hit or a miss."""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from answer_cache import AnswerCache  # noqa: E402
+
+SCOPE = {"model": "llama3.1:8b", "top_k": 5, "template": "tmpl:vector", "corpus_version": "v1"}
+QUESTION = "What is an estimand?"
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.store(QUESTION, [1.0, 0.0], answer="The treatment effect targeted by the trial.", sources=[], **SCOPE)
+    return cache
+
+
+def _lookup(cache, query, query_vec=None):
+    """Same tier order as rag_core: exact first, then semantic unless the request has no embedding."""
+    entry = cache.lookup_exact(query, **SCOPE)
+    if entry is None and query_vec is not None:
+        entry, _ = cache.lookup_semantic(query_vec, **SCOPE)
+    return entry
+
+
+def test_lexical_miss_is_counted_without_the_semantic_tier(cache):
+    assert _lookup(cache, "Who signs the consent form?") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_each_request_counts_once(cache):
+    assert _lookup(cache, "what is an ESTIMAND? ") is not None
+    assert _lookup(cache, "Define an estimand.", [0.99, 0.05]) is not None
+    assert _lookup(cache, "Who signs the consent form?", [0.0, 1.0]) is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_semantic_tier_with_nothing_to_compare_is_one_miss():
+    cache = AnswerCache()
+    assert _lookup(cache, QUESTION, [1.0, 0.0]) is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,95 @@
+"""Context assembly: merging neighbouring chunks into spans and cutting them at the character budget."""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("chromadb")
+pytest.importorskip("ollama")
+
+from rag_core import MIN_OVERLAP_MATCH, _build_context_block, merge_chunk_spans  # noqa: E402
+
+# Three consecutive ingest chunks of one guideline; each repeats the end of the previous one
+OVERLAP_1 = "treatment discontinuation or use of rescue medication "
+OVERLAP_2 = "the treatment policy strategy uses the outcome regardless "
+CHUNK_4 = "Intercurrent events are events occurring after treatment initiation, such as " + OVERLAP_1
+CHUNK_5 = OVERLAP_1 + "that affect the interpretation of the estimand. Under " + OVERLAP_2
+CHUNK_6 = OVERLAP_2 + "of whether the intercurrent event occurs."
+MERGED_4_6 = CHUNK_4 + CHUNK_5[len(OVERLAP_1):] + CHUNK_6[len(OVERLAP_2):]
+
+
+def _meta(source, index):
+    return {"source": source, "chunk_index": index}
+
+
+def test_overlapping_neighbours_merge_with_the_overlap_kept_once():
+    # Retrieved out of order; the span keeps the best rank of its chunks
+    docs = [CHUNK_5, CHUNK_4, CHUNK_6]
+    metas = [_meta("ICH_E9_R1.pdf", 5), _meta("ICH_E9_R1.pdf", 4), _meta("ICH_E9_R1.pdf", 6)]
+
+    (span,) = merge_chunk_spans(docs, metas)
+
+    assert span == {"source": "ICH_E9_R1.pdf", "first": 4, "last": 6, "text": MERGED_4_6, "rank": 0}
+    assert span["text"].count(OVERLAP_1) == span["text"].count(OVERLAP_2) == 1
+
+
+def test_short_coincidental_match_is_not_treated_as_overlap():
+    left, right = "The estimand is defined by five attributes.", "attributes. Population is the first one."
+    assert len("attributes.") < MIN_OVERLAP_MATCH
+
+    (span,) = merge_chunk_spans([left, right], [_meta("ICH_E9_R1.pdf", 1), _meta("ICH_E9_R1.pdf", 2)])
+
+    assert span["text"] == left + right
+
+
+def test_non_adjacent_chunks_and_other_sources_stay_separate_in_relevance_order():
+    docs = [CHUNK_6, "Informed consent must be obtained before any trial procedure.", CHUNK_4, CHUNK_6]
+    metas = [_meta("ICH_E9_R1.pdf", 6), _meta("ICH_E6_R2.pdf", 6), _meta("ICH_E9_R1.pdf", 4),
+             _meta("ICH_E9_R1.pdf", 6)]
+
+    spans = merge_chunk_spans(docs, metas)
+
+    assert [(s["source"], s["first"], s["last"], s["rank"]) for s in spans] == [
+        ("ICH_E9_R1.pdf", 6, 6, 0),  # Retrieved twice, kept once
+        ("ICH_E6_R2.pdf", 6, 6, 1),
+        ("ICH_E9_R1.pdf", 4, 4, 2),
+    ]
+    assert spans[0]["text"] == CHUNK_6 and spans[2]["text"] == CHUNK_4
+
+
+def test_chunks_without_an_index_are_kept_as_they_are():
+    spans = merge_chunk_spans([CHUNK_4, CHUNK_5], [{"source": "notes.pdf"}, _meta("notes.pdf", 5)])
+
+    assert [s["text"] for s in spans] == [CHUNK_4, CHUNK_5]
+
+
+def test_context_block_labels_spans():
+    docs = [CHUNK_4, CHUNK_5, "Informed consent must be obtained before any trial procedure."]
+    metas = [_meta("ICH_E9_R1.pdf", 4), _meta("ICH_E9_R1.pdf", 5), _meta("ICH_E6_R2.pdf", 0)]
+
+    context = _build_context_block(docs, metas, char_budget=None)
+
+    assert context.startswith("[Source: ICH_E9_R1.pdf | chunks 4-5]\n" + CHUNK_4)
+    assert "\n\n[Source: ICH_E6_R2.pdf | chunk 0]\nInformed consent" in context
+
+
+def test_budget_keeps_the_most_relevant_spans_and_trims_the_last_one():
+    docs = [CHUNK_4, "Informed consent must be obtained before any trial procedure.", CHUNK_6]
+    metas = [_meta("ICH_E9_R1.pdf", 4), _meta("ICH_E6_R2.pdf", 0), _meta("ICH_E9_R1.pdf", 6)]
+    full = _build_context_block(docs, metas, char_budget=None)
+    blocks = full.split("\n\n")
+    budget = len(blocks[0]) + 2 + len(blocks[1]) + 2 + 60  # Room for only part of the third span
+
+    context = _build_context_block(docs, metas, char_budget=budget)
+
+    assert len(context) <= budget
+    assert context.startswith(blocks[0] + "\n\n" + blocks[1] + "\n\n")
+    assert blocks[2].startswith(context.split("\n\n")[2])  # Trimmed, not dropped
+    assert _build_context_block(docs, metas, char_budget=len(full)) == full
+
+
+def test_budget_drops_a_span_when_only_its_header_would_fit():
+    docs = [CHUNK_4, CHUNK_6]
+    metas = [_meta("ICH_E9_R1.pdf", 4), _meta("ICH_E9_R1.pdf", 6)]
+    first = _build_context_block(docs[:1], metas[:1], char_budget=None)
+
+    assert _build_context_block(docs, metas, char_budget=len(first) + 2 + 10) == first
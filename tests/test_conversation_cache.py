@@ -0,0 +1,112 @@
+"""Conversation context reuse on realistic follow-ups, with the stub Ollama's embeddings."""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from conversation_cache import ConversationCache  # noqa: E402
+from fake_ollama import fake_embedding  # noqa: E402
+
+CHUNKS = {
+    "e9_10": "Intercurrent events are events occurring after treatment initiation, such as discontinuation of "
+             "treatment, that affect the interpretation of the estimand.",
+    "e9_11": "The treatment policy strategy handles intercurrent events by using the outcome regardless of whether "
+             "the event occurs.",
+    "e9_12": "A hypothetical strategy envisages a scenario in which the intercurrent event would not occur.",
+}
+FIRST_QUESTION = "What are intercurrent events in the ICH E9 estimand framework?"
+FOLLOW_UP = "What are the strategies for intercurrent events in the estimand framework?"
+NEW_TOPIC = "What are sensitivity analyses in the estimand framework?"
+SENSITIVITY = (
+    "Sensitivity analyses explore the robustness of inferences from the main estimator to deviations from its "
+    "assumptions."
+)
+
+
+def _cosine(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))  # fake_embedding returns unit vectors
+
+
+@pytest.fixture
+def cache():
+    query_vec = fake_embedding(FIRST_QUESTION)
+    hits = [
+        {
+            "id": cid,
+            "document": text,
+            "metadata": {"source": "ICH_E9_R1.pdf"},
+            "similarity": _cosine(query_vec, fake_embedding(text)),
+            "embedding": fake_embedding(text),
+        }
+        for cid, text in CHUNKS.items()
+    ]
+    conversation = ConversationCache()
+    assert conversation.reusable(query_vec, k=5, corpus_version="v1") == []  # First turn: nothing cached yet
+    conversation.add_turn(hits)
+    return conversation
+
+
+def test_follow_up_reuses_the_previous_turn(cache):
+    hits = cache.reusable(fake_embedding(FOLLOW_UP), k=5, corpus_version="v1")
+
+    assert {hit["id"] for hit in hits} == set(CHUNKS)
+    assert all(hit["reused"] for hit in hits)
+    assert [hit["similarity"] for hit in hits] == sorted((hit["similarity"] for hit in hits), reverse=True)
+
+
+def test_follow_up_respects_k_and_source_filter(cache):
+    query_vec = fake_embedding(FOLLOW_UP)
+
+    assert len(cache.reusable(query_vec, k=2, corpus_version="v1")) == 2
+    assert cache.reusable(query_vec, k=5, corpus_version="v1", source_filter=["ICH_E6_R2.pdf"]) == []
+
+
+def test_question_on_a_new_topic_reuses_nothing(cache):
+    # Same guideline and framing, but it loses more than FOLLOW_UP_MARGIN on the turn's top chunk
+    assert cache.reusable(fake_embedding(NEW_TOPIC), k=5, corpus_version="v1") == []
+
+
+def test_unrelated_question_reuses_nothing(cache):
+    assert cache.reusable(fake_embedding("Who must sign the informed consent form?"), k=5, corpus_version="v1") == []
+
+
+def test_reused_chunks_keep_their_turn_and_age_out(cache):
+    original = {cid: entry["similarity"] for cid, entry in cache._chunks.items()}
+    for _ in range(cache.max_turns - 1):
+        hits = cache.reusable(fake_embedding(FOLLOW_UP), k=5, corpus_version="v1")
+        cache.add_turn(hits, reused=len(hits))
+
+    # Still anchored on the first question's scores, and within MAX_TURNS of it
+    assert {cid: entry["similarity"] for cid, entry in cache._chunks.items()} == original
+    assert {entry["turn"] for entry in cache._chunks.values()} == {1}
+
+    hits = cache.reusable(fake_embedding(FOLLOW_UP), k=5, corpus_version="v1")
+    cache.add_turn(hits, reused=len(hits))
+    assert len(cache) == 0
+
+
+def test_new_corpus_version_drops_the_cache(cache):
+    assert cache.reusable(fake_embedding(FIRST_QUESTION), k=5, corpus_version="v2") == []
+    assert len(cache) == 0
+
+
+def test_follow_up_still_searches_for_new_chunks(rag_core, cache, monkeypatch):
+    calls = []
+
+    def search(retrieve_fn, query, k, exclude_ids, **kwargs):
+        calls.append({"k": k, "exclude_ids": set(exclude_ids)})
+        vec = fake_embedding(SENSITIVITY)
+        similarity = _cosine(fake_embedding(query), vec)
+        hit = {"id": "e9_20", "document": SENSITIVITY, "metadata": {"source": "ICH_E9_R1.pdf"},
+               "score": similarity, "similarity": similarity, "embedding": vec}
+        return [hit][:k]
+
+    monkeypatch.setattr(rag_core, "_on_shared_collection", search)
+    monkeypatch.setattr(rag_core.StoreHandle, "corpus_version", "v1")  # The cache fixture's corpus
+    # Every cached chunk qualifies for reuse, yet half of the top-k is left to a fresh search
+    docs, _ = rag_core._retrieve_in_conversation(cache, FOLLOW_UP, 4, fake_embedding(FOLLOW_UP), "vector")
+
+    assert calls[0]["k"] == 2 and len(calls[0]["exclude_ids"]) == 2
+    assert calls[0]["exclude_ids"] <= set(CHUNKS)
+    assert SENSITIVITY in docs and len(docs) == 3
+    assert cache.last_reused == 2
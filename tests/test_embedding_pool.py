@@ -0,0 +1,89 @@
+"""Ingestion embedding pool against a flaky stub Ollama: retries, checkpoint resume, id/embedding alignment."""
+
+import math
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from embedding_pool import EmbeddingCheckpoint, embed_and_upsert  # noqa: E402
+from fake_ollama import fake_embedding, start_fake_ollama  # noqa: E402
+
+BATCH_SIZE = 4
+DOCS = [f"Chunk {i}: intercurrent event handling under strategy {i % 5} of the estimand." for i in range(40)]
+IDS = [f"e9_{i}" for i in range(len(DOCS))]
+METAS = [{"source": "ICH_E9_R1.pdf", "chunk_index": i} for i in range(len(DOCS))]
+
+
+class ListCollection:
+    """Stand-in for a Chroma collection; optionally fails after `fail_after` upserts, like a crashed run."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.rows = {}  # chunk id -> (embedding, document, metadata)
+        self.upserts = 0
+        self.fail_after = fail_after
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if self.fail_after is not None and self.upserts >= self.fail_after:
+            raise RuntimeError("collection went away")
+        self.upserts += 1
+        self.rows.update(zip(ids, zip(embeddings, documents, metadatas)))
+
+
+@pytest.fixture
+def flaky_ollama():
+    """Stub Ollama failing ~30% of requests with a 503, in a fixed sequence."""
+    server = start_fake_ollama(latency=0.005, fail_rate=0.3, seed=1)
+    yield server
+    server.shutdown()
+
+
+def _embed_requests(server) -> int:
+    return server.request_counts.get("/api/embed", 0)
+
+
+def _assert_aligned(collection, ids):
+    for cid in ids:
+        embedding, document, metadata = collection.rows[cid]
+        assert document == DOCS[IDS.index(cid)]
+        assert metadata["chunk_index"] == IDS.index(cid)
+        assert embedding == pytest.approx(fake_embedding(document))
+
+
+def test_retries_recover_failed_batches(flaky_ollama):
+    collection = ListCollection()
+
+    stats = embed_and_upsert(collection, IDS, DOCS, METAS, batch_size=BATCH_SIZE, max_retries=8,
+                             url=flaky_ollama.url, backoff_base=0.001)
+
+    batches = math.ceil(len(DOCS) / BATCH_SIZE)
+    assert stats["embedded"] == len(DOCS) and stats["skipped"] == 0
+    assert _embed_requests(flaky_ollama) > batches  # Some requests got a 503 and were retried
+    assert collection.upserts == batches
+    _assert_aligned(collection, IDS)
+
+
+def test_interrupted_run_resumes_from_checkpoint(flaky_ollama, tmp_path):
+    path = tmp_path / "embed_checkpoint.jsonl"
+    crashed = ListCollection(fail_after=3)
+    with pytest.raises(RuntimeError, match="collection went away"):
+        embed_and_upsert(crashed, IDS, DOCS, METAS, batch_size=BATCH_SIZE, max_retries=8, url=flaky_ollama.url,
+                         checkpoint=EmbeddingCheckpoint(path), backoff_base=0.001)
+
+    checkpoint = EmbeddingCheckpoint(path)  # As reloaded by the next run
+    assert set(checkpoint.done) == set(crashed.rows) and len(checkpoint.done) == 3 * BATCH_SIZE
+
+    flaky_ollama.fail_rate = 0.0  # Count exactly the requests the resumed run makes
+    before = _embed_requests(flaky_ollama)
+    resumed = ListCollection()
+    stats = embed_and_upsert(resumed, IDS, DOCS, METAS, batch_size=BATCH_SIZE, url=flaky_ollama.url,
+                             checkpoint=checkpoint)
+
+    remaining = len(DOCS) - len(crashed.rows)
+    assert stats["skipped"] == len(crashed.rows) and stats["embedded"] == remaining
+    assert _embed_requests(flaky_ollama) - before == math.ceil(remaining / BATCH_SIZE)
+    assert not set(resumed.rows) & set(crashed.rows)  # Finished batches were not re-embedded
+    assert set(resumed.rows) | set(crashed.rows) == set(IDS)
+    _assert_aligned(crashed, crashed.rows)
+    _assert_aligned(resumed, resumed.rows)
+    assert len(EmbeddingCheckpoint(path).done) == len(DOCS)
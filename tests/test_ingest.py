@@ -0,0 +1,59 @@
+"""Incremental ingestion: which PDFs a run re-extracts, with extraction and exports stubbed out."""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("chromadb")
+pytest.importorskip("ollama")
+
+import ingest  # noqa: E402
+from embedding_pool import EmbeddingCheckpoint  # noqa: E402
+
+
+class EmptyCollection:
+    """Nothing is upserted when every PDF yields zero chunks."""
+
+    def upsert(self, **kwargs):
+        raise AssertionError("no chunks to embed")
+
+    def delete(self, ids):
+        pass
+
+    def count(self):
+        return 0
+
+
+@pytest.fixture
+def scanned_pdf_dir(tmp_path, monkeypatch):
+    """A PDF folder holding one PDF without a text layer, and a private manifest and lexical index."""
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    (pdf_dir / "scanned_guideline.pdf").write_bytes(b"%PDF-1.4 scanned pages only")
+    monkeypatch.setattr(ingest, "PDF_DIR", pdf_dir)
+    monkeypatch.setattr(ingest, "MANIFEST_PATH", tmp_path / "manifest.json")
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", tmp_path / "lexical_index.json")
+    monkeypatch.setattr(ingest, "EmbeddingCheckpoint", lambda: EmbeddingCheckpoint(tmp_path / "ckpt.jsonl"))
+    monkeypatch.setattr(ingest, "export_collection", lambda collection, corpus_version: None)
+    monkeypatch.setattr(ingest, "export_chunk_store", lambda collection, corpus_version: None)
+    monkeypatch.setattr(ingest, "vector_index_is_current", lambda manifest: True)
+    monkeypatch.setattr(ingest, "chunk_store_is_current", lambda manifest: True)
+    return pdf_dir
+
+
+def test_pdf_without_chunks_is_not_re_extracted(scanned_pdf_dir, monkeypatch):
+    extracted = []
+
+    def extract(paths, workers=None):
+        extracted.extend(path.name for path in paths)
+        return {path: "" for path in paths}
+
+    monkeypatch.setattr(ingest, "extract_texts_from_pdfs", extract)
+
+    first = ingest.ingest_pdfs(collection=EmptyCollection())
+    manifest = ingest.load_manifest(ingest.MANIFEST_PATH)
+    assert first["updated"] == 1 and extracted == ["scanned_guideline.pdf"]
+    assert manifest["files"]["scanned_guideline.pdf"]["chunks"] == {}
+
+    second = ingest.ingest_pdfs(collection=EmptyCollection())
+    assert second["skipped"] == 1 and second["updated"] == 0
+    assert extracted == ["scanned_guideline.pdf"]  # Fast path: not extracted again
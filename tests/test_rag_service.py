@@ -0,0 +1,107 @@
+"""rag_service end to end against the stub Ollama: micro-batching, admission control, answers.
+
+Run from: clinical_rag
+    python -m pytest -q tests/test_rag_service.py
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("chromadb")
+pytest.importorskip("ollama")
+
+from fake_ollama import fake_embedding  # noqa: E402
+
+CHUNKS = {
+    "ich_e9_0": ("ICH E9 R1", "An estimand defines the treatment effect targeted by the trial question."),
+    "ich_e9_1": ("ICH E9 R1", "Intercurrent events such as treatment discontinuation affect the estimand."),
+    "gcp_0": ("ICH E6 GCP", "Informed consent must be obtained before any trial procedure."),
+}
+
+
+@pytest.fixture(scope="module")
+def service(rag_core):
+    """One service with a single request slot and no queue, over a three-chunk corpus."""
+    import rag_service
+
+    rag_core.get_collection().upsert(
+        ids=list(CHUNKS),
+        embeddings=[fake_embedding(text) for _, text in CHUNKS.values()],
+        documents=[text for _, text in CHUNKS.values()],
+        metadatas=[{"source": source, "chunk_index": i} for i, (source, _) in enumerate(CHUNKS.values())],
+    )
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(rag_service, "rag_core", rag_service.rag_core)  # start_service rebinds it
+        server = rag_service.start_service(port=0, max_active=1, max_queue=0, queue_timeout=0.1,
+                                           batch_window_ms=20)
+        yield server
+        server.shutdown()
+        server.batcher.close()
+
+
+def test_batcher_coalesces_concurrent_embeddings(fake_ollama):
+    from embedding_pool import EmbeddingBatcher, embed_texts
+
+    texts = [f"question {i} about estimands" for i in range(8)]
+    before = fake_ollama.request_counts.get("/api/embed", 0)
+    batcher = EmbeddingBatcher(lambda batch: embed_texts(batch, url=fake_ollama.url), window=0.1)
+    results = {}
+    start = threading.Barrier(len(texts))
+
+    def embed(text):
+        start.wait()
+        results[text] = batcher.embed([text])[0]
+
+    threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    stats = batcher.stats()
+    assert stats["requests"] == len(texts) and stats["texts"] == len(texts)
+    assert stats["batches"] < len(texts)
+    assert fake_ollama.request_counts["/api/embed"] - before == stats["batches"]
+    for text in texts:
+        assert results[text] == pytest.approx(fake_embedding(text))
+
+
+def test_answer_round_trip(service):
+    from rag_service import ServiceClient
+
+    result = ServiceClient(service.url).answer("What does an estimand define?", top_k=2, use_cache=False,
+                                               mode="vector")
+
+    assert result["answer"].startswith("Based on the provided guidelines")
+    assert {source["source"] for source in result["sources"]} <= {source for source, _ in CHUNKS.values()}
+    assert result["sources"]
+    assert ServiceClient(service.url).health()["chunks"] == len(CHUNKS)
+
+
+def test_full_queue_is_rejected_with_503(service):
+    from rag_service import ServiceBusy, ServiceClient
+
+    assert service.admission.acquire(0)  # Occupy the only slot; max_queue=0 leaves no room to wait
+    try:
+        request = urllib.request.Request(
+            service.url + "/retrieve",
+            data=json.dumps({"query": "informed consent"}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(request, timeout=5)
+        assert excinfo.value.code == 503
+        assert excinfo.value.headers["Retry-After"] == "1"
+        with pytest.raises(ServiceBusy):
+            ServiceClient(service.url).retrieve("informed consent")
+    finally:
+        service.admission.release()
+
+    assert service.admission.stats()["rejected"] >= 2
+    assert ServiceClient(service.url).retrieve("informed consent", k=1, mode="vector")
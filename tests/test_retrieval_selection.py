@@ -0,0 +1,55 @@
+"""Score-aware selection of retrieved chunks: the relevance cutoff and MMR ordering."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("chromadb")
+pytest.importorskip("ollama")
+
+from rag_core import mmr_select, relevance_cutoff  # noqa: E402
+
+# Two near-duplicate chunks on one topic, a distinct chunk and a weak one
+ESTIMAND = [1.0, 0.0, 0.0]
+ESTIMAND_OVERLAP = [0.99, 0.14, 0.0]
+INTERCURRENT = [0.3, 0.0, 0.95]
+CONSENT = [0.0, 1.0, 0.0]
+CANDIDATES = [ESTIMAND, ESTIMAND_OVERLAP, INTERCURRENT, CONSENT]
+RELEVANCE = [0.82, 0.81, 0.74, 0.40]
+
+
+def test_cutoff_is_off_by_default():
+    assert relevance_cutoff(RELEVANCE, None, None).all()
+
+
+def test_cutoff_drops_chunks_below_the_floor_or_too_far_below_the_best():
+    assert relevance_cutoff(RELEVANCE, min_similarity=0.5, max_gap=None).tolist() == [True, True, True, False]
+    assert relevance_cutoff(RELEVANCE, min_similarity=None, max_gap=0.05).tolist() == [True, True, False, False]
+
+
+def test_cutoff_always_keeps_the_best_candidate():
+    assert relevance_cutoff([0.3, 0.35, 0.2], min_similarity=0.9).tolist() == [False, True, False]
+    assert relevance_cutoff([], min_similarity=0.9).tolist() == []
+
+
+def test_mmr_disabled_keeps_relevance_order():
+    assert mmr_select(RELEVANCE[::-1], CANDIDATES[::-1], k=3, lambda_mult=None) == [3, 2, 1]
+    assert mmr_select(RELEVANCE, CANDIDATES, k=10, lambda_mult=1.0) == [0, 1, 2, 3]
+
+
+def test_mmr_skips_a_near_duplicate_for_a_distinct_chunk():
+    picks = mmr_select(RELEVANCE, CANDIDATES, k=3, lambda_mult=0.7)
+
+    assert picks[0] == 0  # The most relevant chunk always comes first
+    assert picks[1] == 2  # The overlapping chunk repeats it; the intercurrent-events chunk adds something
+    assert len(set(picks)) == 3
+
+
+def test_mmr_with_full_diversity_weight_prefers_the_least_similar_chunk():
+    assert mmr_select(RELEVANCE, CANDIDATES, k=2, lambda_mult=0.0)[1] == 3
+
+
+def test_mmr_weighs_fused_scores_like_cosines():
+    # Fused RRF scores sit in a narrow band around 1/60; after min-max scaling only their spread matters
+    fused = [0.016 + 0.002 * score for score in RELEVANCE]
+    expected = mmr_select(RELEVANCE, CANDIDATES, k=3, lambda_mult=0.7)
+    assert mmr_select(fused, CANDIDATES, k=3, lambda_mult=0.7) == expected
@@ -0,0 +1,40 @@
+"""Compressed vector search: blockwise scoring, batch search on the codes, explicit delegation."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import vector_index  # noqa: E402
+from vector_index import CompressedVectorIndex, NumpyVectorIndex  # noqa: E402
+
+
+@pytest.fixture
+def full():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(300, 32)).astype(np.float32)
+    metas = [{"source": f"guideline_{row % 3}.pdf", "chunk_index": row} for row in range(len(matrix))]
+    return NumpyVectorIndex(matrix, [f"c{row}" for row in range(len(matrix))], metas, corpus_version="v1")
+
+
+@pytest.mark.parametrize("spec", ["float16", "int8", "int8:16"])
+def test_search_batch_runs_on_the_codes_and_matches_exact_search(full, spec, monkeypatch):
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 64)  # Several blocks, the last one partial
+    compressed = CompressedVectorIndex.build(full, *vector_index.parse_compression(spec))
+    queries = np.asarray(full.matrix[:5]) + 0.01
+
+    rows, dists = compressed.search_batch(queries, k=3)
+
+    exact_rows, _ = full.search_batch(queries, k=3)
+    assert rows.shape == dists.shape == (5, 3)
+    assert (rows[:, 0] == exact_rows[:, 0]).all()
+    for q, row in zip(queries, rows):
+        assert (compressed.search(q, 3)[0] == row).all()
+
+
+def test_only_listed_attributes_are_delegated(full):
+    compressed = CompressedVectorIndex.build(full, "int8")
+
+    assert compressed.ids is full.ids and compressed.corpus_version == "v1"
+    assert (compressed.rows_for_sources(["guideline_1.pdf"]) == full.rows_for_sources(["guideline_1.pdf"])).all()
+    with pytest.raises(AttributeError):
+        compressed.search_ids  # noqa: B018 - would scan the float32 matrix